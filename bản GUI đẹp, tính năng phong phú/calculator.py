@@ -181,6 +181,27 @@ class Calculator:
                 'word_accuracy': 0.0
             }
             
+    def calculate_key_statistics(self, original_text: str, user_input: str) -> Dict[str, List[int]]:
+        """Số lần gõ và số lần sai theo từng ký tự và bigram của text gốc: {key: [attempts, errors]}"""
+        if not isinstance(original_text, str) or not isinstance(user_input, str):
+            raise ValueError("Both inputs must be strings")
+            
+        key_stats = {}
+        comparison_length = min(len(original_text), len(user_input))
+        
+        for i in range(comparison_length):
+            is_error = user_input[i] != original_text[i]
+            keys = [original_text[i]]
+            if i > 0:
+                keys.append(original_text[i - 1:i + 1])
+            for key in keys:
+                stats = key_stats.setdefault(key, [0, 0])
+                stats[0] += 1
+                if is_error:
+                    stats[1] += 1
+                    
+        return key_stats
+            
     def get_performance_rating(self, wpm: float, accuracy: float) -> str:
         try:
             wpm = float(wpm)
@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from corpus_snapshot import CorpusSnapshot
+
+class ShardManifest:
+    """manifest.json của thư mục corpora: số câu và histogram của từng shard"""
+
+    VERSION = 1
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.manifest_file = os.path.join(directory, "manifest.json")
+        self.shards: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            if os.path.exists(self.manifest_file):
+                with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == self.VERSION and isinstance(data.get('shards'), dict):
+                    self.shards = data['shards']
+        except (json.JSONDecodeError, IOError):
+            # Manifest chỉ là dữ liệu dẫn xuất, sẽ được dựng lại từ các file shard
+            self.shards = {}
+
+    def save(self) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_file = self.manifest_file + '.tmp'
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.VERSION, 'shards': self.shards}, f, indent=2, ensure_ascii=False)
+            os.replace(temp_file, self.manifest_file)
+        except IOError as e:
+            raise Exception(f"Failed to save shard manifest: {str(e)}")
+
+    def shard_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.txt")
+
+    def discover(self) -> List[str]:
+        """Tên các shard có file .txt trong thư mục"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            filename[:-4] for filename in os.listdir(self.directory)
+            if filename.endswith('.txt') and not filename.startswith('.')
+        )
+
+    def is_stale(self, name: str) -> bool:
+        entry = self.shards.get(name)
+        path = self.shard_path(name)
+        if entry is None or not os.path.exists(path):
+            return True
+        stat = os.stat(path)
+        return entry.get('source_size') != stat.st_size or entry.get('source_mtime_ns') != stat.st_mtime_ns
+
+    def matches(self, name: str, selectors: List[str]) -> bool:
+        """Shard khớp nếu tên hoặc một trong các tag/ngôn ngữ nằm trong selectors"""
+        entry = self.shards.get(name, {})
+        keys = {name, *entry.get('tags', [])}
+        if entry.get('language'):
+            keys.add(entry['language'])
+        return any(selector in keys for selector in selectors)
+
+
+class ShardCache:
+    """LRU các shard đã nạp, giải phóng shard nguội khi vượt ngân sách bộ nhớ"""
+
+    def __init__(self, memory_budget: int):
+        self.memory_budget = memory_budget
+        self._shards: "OrderedDict[str, CorpusSnapshot]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+
+    @staticmethod
+    def estimate_size(snapshot: CorpusSnapshot) -> int:
+        return (sys.getsizeof(snapshot.texts)
+                + sum(sys.getsizeof(text) for text in snapshot.texts)
+                + sum(column.itemsize * len(column)
+                      for column in (snapshot.lengths, snapshot.classes, snapshot.hashes)))
+
+    @property
+    def memory_used(self) -> int:
+        return sum(self._sizes.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._shards
+
+    def loaded_names(self) -> List[str]:
+        return list(self._shards)
+
+    def get(self, name: str) -> Optional[CorpusSnapshot]:
+        snapshot = self._shards.get(name)
+        if snapshot is not None:
+            self._shards.move_to_end(name)
+        return snapshot
+
+    def put(self, name: str, snapshot: CorpusSnapshot) -> None:
+        self._shards[name] = snapshot
+        self._shards.move_to_end(name)
+        self._sizes[name] = self.estimate_size(snapshot)
+        self._evict(keep=name)
+
+    def discard(self, name: str) -> None:
+        self._shards.pop(name, None)
+        self._sizes.pop(name, None)
+
+    def _evict(self, keep: str) -> None:
+        while self.memory_used > self.memory_budget and len(self._shards) > 1:
+            oldest = next(iter(self._shards))
+            if oldest == keep:
+                break
+            self.discard(oldest)
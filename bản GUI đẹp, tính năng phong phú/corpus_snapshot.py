@@ -0,0 +1,142 @@
+import os
+import struct
+import sys
+import zlib
+import lzma
+from array import array
+from typing import List, Optional
+
+class CorpusSnapshot:
+    """Ảnh chụp nhị phân của DATA.txt: UTF-8 đã nén + bảng offset + các cột tính sẵn
+
+    Bố cục file (little-endian):
+        header  : magic, version, compression, count, source size/mtime, payload length/crc
+        payload : (nén) offsets[count+1] u32 | lengths[count] u32 | classes[count] u8 |
+                  hashes[count] u64 | packed UTF-8
+    """
+
+    MAGIC = b'TMSNAP'
+    VERSION = 1
+    COMPRESSION_CODES = {'none': 0, 'zlib': 1, 'lzma': 2}
+    _HEADER = struct.Struct('<6sHBxIQQQI')
+
+    def __init__(self, texts: List[str], lengths: array, classes: array, hashes: array):
+        self.texts = texts
+        self.lengths = lengths
+        self.classes = classes
+        self.hashes = hashes
+        # Chỉ số các câu khớp (difficulty, content_type), do DataManager điền khi cần
+        self.match_cache = {}
+
+    @staticmethod
+    def _source_signature(source_path: str):
+        stat = os.stat(source_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def _to_little_endian(column: array) -> bytes:
+        if sys.byteorder == 'big' and column.itemsize > 1:
+            column = array(column.typecode, column)
+            column.byteswap()
+        return column.tobytes()
+
+    @staticmethod
+    def _from_buffer(typecode: str, buffer) -> array:
+        column = array(typecode)
+        column.frombytes(buffer)
+        if sys.byteorder == 'big' and column.itemsize > 1:
+            column.byteswap()
+        return column
+
+    def save(self, path: str, source_path: str, compression: str = 'zlib') -> None:
+        if compression not in self.COMPRESSION_CODES:
+            raise ValueError(f"Unsupported compression: {compression}")
+
+        encoded = [text.encode('utf-8') for text in self.texts]
+        offsets = array('I', [0])
+        position = 0
+        for chunk in encoded:
+            position += len(chunk)
+            offsets.append(position)
+
+        payload = b''.join([
+            self._to_little_endian(offsets),
+            self._to_little_endian(self.lengths),
+            self.classes.tobytes(),
+            self._to_little_endian(self.hashes),
+            b''.join(encoded)
+        ])
+
+        if compression == 'zlib':
+            payload = zlib.compress(payload, 6)
+        elif compression == 'lzma':
+            payload = lzma.compress(payload)
+
+        source_size, source_mtime = self._source_signature(source_path)
+        header = self._HEADER.pack(self.MAGIC, self.VERSION, self.COMPRESSION_CODES[compression],
+                                   len(self.texts), source_size, source_mtime,
+                                   len(payload), zlib.crc32(payload))
+
+        # Ghi ra file tạm rồi thay thế để không bao giờ để lại snapshot dở dang
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(header)
+            f.write(payload)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str, source_path: str) -> Optional['CorpusSnapshot']:
+        """Đọc snapshot; trả về None nếu không có, hỏng, khác version hoặc cũ hơn file nguồn"""
+        try:
+            if not os.path.exists(path) or not os.path.exists(source_path):
+                return None
+
+            with open(path, 'rb') as f:
+                data = f.read()
+
+            if len(data) < cls._HEADER.size:
+                return None
+            (magic, version, compression, count, source_size, source_mtime,
+             payload_length, checksum) = cls._HEADER.unpack_from(data)
+
+            if magic != cls.MAGIC or version != cls.VERSION:
+                return None
+            if (source_size, source_mtime) != cls._source_signature(source_path):
+                return None
+
+            view = memoryview(data)[cls._HEADER.size:]
+            if len(view) != payload_length or zlib.crc32(view) != checksum:
+                return None
+
+            if compression == cls.COMPRESSION_CODES['zlib']:
+                payload = memoryview(zlib.decompress(view))
+            elif compression == cls.COMPRESSION_CODES['lzma']:
+                payload = memoryview(lzma.decompress(view))
+            else:
+                payload = view
+
+            position = 0
+            sections = []
+            for typecode, size in (('I', count + 1), ('I', count), ('B', count), ('Q', count)):
+                end = position + array(typecode).itemsize * size
+                sections.append(cls._from_buffer(typecode, payload[position:end]))
+                position = end
+            offsets, lengths, classes, hashes = sections
+
+            packed = payload[position:]
+            if len(packed) != offsets[-1]:
+                return None
+            # Giải mã một lần rồi cắt theo độ dài ký tự, nhanh hơn giải mã từng câu
+            decoded = str(packed, 'utf-8')
+            texts = []
+            position = 0
+            for length in lengths:
+                texts.append(decoded[position:position + length])
+                position += length
+            if position != len(decoded):
+                return None
+
+            return cls(texts, lengths, classes, hashes)
+
+        except (OSError, ValueError, struct.error, zlib.error, lzma.LZMAError):
+            return None
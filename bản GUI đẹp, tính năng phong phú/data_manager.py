@@ -1,17 +1,141 @@
 import random
 import os
 import re
-from typing import List, Dict, Any, Optional
+import codecs
+import hashlib
+import json
+from array import array
+from typing import List, Dict, Any, Optional, Iterator
+from near_duplicate_filter import NearDuplicateFilter
+from sentence_segmenter import SentenceSegmenter
+from corpus_snapshot import CorpusSnapshot
+from corpus_shards import ShardManifest, ShardCache
+from drill_index import DrillIndex
 
 class DataManager:
-    def __init__(self, txt_file: str = "DATA.txt"):
+    # Tên kho mặc định (DATA.txt) khi chọn kho câu trong preferences
+    DEFAULT_CORPUS = "default"
+    
+    # Bit trong cột content class
+    CONTENT_LETTERS_ONLY = 1
+    CONTENT_WITH_SPECIAL = 2
+    
+    # Chỉ chữ cái, khoảng trắng và dấu câu cơ bản
+    _LETTERS_ONLY_PATTERN = re.compile(r'^[a-zA-ZÀ-ỹ\s.,!?;:\'"-]+$')
+    # Có số và ký tự đặc biệt
+    _WITH_SPECIAL_PATTERN = re.compile(r'[0-9@#$%^&*()_+=\[\]{}|\\/<>~`]')
+    
+    def __init__(self, txt_file: str = "DATA.txt", near_duplicate_threshold: Optional[float] = 0.8,
+                 use_snapshot: bool = True, corpus_dir: Optional[str] = None,
+                 shard_memory_budget: int = 64 * 1024 * 1024):
         self.txt_file = txt_file
+        self.snapshot_file = txt_file + ".snap"
+        self.use_snapshot = use_snapshot
         self.texts = []
         self.current_preferences = None
+        # Các cột song song với self.texts: độ dài, loại nội dung, hash
+        self._lengths = array('I')
+        self._content_classes = array('B')
+        self._hashes = array('Q')
+        self._known_hashes = None
+        self._match_cache = {}
+        # Chỉ mục ký tự/bigram cho bài luyện phím yếu, dựng ở lần dùng đầu tiên
+        self._drill_index = None
+        # None để tắt lọc câu gần trùng khi import
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self._near_duplicate_filter = None
+        self.segmenter = SentenceSegmenter()
+        self.last_import_report = None
+        # Các shard trong thư mục corpora/ chỉ được nạp khi preferences cần tới
+        if corpus_dir is None:
+            corpus_dir = os.path.join(os.path.dirname(os.path.abspath(txt_file)), "corpora")
+        self.shard_manifest = ShardManifest(corpus_dir)
+        self._shard_cache = ShardCache(shard_memory_budget)
         self._load_texts()
+        # Lỗi ở shard/manifest không được làm hỏng kho mặc định: giữ lại thông báo lỗi
+        self.shard_error = None
+        try:
+            self._refresh_manifest()
+        except Exception as e:
+            self.shard_error = str(e)
         
     def _load_texts(self) -> None:
-        self.texts = self._load_from_txt(self.txt_file)
+        snapshot = self._load_corpus_file(self.txt_file)
+        self.texts = snapshot.texts
+        self._lengths = snapshot.lengths
+        self._content_classes = snapshot.classes
+        self._hashes = snapshot.hashes
+        self._corpus_changed()
+        self._near_duplicate_filter = None
+        
+    def _load_corpus_file(self, filename: str) -> CorpusSnapshot:
+        """Đọc một file câu (DATA.txt hoặc shard), ưu tiên snapshot nhị phân nếu còn mới"""
+        snapshot = None
+        if self.use_snapshot:
+            snapshot = CorpusSnapshot.load(filename + ".snap", filename)
+            
+        if snapshot is None:
+            texts = self._load_from_txt(filename)
+            snapshot = CorpusSnapshot(texts, *self._build_columns(texts))
+            if self.use_snapshot and texts:
+                self._write_snapshot(snapshot, filename)
+                
+        return snapshot
+        
+    def _write_snapshot(self, snapshot: Optional[CorpusSnapshot] = None, filename: Optional[str] = None) -> None:
+        """Ghi lại snapshot nhị phân cạnh file câu để lần khởi động sau đọc nhanh"""
+        if snapshot is None:
+            snapshot = CorpusSnapshot(self.texts, self._lengths, self._content_classes, self._hashes)
+        filename = filename or self.txt_file
+        try:
+            snapshot.save(filename + ".snap", filename)
+        except (OSError, ValueError):
+            # Snapshot chỉ là bộ đệm, lỗi ghi không ảnh hưởng dữ liệu gốc
+            pass
+            
+    def _classify_content(self, text: str) -> int:
+        content_class = 0
+        if self._LETTERS_ONLY_PATTERN.match(text):
+            content_class |= self.CONTENT_LETTERS_ONLY
+        if self._WITH_SPECIAL_PATTERN.search(text):
+            content_class |= self.CONTENT_WITH_SPECIAL
+        return content_class
+        
+    @staticmethod
+    def _text_hash(text: str) -> int:
+        return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+        
+    def _build_columns(self, texts: List[str]):
+        lengths = array('I', (len(text) for text in texts))
+        classes = array('B', (self._classify_content(text) for text in texts))
+        hashes = array('Q', (self._text_hash(text) for text in texts))
+        return lengths, classes, hashes
+        
+    def _rebuild_columns(self) -> None:
+        self._lengths, self._content_classes, self._hashes = self._build_columns(self.texts)
+        self._corpus_changed()
+        
+    def _append_columns(self, texts: List[str]) -> None:
+        lengths, classes, hashes = self._build_columns(texts)
+        self._lengths.extend(lengths)
+        self._content_classes.extend(classes)
+        self._hashes.extend(hashes)
+        if self._known_hashes is not None:
+            self._known_hashes.update(hashes)
+        if self._drill_index is not None:
+            self._drill_index.add(texts)
+        self._match_cache = {}
+        
+    def _corpus_changed(self) -> None:
+        """Xóa các bộ đệm dẫn xuất khi kho câu thay đổi không theo kiểu nối thêm"""
+        self._known_hashes = None
+        self._match_cache = {}
+        self._drill_index = None
+        
+    def _contains_text(self, text: str) -> bool:
+        if self._known_hashes is None:
+            self._known_hashes = set(self._hashes)
+        return self._text_hash(text) in self._known_hashes
         
     def _load_from_txt(self, filename: str) -> List[str]:
         texts = []
@@ -39,6 +163,40 @@ class DataManager:
                 continue
                 
         return texts
+    
+    def _detect_encoding(self, filename: str, chunk_size: int = 1 << 20) -> str:
+        """Dò encoding bằng cách giải mã từng khối, không đọc cả file vào bộ nhớ"""
+        with open(filename, 'rb') as f:
+            if f.read(3) == codecs.BOM_UTF8:
+                return 'utf-8-sig'
+                
+        for encoding in ['utf-8', 'latin-1', 'cp1252']:
+            decoder = codecs.getincrementaldecoder(encoding)()
+            try:
+                with open(filename, 'rb') as f:
+                    while True:
+                        chunk = f.read(chunk_size)
+                        if not chunk:
+                            break
+                        decoder.decode(chunk)
+                    decoder.decode(b'', final=True)
+                return encoding
+            except UnicodeDecodeError:
+                continue
+                
+        raise ValueError(f"Unsupported file encoding: {filename}")
+        
+    def iter_sentences(self, filename: str, line_per_sentence: Optional[bool] = None) -> Iterator[str]:
+        """Đọc file văn xuôi theo từng dòng và trả về từng câu đã tách, chuẩn hóa
+        
+        line_per_sentence=None: tự nhận biết file mỗi dòng một câu từ các dòng đầu file.
+        """
+        encoding = self._detect_encoding(filename)
+        if line_per_sentence is None:
+            with open(filename, 'r', encoding=encoding, newline=None) as f:
+                line_per_sentence = self.segmenter.is_line_oriented(f)
+        with open(filename, 'r', encoding=encoding, newline=None) as f:
+            yield from self.segmenter.segment(f, line_per_sentence)
                 
     def _save_to_txt(self, filename: str, texts: List[str]) -> None:
         try:
@@ -47,36 +205,76 @@ class DataManager:
                     f.write(text + '\n')
         except IOError as e:
             raise Exception(f"Failed to save to {filename}: {str(e)}")
+            
+    def _append_to_txt(self, filename: str, texts: List[str]) -> None:
+        """Ghi nối các câu mới vào cuối file thay vì ghi lại toàn bộ"""
+        try:
+            needs_newline = False
+            if os.path.exists(filename) and os.path.getsize(filename) > 0:
+                with open(filename, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    needs_newline = f.read(1) != b'\n'
+                    
+            with open(filename, 'a', encoding='utf-8') as f:
+                if needs_newline:
+                    f.write('\n')
+                for text in texts:
+                    f.write(text + '\n')
+        except IOError as e:
+            raise Exception(f"Failed to save to {filename}: {str(e)}")
     
     def set_preferences(self, preferences: Dict[str, str]) -> None:
         """Lưu preferences từ mode selection dialog"""
         self.current_preferences = preferences
     
-    def _filter_by_difficulty(self, texts: List[str], difficulty: str) -> List[str]:
-        """Lọc text theo độ khó (length)"""
+    def _length_matches(self, length: int, difficulty: str) -> bool:
         if difficulty == "easy":
-            return [text for text in texts if 0 <= len(text) <= 25]
+            return 0 <= length <= 25
         elif difficulty == "medium":
-            return [text for text in texts if 26 <= len(text) <= 60]
+            return 26 <= length <= 60
         elif difficulty == "hard":
-            return [text for text in texts if len(text) >= 61]
-        return texts
+            return length >= 61
+        return True
     
-    def _filter_by_content(self, texts: List[str], content_type: str) -> List[str]:
-        """Lọc text theo loại nội dung"""
+    def _content_mask(self, content_type: str) -> int:
         if content_type == "letters_only":
-            # Chỉ chữ cái, khoảng trắng và dấu câu cơ bản
-            pattern = r'^[a-zA-ZÀ-ỹ\s.,!?;:\'"-]+$'
-            return [text for text in texts if re.match(pattern, text)]
+            return self.CONTENT_LETTERS_ONLY
         elif content_type == "with_special":
-            # Có số và ký tự đặc biệt
-            pattern = r'[0-9@#$%^&*()_+=\[\]{}|\\/<>~`]'
-            return [text for text in texts if re.search(pattern, text)]
-        return texts
+            return self.CONTENT_WITH_SPECIAL
+        return 0
+    
+    def _matching_ids(self, difficulty: str, content_type: str) -> array:
+        """Chỉ số các câu khớp preferences, tính từ các cột và lưu đệm tới khi kho thay đổi"""
+        key = (difficulty, content_type)
+        if key not in self._match_cache:
+            self._match_cache[key] = self._scan_columns(self._lengths, self._content_classes,
+                                                        difficulty, content_type)
+        return self._match_cache[key]
+    
+    def _scan_columns(self, lengths: array, classes: array, difficulty: str, content_type: str) -> array:
+        mask = self._content_mask(content_type)
+        return array('I', (
+            i for i in range(len(lengths))
+            if self._length_matches(lengths[i], difficulty) and (not mask or classes[i] & mask)
+        ))
+    
+    def _difficulty_of(self, length: int) -> str:
+        if length <= 25:
+            return "easy"
+        elif length <= 60:
+            return "medium"
+        return "hard"
+    
+    def _content_name(self, content_class: int) -> str:
+        if content_class & self.CONTENT_LETTERS_ONLY:
+            return "letters_only"
+        elif content_class & self.CONTENT_WITH_SPECIAL:
+            return "with_special"
+        return "other"
     
-    def get_filtered_text(self, preferences: Optional[Dict[str, str]] = None) -> str:
+    def get_filtered_text(self, preferences: Optional[Dict[str, Any]] = None) -> str:
         """Lấy text theo preferences đã chọn"""
-        if not self.texts:
+        if not self.has_texts():
             return ""
         
         # Sử dụng preferences hiện tại nếu không có preferences mới
@@ -84,20 +282,52 @@ class DataManager:
         if not prefs:
             return self.get_random_text()
         
-        # Lọc texts theo các tiêu chí
-        filtered_texts = self.texts.copy()
-        
-        # Lọc theo độ khó
-        filtered_texts = self._filter_by_difficulty(filtered_texts, prefs['difficulty'])
+        # Chỉ nạp các shard mà preferences chọn
+        if prefs.get('corpus'):
+            text = self._pick_from_corpora(prefs['corpus'], prefs['difficulty'], prefs['content_type'])
+            if text:
+                return text
         
-        # Lọc theo loại nội dung
-        filtered_texts = self._filter_by_content(filtered_texts, prefs['content_type'])
+        # Lọc theo độ khó và loại nội dung bằng các cột tính sẵn
+        matching_ids = self._matching_ids(prefs['difficulty'], prefs['content_type'])
         
         # Nếu không còn text nào phù hợp, trả về text ngẫu nhiên
-        if not filtered_texts:
+        if not matching_ids:
             return self.get_random_text()
         
-        return random.choice(filtered_texts)
+        return self.texts[random.choice(matching_ids)]
+    
+    def _get_drill_index(self) -> DrillIndex:
+        if self._drill_index is None:
+            drill_index = DrillIndex()
+            drill_index.add(self.texts)
+            self._drill_index = drill_index
+        return self._drill_index
+    
+    def get_drill_text(self, key_weights: Dict[str, float], preferences: Optional[Dict[str, Any]] = None) -> str:
+        """Chọn câu chứa nhiều ký tự/bigram hay gõ sai nhất (key_weights: tỉ lệ lỗi theo phím)"""
+        if not self.texts or not key_weights:
+            return self.get_filtered_text(preferences)
+            
+        prefs = preferences or self.current_preferences
+        drill_index = self._get_drill_index()
+        
+        accept = None
+        if prefs:
+            mask = self._content_mask(prefs['content_type'])
+            lengths = self._lengths
+            classes = self._content_classes
+            accept = lambda i: (self._length_matches(lengths[i], prefs['difficulty'])
+                                and (not mask or classes[i] & mask))
+            
+        doc_id = drill_index.select(self.texts, key_weights, accept=accept)
+        if doc_id is None and accept is not None:
+            # Không có câu vừa khớp bộ lọc vừa chứa phím yếu: bỏ bộ lọc
+            doc_id = drill_index.select(self.texts, key_weights)
+        if doc_id is None:
+            return self.get_filtered_text(preferences)
+            
+        return self.texts[doc_id]
     
     def get_random_text(self) -> str:
         if not self.texts:
@@ -122,37 +352,261 @@ class DataManager:
         if len(cleaned_text) > 5000:
             raise ValueError("Text must be less than 5000 characters")
             
-        if cleaned_text in self.texts:
+        if self._contains_text(cleaned_text):
             raise ValueError("This text already exists")
             
         self.texts.append(cleaned_text)
+        self._append_columns([cleaned_text])
+        if self._near_duplicate_filter is not None:
+            self._near_duplicate_filter.add(cleaned_text)
         self._save_to_txt(self.txt_file, self.texts)
         
-    def import_txt_file(self, filepath: str) -> int:
+    def import_txt_file(self, filepath: str, shard: Optional[str] = None,
+                        tags: Optional[List[str]] = None, language: Optional[str] = None,
+                        line_per_sentence: Optional[bool] = None) -> int:
+        """Import câu từ file văn xuôi hoặc file mỗi dòng một câu
+        
+        line_per_sentence: True/False chọn cách tách; None tự nhận biết (file mà phần lớn các dòng
+        không có dấu kết thúc câu được tách theo dòng).
+        """
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"File not found: {filepath}")
             
-        try:
-            imported_texts = self._load_from_txt(filepath)
+        if shard is not None and shard != self.DEFAULT_CORPUS:
+            return self._import_to_shard(filepath, shard, tags, language, line_per_sentence)
             
-            if not imported_texts:
-                raise ValueError("No valid texts found in file. Make sure each line contains at least 10 characters.")
+        try:
+            new_texts = self._collect_new_texts(filepath, self._contains_text,
+                                                self._get_near_duplicate_filter(), line_per_sentence)
+                
+            if new_texts:
+                self._append_to_txt(self.txt_file, new_texts)
+                self.texts.extend(new_texts)
+                self._append_columns(new_texts)
+                if self.use_snapshot:
+                    self._write_snapshot()
                 
-            new_texts_count = 0
+            return len(new_texts)
+            
+        except Exception as e:
+            # Chỉ mục gần trùng có thể đã nhận các câu chưa được lưu
+            self._near_duplicate_filter = None
+            raise Exception(f"Failed to import file: {str(e)}")
+            
+    def _collect_new_texts(self, filepath: str, contains, near_duplicates: Optional[NearDuplicateFilter],
+                           line_per_sentence: Optional[bool] = None) -> List[str]:
+        """Chạy pipeline import và ghi số liệu vào last_import_report"""
+        report = {
+            'sentences': 0,
+            'imported': 0,
+            'too_short': 0,
+            'too_long': 0,
+            'duplicates': 0,
+            'near_duplicates': 0
+        }
+        self.last_import_report = report
+        
+        new_texts = []
+        new_hashes = set()
+        
+        # Các câu đi qua lần lượt: tách câu -> độ dài -> trùng khớp -> gần trùng
+        for text in self.iter_sentences(filepath, line_per_sentence):
+            report['sentences'] += 1
+            if len(text) < 10:
+                report['too_short'] += 1
+                continue
+            if len(text) > 5000:
+                report['too_long'] += 1
+                continue
+            text_hash = self._text_hash(text)
+            if text_hash in new_hashes or contains(text):
+                report['duplicates'] += 1
+                continue
+            if near_duplicates is not None and not near_duplicates.check_and_add(text):
+                report['near_duplicates'] += 1
+                continue
+            new_hashes.add(text_hash)
+            new_texts.append(text)
+            
+        if report['sentences'] == report['too_short'] + report['too_long']:
+            raise ValueError("No valid texts found in file. Make sure each sentence contains at least 10 characters.")
             
-            for text in imported_texts:
-                if text not in self.texts and len(text) >= 10:
-                    self.texts.append(text)
-                    new_texts_count += 1
+        report['imported'] = len(new_texts)
+        return new_texts
+            
+    def _import_to_shard(self, filepath: str, name: str, tags: Optional[List[str]],
+                         language: Optional[str], line_per_sentence: Optional[bool] = None) -> int:
+        if not re.match(r'^[\w.-]+$', name) or name.startswith('.'):
+            raise ValueError(f"Invalid shard name: {name}")
+            
+        try:
+            path = self.shard_manifest.shard_path(name)
+            if os.path.exists(path):
+                snapshot = self._get_shard(name)
+            else:
+                snapshot = CorpusSnapshot([], *self._build_columns([]))
+                
+            known_hashes = set(snapshot.hashes)
+            near_duplicates = None
+            if self.near_duplicate_threshold is not None:
+                near_duplicates = NearDuplicateFilter(threshold=self.near_duplicate_threshold)
+                for text in snapshot.texts:
+                    near_duplicates.add(text)
                     
-            if new_texts_count > 0:
-                self._save_to_txt(self.txt_file, self.texts)
+            new_texts = self._collect_new_texts(
+                filepath, lambda text: self._text_hash(text) in known_hashes, near_duplicates, line_per_sentence)
+                
+            entry = self.shard_manifest.shards.get(name, {})
+            if tags is not None:
+                entry['tags'] = list(tags)
+            if language is not None:
+                entry['language'] = language
+                
+            if new_texts or name not in self.shard_manifest.shards:
+                os.makedirs(self.shard_manifest.directory, exist_ok=True)
+                self._append_to_txt(path, new_texts)
+                lengths, classes, hashes = self._build_columns(new_texts)
+                snapshot = CorpusSnapshot(snapshot.texts + new_texts, snapshot.lengths + lengths,
+                                          snapshot.classes + classes, snapshot.hashes + hashes)
+                if self.use_snapshot:
+                    self._write_snapshot(snapshot, path)
+                self._shard_cache.put(name, snapshot)
+                entry.update(self._summarize_shard(snapshot, path))
                 
-            return new_texts_count
+            entry.setdefault('tags', [name])
+            self.shard_manifest.shards[name] = entry
+            self.shard_manifest.save()
+            return len(new_texts)
             
         except Exception as e:
             raise Exception(f"Failed to import file: {str(e)}")
             
+    def _summarize_shard(self, snapshot: CorpusSnapshot, path: str) -> Dict[str, Any]:
+        """Số câu, histogram độ dài (bước 10 ký tự) và bảng độ khó x loại nội dung"""
+        counts = {difficulty: {'letters_only': 0, 'with_special': 0, 'other': 0}
+                  for difficulty in ("easy", "medium", "hard")}
+        length_histogram = [0] * 21
+        
+        for length, content_class in zip(snapshot.lengths, snapshot.classes):
+            counts[self._difficulty_of(length)][self._content_name(content_class)] += 1
+            length_histogram[min(length // 10, 20)] += 1
+            
+        stat = os.stat(path)
+        return {
+            'file': os.path.basename(path),
+            'count': len(snapshot.texts),
+            'counts': counts,
+            'length_histogram': length_histogram,
+            'source_size': stat.st_size,
+            'source_mtime_ns': stat.st_mtime_ns
+        }
+        
+    def _refresh_manifest(self) -> None:
+        """Đồng bộ manifest với các file trong corpora/, chỉ đọc lại shard đã thay đổi"""
+        try:
+            names = self.shard_manifest.discover()
+            changed = False
+            
+            for name in list(self.shard_manifest.shards):
+                if name not in names:
+                    del self.shard_manifest.shards[name]
+                    self._shard_cache.discard(name)
+                    changed = True
+                    
+            for name in names:
+                if self.shard_manifest.is_stale(name):
+                    path = self.shard_manifest.shard_path(name)
+                    entry = self.shard_manifest.shards.get(name, {})
+                    entry.update(self._summarize_shard(self._load_corpus_file(path), path))
+                    entry.setdefault('tags', [name])
+                    self.shard_manifest.shards[name] = entry
+                    # Chỉ đọc để lập histogram, shard sẽ được nạp lại khi thật sự cần
+                    self._shard_cache.discard(name)
+                    changed = True
+                    
+            if changed:
+                self.shard_manifest.save()
+        except (IOError, json.JSONDecodeError, ValueError) as e:
+            raise Exception(f"Failed to refresh shard manifest: {str(e)}")
+            
+    def _get_shard(self, name: str) -> CorpusSnapshot:
+        snapshot = self._shard_cache.get(name)
+        if snapshot is None:
+            snapshot = self._load_corpus_file(self.shard_manifest.shard_path(name))
+            self._shard_cache.put(name, snapshot)
+        return snapshot
+        
+    def list_shards(self) -> List[Dict[str, Any]]:
+        """Danh sách shard từ manifest, không cần nạp nội dung"""
+        return [
+            {
+                'name': name,
+                'count': entry.get('count', 0),
+                'tags': entry.get('tags', []),
+                'language': entry.get('language'),
+                'loaded': name in self._shard_cache
+            }
+            for name, entry in sorted(self.shard_manifest.shards.items())
+        ]
+        
+    def has_texts(self) -> bool:
+        return bool(self.texts) or any(entry.get('count', 0) for entry in self.shard_manifest.shards.values())
+        
+    def _pick_from_corpora(self, selectors: List[str], difficulty: str, content_type: str) -> str:
+        """Chọn shard theo trọng số số câu phù hợp (lấy từ manifest), rồi chọn câu trong shard"""
+        candidates = []
+        weights = []
+        
+        if self.DEFAULT_CORPUS in selectors:
+            default_count = len(self._matching_ids(difficulty, content_type))
+            if default_count:
+                candidates.append(self.DEFAULT_CORPUS)
+                weights.append(default_count)
+                
+        content_keys = [content_type] if content_type in ("letters_only", "with_special") else \
+            ["letters_only", "with_special", "other"]
+        difficulties = [difficulty] if difficulty in ("easy", "medium", "hard") else ["easy", "medium", "hard"]
+        
+        for name, entry in self.shard_manifest.shards.items():
+            if not self.shard_manifest.matches(name, selectors):
+                continue
+            counts = entry.get('counts', {})
+            count = sum(counts.get(d, {}).get(c, 0) for d in difficulties for c in content_keys)
+            if count:
+                candidates.append(name)
+                weights.append(count)
+                
+        if not candidates:
+            return ""
+            
+        name = random.choices(candidates, weights=weights)[0]
+        if name == self.DEFAULT_CORPUS:
+            return self.texts[random.choice(self._matching_ids(difficulty, content_type))]
+            
+        snapshot = self._get_shard(name)
+        key = (difficulty, content_type)
+        if key not in snapshot.match_cache:
+            snapshot.match_cache[key] = self._scan_columns(snapshot.lengths, snapshot.classes,
+                                                           difficulty, content_type)
+        matching_ids = snapshot.match_cache[key]
+        if not matching_ids:
+            return ""
+        return snapshot.texts[random.choice(matching_ids)]
+        
+    def _get_near_duplicate_filter(self) -> Optional[NearDuplicateFilter]:
+        """Chỉ mục MinHash của kho hiện tại, dựng một lần rồi cập nhật dần khi import"""
+        if self.near_duplicate_threshold is None:
+            return None
+            
+        if (self._near_duplicate_filter is None
+                or self._near_duplicate_filter.threshold != self.near_duplicate_threshold):
+            near_duplicates = NearDuplicateFilter(threshold=self.near_duplicate_threshold)
+            for text in self.texts:
+                near_duplicates.add(text)
+            self._near_duplicate_filter = near_duplicates
+            
+        return self._near_duplicate_filter
+            
     def get_all_texts(self) -> List[str]:
         return self.texts.copy()
         
@@ -161,10 +615,16 @@ class DataManager:
             raise ValueError("Invalid text index")
             
         self.texts.pop(index)
+        for column in (self._lengths, self._content_classes, self._hashes):
+            column.pop(index)
+        self._corpus_changed()
+        self._near_duplicate_filter = None
         self._save_to_txt(self.txt_file, self.texts)
         
     def clear_all_texts(self) -> None:
         self.texts = []
+        self._rebuild_columns()
+        self._near_duplicate_filter = None
         self._save_to_txt(self.txt_file, self.texts)
             
     def get_text_by_length(self, min_length: int = 0, max_length: int = 10000) -> str:
@@ -197,22 +657,22 @@ class DataManager:
             'total_texts': len(self.texts),
             'txt_file_exists': os.path.exists(self.txt_file),
             'avg_text_length': self._calculate_average_length(),
-            'shortest_text': min(len(text) for text in self.texts) if self.texts else 0,
-            'longest_text': max(len(text) for text in self.texts) if self.texts else 0
+            'shortest_text': min(self._lengths) if self._lengths else 0,
+            'longest_text': max(self._lengths) if self._lengths else 0
         }
         
         # Thêm thống kê theo độ khó nếu có preferences
         if self.current_preferences:
             prefs = self.current_preferences
             difficulty_stats = {
-                'easy_texts': len([t for t in self.texts if 0 <= len(t) <= 25]),
-                'medium_texts': len([t for t in self.texts if 26 <= len(t) <= 60]),
-                'hard_texts': len([t for t in self.texts if len(t) >= 61])
+                'easy_texts': sum(1 for length in self._lengths if length <= 25),
+                'medium_texts': sum(1 for length in self._lengths if 26 <= length <= 60),
+                'hard_texts': sum(1 for length in self._lengths if length >= 61)
             }
             
             content_stats = {
-                'letters_only': len(self._filter_by_content(self.texts, "letters_only")),
-                'with_special': len(self._filter_by_content(self.texts, "with_special"))
+                'letters_only': sum(1 for c in self._content_classes if c & self.CONTENT_LETTERS_ONLY),
+                'with_special': sum(1 for c in self._content_classes if c & self.CONTENT_WITH_SPECIAL)
             }
             
             stats.update({
@@ -226,7 +686,7 @@ class DataManager:
     def _calculate_average_length(self) -> float:
         if not self.texts:
             return 0.0
-        return round(sum(len(text) for text in self.texts) / len(self.texts), 1)
+        return round(sum(self._lengths) / len(self.texts), 1)
         
     def reload_texts(self) -> None:
         self._load_texts()
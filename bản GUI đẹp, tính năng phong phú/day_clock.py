@@ -0,0 +1,77 @@
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:
+    ZoneInfo = None
+
+class DayClock:
+    """Chia timestamp thành ngày theo múi giờ và giờ bắt đầu ngày cấu hình được
+
+    Ngày được biểu diễn bằng số thứ tự (date.toordinal()); ngày N kéo dài từ day_start_hour giờ
+    của ngày N tới day_start_hour giờ của ngày hôm sau (giờ địa phương của timezone, mặc định là
+    múi giờ của máy). Khoảng [bắt đầu, kết thúc) của ngày gần nhất được giữ lại, nên với các bài
+    liên tiếp cùng ngày, ordinal chỉ là hai phép so sánh số thay vì gọi fromtimestamp.
+    """
+
+    def __init__(self, timezone: Optional[str] = None, day_start_hour: int = 0):
+        if not isinstance(day_start_hour, int) or not 0 <= day_start_hour <= 23:
+            raise ValueError("day_start_hour must be an integer between 0 and 23")
+        self.timezone = timezone
+        self.day_start_hour = day_start_hour
+        self.tzinfo = None
+        if timezone is not None:
+            if ZoneInfo is None:
+                raise ValueError("Timezones require Python 3.9+ (zoneinfo)")
+            try:
+                self.tzinfo = ZoneInfo(timezone)
+            except (ZoneInfoNotFoundError, ValueError):
+                raise ValueError(f"Unknown timezone: {timezone}")
+        # (bắt đầu, kết thúc, ordinal) của ngày tra cứu gần nhất; gán một lần nên an toàn giữa các thread
+        self._cached: Tuple[float, float, int] = (0.0, 0.0, 0)
+        self._labels: Dict[int, str] = {}
+
+    def to_json(self) -> Dict[str, Any]:
+        return {'timezone': self.timezone, 'day_start_hour': self.day_start_hour}
+
+    @classmethod
+    def from_json(cls, encoded: Any) -> 'DayClock':
+        """Cấu hình lưu trong header; thiếu thì là mặc định (giờ máy, ngày bắt đầu lúc 0 giờ)"""
+        if not isinstance(encoded, dict):
+            return cls()
+        return cls(encoded.get('timezone'), encoded.get('day_start_hour', 0))
+
+    def local(self, timestamp: float) -> datetime:
+        """Giờ địa phương (không kèm tzinfo) của timestamp theo timezone đã chọn"""
+        if self.tzinfo is None:
+            return datetime.fromtimestamp(timestamp)
+        return datetime.fromtimestamp(timestamp, self.tzinfo).replace(tzinfo=None)
+
+    def day_bounds(self, ordinal: int) -> Tuple[float, float]:
+        """[bắt đầu, kết thúc) của ngày dạng timestamp (ngày có đổi giờ mùa hè dài 23 hoặc 25 giờ)"""
+        start = datetime.combine(date.fromordinal(ordinal), time(self.day_start_hour), self.tzinfo)
+        end = datetime.combine(date.fromordinal(ordinal + 1), time(self.day_start_hour), self.tzinfo)
+        return start.timestamp(), end.timestamp()
+
+    def ordinal(self, timestamp: float) -> int:
+        start, end, ordinal = self._cached
+        if start <= timestamp < end:
+            return ordinal
+        ordinal = (self.local(timestamp) - timedelta(hours=self.day_start_hour)).date().toordinal()
+        start, end = self.day_bounds(ordinal)
+        self._cached = (start, end, ordinal)
+        return ordinal
+
+    def label(self, ordinal: int) -> str:
+        """'YYYY-MM-DD' của ngày (khóa của rollup và sketch theo ngày)"""
+        label = self._labels.get(ordinal)
+        if label is None:
+            label = self._labels[ordinal] = date.fromordinal(ordinal).isoformat()
+        return label
+
+    def day_of(self, timestamp: float) -> str:
+        return self.label(self.ordinal(timestamp))
+
+    def today(self) -> int:
+        return self.ordinal(datetime.now().timestamp())
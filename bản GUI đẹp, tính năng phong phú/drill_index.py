@@ -0,0 +1,69 @@
+import random
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional
+
+class DrillIndex:
+    """Chỉ mục ngược ký tự/bigram -> id câu, dùng để chọn câu luyện các phím hay gõ sai"""
+
+    def __init__(self):
+        self.postings: Dict[str, array] = {}
+        self.size = 0
+
+    @staticmethod
+    def keys_of(text: str) -> set:
+        """Các ký tự và bigram xuất hiện trong câu"""
+        keys = set(text)
+        keys.update(text[i:i + 2] for i in range(len(text) - 1))
+        return keys
+
+    def add(self, texts: Iterable[str]) -> None:
+        """Nối thêm câu vào chỉ mục; id là vị trí tiếp theo trong kho"""
+        postings = self.postings
+        for text in texts:
+            doc_id = self.size
+            for key in self.keys_of(text):
+                posting = postings.get(key)
+                if posting is None:
+                    posting = postings[key] = array('I')
+                posting.append(doc_id)
+            self.size += 1
+
+    def select(self, texts: List[str], key_weights: Dict[str, float], samples: int = 48,
+               top_keys: int = 12, accept: Optional[Callable[[int], bool]] = None) -> Optional[int]:
+        """Lấy mẫu có trọng số trên posting list của các phím yếu nhất, trả về id câu tốt nhất
+
+        Chỉ chấm điểm một số câu ứng viên nên chi phí không phụ thuộc kích thước kho.
+        """
+        weighted = sorted(
+            ((weight, key) for key, weight in key_weights.items()
+             if weight > 0 and key in self.postings),
+            reverse=True
+        )[:top_keys]
+        if not weighted:
+            return None
+
+        weights = [weight for weight, _ in weighted]
+        keys = [key for _, key in weighted]
+        key_weight = dict(zip(keys, weights))
+
+        best_id = None
+        best_score = 0.0
+        seen = set()
+        for key in random.choices(keys, weights=weights, k=samples):
+            posting = self.postings[key]
+            doc_id = posting[random.randrange(len(posting))]
+            if doc_id in seen or doc_id >= len(texts):
+                continue
+            seen.add(doc_id)
+            if accept is not None and not accept(doc_id):
+                continue
+
+            text = texts[doc_id]
+            # Điểm = tổng trọng số các lần xuất hiện phím yếu, chuẩn hóa theo độ dài câu
+            score = sum(key_weight.get(char, 0.0) for char in text)
+            score += sum(key_weight.get(text[i:i + 2], 0.0) for i in range(len(text) - 1))
+            score /= max(len(text), 1) ** 0.5
+            if score > best_score:
+                best_id, best_score = doc_id, score
+
+        return best_id
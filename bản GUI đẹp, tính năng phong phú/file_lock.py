@@ -0,0 +1,48 @@
+import os
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class FileLock:
+    """Khóa tư vấn (advisory) giữa các tiến trình bằng fcntl.flock trên một file .lock
+
+    Dùng làm context manager quanh các thao tác ghi; khóa được cả giữa các thread của
+    cùng một tiến trình vì mỗi lần lấy khóa mở một file descriptor riêng. Trên hệ thống
+    không có fcntl (Windows), khóa không có tác dụng.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> None:
+        if self._fd is not None:
+            raise RuntimeError("Lock is already held")
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except OSError:
+                os.close(fd)
+                raise
+        self._fd = fd
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
@@ -0,0 +1,67 @@
+import hashlib
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+class GhostIndex:
+    """Bài có bản ghi phím tốt nhất (WPM cao nhất) của từng câu, theo hash của câu
+
+    Dùng để chạy đua với "bóng ma" của kỷ lục trên cùng câu. Mỗi câu giữ một bộ
+    (wpm, timestamp, offset bản ghi); bằng WPM thì bài cũ hơn được giữ. Cập nhật O(1) khi lưu bài.
+    """
+
+    def __init__(self):
+        self.best: Dict[int, Tuple[float, float, int]] = {}
+
+    @staticmethod
+    def text_hash(text: str) -> int:
+        """Hash 63 bit (không âm, vừa cột int64) của nội dung câu"""
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') >> 1
+
+    def add(self, result: Dict[str, Any]) -> bool:
+        """Trả về True nếu bài trở thành bóng ma của câu"""
+        text_hash = result.get('text_hash')
+        recording = result.get('recording')
+        wpm = result.get('wpm')
+        if text_hash is None or recording is None or wpm is None:
+            return False
+        current = self.best.get(text_hash)
+        if current is None or wpm > current[0]:
+            self.best[text_hash] = (wpm, result.get('timestamp', 0), recording)
+            return True
+        return False
+
+    def get(self, text_hash: int) -> Optional[Dict[str, Any]]:
+        entry = self.best.get(text_hash)
+        if entry is None:
+            return None
+        wpm, timestamp, recording = entry
+        return {'wpm': wpm, 'timestamp': timestamp, 'recording': recording, 'text_hash': text_hash}
+
+    # ---- lưu trữ ----
+
+    def to_json(self, text_hashes: Optional[Iterable[int]] = None) -> Dict[str, list]:
+        """{hash (chuỗi): [wpm, timestamp, recording]}; text_hashes: chỉ các câu này"""
+        if text_hashes is None:
+            text_hashes = self.best
+        return {str(text_hash): list(self.best[text_hash]) for text_hash in text_hashes
+                if text_hash in self.best}
+
+    @classmethod
+    def from_json(cls, encoded: Any) -> Optional['GhostIndex']:
+        """None nếu thiếu hoặc sai định dạng (sẽ được dựng lại từ kết quả)"""
+        if not isinstance(encoded, dict):
+            return None
+        ghosts = cls()
+        try:
+            for text_hash, (wpm, timestamp, recording) in encoded.items():
+                ghosts.best[int(text_hash)] = (float(wpm), float(timestamp), int(recording))
+        except (TypeError, ValueError):
+            return None
+        return ghosts
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> 'GhostIndex':
+        ghosts = cls()
+        for record in records:
+            ghosts.add(record)
+        return ghosts
@@ -1,16 +1,25 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+import bisect
 import threading
 import time
 from data_manager import DataManager
 from calculator import Calculator
 from statistics_manager import StatisticsManager
+from keystroke_store import KeystrokeStore
+from ghost_index import GhostIndex
+from day_clock import DayClock
 from mode_selection_dialog import ModeSelectionDialog
 
 class TypingTestGUI:
-    def __init__(self, root):
+    # Khoảng cách giữa hai khung hình cập nhật con trỏ bóng ma (ms)
+    GHOST_FRAME_MS = 33
+    # Khoảng cách tối thiểu giữa hai lần đọc bài của phiên bản khác khi cửa sổ được focus (giây)
+    REFRESH_INTERVAL = 2.0
+    
+    def __init__(self, root, profile=None, timezone=None, day_start_hour=0, retention_days=365):
         self.root = root
-        self.root.title("TypingMaster Pro")
+        self.root.title("TypingMaster Pro" if profile is None else f"TypingMaster Pro - {profile}")
         self.root.geometry("1200x800")
         self.root.resizable(True, True)
         
@@ -38,13 +47,35 @@ class TypingTestGUI:
         
         self.data_manager = DataManager()
         self.calculator = Calculator()
-        self.stats_manager = StatisticsManager()
+        # Thống kê được nạp ở thread nền để cửa sổ hiện ngay, thời gian mở không phụ thuộc độ dài
+        # lịch sử; self.stats_manager chờ thread này ở lần dùng đầu tiên (lưu bài, mở Statistics)
+        if profile is not None:
+            StatisticsManager.profile_path("typing_stats.json", profile)  # Tên hồ sơ sai báo lỗi ngay
+        DayClock(timezone, day_start_hour)  # Múi giờ/giờ bắt đầu ngày sai cũng vậy
+        if retention_days is not None and retention_days < 0:
+            raise ValueError("retention_days must be non-negative")
+        self._stats_manager = None
+        self._stats_error = None
+        self._stats_loader = threading.Thread(target=self._load_stats_manager,
+                                              args=(profile, timezone, day_start_hour, retention_days),
+                                              daemon=True)
+        self._stats_loader.start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        # Bài do phiên bản khác (cùng hồ sơ) lưu được đọc khi quay lại cửa sổ, không phải lúc lưu bài
+        self._last_refresh = 0.0
+        self.root.bind("<FocusIn>", self.on_focus_in)
         
         self.current_text = ""
         self.user_input = ""
         self.start_time = None
         self.is_started = False
         self.is_finished = False
+        # (thời điểm, mã phím) của các phím đã gõ trong bài hiện tại
+        self.keystrokes = []
+        # Bóng ma của bài tốt nhất trên câu hiện tại: {'wpm', 'times', 'positions'} hoặc None
+        self.ghost = None
+        self.ghost_start = None
+        self.ghost_job = None
         
         # Word by word mode variables
         self.display_mode = "full_sentence"
@@ -56,6 +87,47 @@ class TypingTestGUI:
         self.current_text = ""
         self.check_initial_state()
         
+    def _load_stats_manager(self, profile, timezone, day_start_hour, retention_days):
+        try:
+            # Ghi thống kê ở thread nền để finish_test không phải chờ đĩa; bài cũ hơn retention_days
+            # ngày (mặc định một năm) được lưu trữ nén để dữ liệu nạp lúc khởi động luôn nhỏ
+            self._stats_manager = StatisticsManager(write_behind=True, profile=profile,
+                                                    retention_days=retention_days,
+                                                    timezone=timezone, day_start_hour=day_start_hour)
+        except Exception as e:
+            self._stats_error = e
+            
+    @property
+    def stats_manager(self):
+        """StatisticsManager, chờ thread nạp nền nếu chưa xong"""
+        self._stats_loader.join()
+        if self._stats_error is not None:
+            raise Exception(f"Failed to load statistics: {str(self._stats_error)}")
+        return self._stats_manager
+        
+    def stats_ready(self):
+        return not self._stats_loader.is_alive()
+        
+    def on_focus_in(self, event=None):
+        now = time.monotonic()
+        if self._stats_manager is None or now - self._last_refresh < self.REFRESH_INTERVAL:
+            return
+        self._last_refresh = now
+        try:
+            self._stats_manager.refresh()
+        except Exception:
+            # Lỗi được báo khi mở cửa sổ thống kê (load_statistics cũng refresh)
+            pass
+            
+    def on_close(self):
+        """Ghi nốt thống kê đang chờ trước khi đóng cửa sổ"""
+        try:
+            self.stats_manager.close()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save statistics: {str(e)}")
+        finally:
+            self.root.destroy()
+            
     def setup_styles(self):
         style = ttk.Style()
         
@@ -258,6 +330,7 @@ class TypingTestGUI:
                                    pady=20,
                                    selectbackground=self.colors['accent'])
         self.text_display.pack(fill=tk.BOTH, expand=True)
+        self.text_display.tag_config("ghost", background=self.colors['gradient_end'], foreground="white")
         
     def setup_input_card(self, parent):
         input_card = self.create_card(parent, "Your Input", row=2, pady=15)
@@ -302,6 +375,7 @@ class TypingTestGUI:
         self.input_entry.bind('<Button-1>', self.on_click)
         self.input_entry.bind('<Return>', self.on_enter_pressed)
         self.input_entry.bind('<space>', self.on_space_pressed)
+        self.input_entry.bind('<KeyPress>', self.record_keystroke)
         
         # Input hint
         hint_label = tk.Label(input_content,
@@ -449,14 +523,16 @@ class TypingTestGUI:
         
     # Keep all the original methods unchanged
     def check_initial_state(self):
-        if not self.data_manager.texts:
+        if not self.data_manager.has_texts():
             self.input_entry.config(state=tk.DISABLED)
         else:
             self.input_entry.config(state=tk.NORMAL)
     
     def show_mode_selection(self):
         """Hiển thị dialog chọn mode"""
-        dialog = ModeSelectionDialog(self.root)
+        if self.data_manager.shard_error:
+            messagebox.showwarning("Corpora", f"Some corpora could not be loaded:\n\n{self.data_manager.shard_error}")
+        dialog = ModeSelectionDialog(self.root, corpora=self.data_manager.list_shards())
         self.root.wait_window(dialog.dialog)
         
         if dialog.result:
@@ -485,11 +561,15 @@ class TypingTestGUI:
         }
         
         mode_info = f"🎯 {difficulty_text[preferences['difficulty']]} • {content_text[preferences['content_type']]} • {display_text[preferences['display_mode']]}"
+        if preferences.get('practice_mode') == "adaptive":
+            mode_info += " • 🎯 Weak keys drill"
+        if preferences.get('corpus'):
+            mode_info += f" • 📚 {', '.join(preferences['corpus'])}"
         self.mode_info_label.config(text=mode_info, fg=self.colors['accent'])
     
     def change_mode(self):
         """Thay đổi mode"""
-        if not self.data_manager.texts:
+        if not self.data_manager.has_texts():
             messagebox.showwarning("No Data", "Please import a file first!")
             return
         
@@ -497,13 +577,18 @@ class TypingTestGUI:
             self.load_new_text()
             
     def load_new_text(self):
-        if not self.data_manager.texts:
+        if not self.data_manager.has_texts():
             messagebox.showwarning("No Data", "Please import a file first!")
             return
             
         try:
             # Sử dụng filtered text theo preferences
-            self.current_text = self.data_manager.get_filtered_text()
+            preferences = self.data_manager.current_preferences or {}
+            if preferences.get('practice_mode') == "adaptive":
+                # Bài luyện phím yếu dựa trên tỉ lệ gõ sai đã lưu
+                self.current_text = self.data_manager.get_drill_text(self.stats_manager.get_key_error_rates())
+            else:
+                self.current_text = self.data_manager.get_filtered_text()
             
             if not self.current_text:
                 messagebox.showwarning("No Match", "No matching sentences found. Loading random sentence...")
@@ -517,9 +602,29 @@ class TypingTestGUI:
             
             self.display_text()
             self.reset_test()
+            self.load_ghost()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load text: {str(e)}")
             
+    def load_ghost(self):
+        """Chuẩn bị bóng ma từ bản ghi phím của bài tốt nhất trên câu hiện tại"""
+        self.ghost = None
+        if not self.stats_ready():
+            return  # Không chờ thống kê đang nạp chỉ để có bóng ma
+        try:
+            ghost = self.stats_manager.get_ghost(self.current_text)
+        except Exception:
+            return  # Không đọc được bản ghi: luyện tập bình thường, không có bóng ma
+        if not ghost or not ghost['keystrokes']:
+            return
+        # Vị trí con trỏ của bóng ma sau mỗi phím, tính trước một lần cho cả bài
+        times, positions, position = [], [], 0
+        for offset_ms, code in ghost['keystrokes']:
+            position = max(position - 1, 0) if code == KeystrokeStore.BACKSPACE else position + 1
+            times.append(offset_ms)
+            positions.append(position)
+        self.ghost = {'wpm': ghost['wpm'], 'times': times, 'positions': positions}
+            
     def display_text(self):
         self.text_display.config(state=tk.NORMAL)
         self.text_display.delete(1.0, tk.END)
@@ -593,6 +698,8 @@ class TypingTestGUI:
     
     def on_space_pressed(self, event):
         """Xử lý khi nhấn space trong word by word mode"""
+        # Binding <space> được ưu tiên hơn <KeyPress> nên phím space được ghi ở đây
+        self.record_keystroke(event)
         if self.display_mode == "word_by_word" and self.is_started:
             typed_word = self.input_entry.get(1.0, tk.END).strip()
             
@@ -619,7 +726,7 @@ class TypingTestGUI:
             return 'break'  # Ngăn space được thêm vào text widget
     
     def reset_test(self):
-        if not self.data_manager.texts:
+        if not self.data_manager.has_texts():
             messagebox.showwarning("No Data", "Please import a file first!")
             return
             
@@ -627,6 +734,8 @@ class TypingTestGUI:
         self.start_time = None
         self.is_started = False
         self.is_finished = False
+        self.keystrokes = []
+        self.stop_ghost()
         
         # Reset word by word mode
         if self.display_mode == "word_by_word":
@@ -681,10 +790,62 @@ class TypingTestGUI:
             if len(self.user_input) >= len(self.current_text):
                 self.finish_test()
         
+    def record_keystroke(self, event):
+        """Ghi lại phím ký tự và BackSpace cho bản ghi phím của bài"""
+        if self.is_finished:
+            return
+        if event.keysym == 'BackSpace':
+            code = KeystrokeStore.BACKSPACE
+        elif event.char and event.char.isprintable():
+            code = ord(event.char)
+        else:
+            return  # Shift, phím mũi tên...
+        self.keystrokes.append((time.time(), code))
+        
     def start_test(self):
         if not self.is_started:
             self.is_started = True
             self.start_time = time.time()
+            if self.ghost:
+                # Bản ghi tính từ phím đầu tiên, nên bóng ma xuất phát cùng phím đầu tiên của bài này
+                self.ghost_start = self.keystrokes[0][0] if self.keystrokes else self.start_time
+                self.ghost_job = self.root.after(self.GHOST_FRAME_MS, self.update_ghost)
+                
+    def update_ghost(self):
+        """Một khung hình của bóng ma: vị trí tại thời điểm hiện tại tìm bằng bisect trên bản ghi"""
+        self.ghost_job = None
+        if not self.ghost or not self.is_started or self.is_finished:
+            return
+        elapsed_ms = (time.time() - self.ghost_start) * 1000
+        index = bisect.bisect_right(self.ghost['times'], elapsed_ms)
+        position = self.ghost['positions'][index - 1] if index else 0
+        self.text_display.tag_remove("ghost", 1.0, tk.END)
+        display_index = self.ghost_display_index(position)
+        if display_index is not None:
+            self.text_display.tag_add("ghost", f"1.{display_index}", f"1.{display_index + 1}")
+            self.text_display.tag_raise("ghost")
+        self.ghost_job = self.root.after(self.GHOST_FRAME_MS, self.update_ghost)
+        
+    def ghost_display_index(self, position):
+        """Vị trí trong text_display của ký tự thứ position trong câu; None nếu không hiển thị"""
+        if self.display_mode != "word_by_word":
+            return position if position < len(self.current_text) else None
+        # Word by word: text_display gồm các từ đã gõ (có thể trong ngoặc), từ hiện tại và 5 từ tiếp theo
+        index = 0
+        for word_index, word in enumerate(self.words_list[:self.current_word_index + 6]):
+            shown = self.completed_words[word_index] if word_index < len(self.completed_words) else word
+            if position <= len(word):
+                # Dấu cách ngay sau từ, hoặc ký tự trong từ (từ gõ sai có thể dài/ngắn hơn)
+                return index + (len(shown) if position == len(word) else min(position, len(shown) - 1))
+            position -= len(word) + 1
+            index += len(shown) + 1
+        return None
+        
+    def stop_ghost(self):
+        if self.ghost_job is not None:
+            self.root.after_cancel(self.ghost_job)
+            self.ghost_job = None
+        self.text_display.tag_remove("ghost", 1.0, tk.END)
             
     def update_real_time_stats(self):
         if not self.is_started or self.start_time is None:
@@ -758,6 +919,7 @@ class TypingTestGUI:
             
         self.is_finished = True
         elapsed_time = time.time() - self.start_time
+        self.stop_ghost()
         
         try:
             if self.display_mode == "word_by_word":
@@ -780,9 +942,22 @@ class TypingTestGUI:
                 'time': elapsed_time,
                 'text_length': len(self.current_text),
                 'user_length': len(self.user_input) if self.display_mode == "full_sentence" else len(" ".join(self.completed_words)),
-                'mode': self.display_mode
+                'mode': self.display_mode,
+                'key_stats': self.collect_key_stats(),
+                # Để tìm bài tốt nhất trên cùng câu làm bóng ma
+                'text_hash': GhostIndex.text_hash(self.current_text)
             }
-            
+            if self.keystrokes:
+                # Thời điểm tính bằng ms kể từ phím đầu tiên
+                first = self.keystrokes[0][0]
+                result['keystrokes'] = [(round((pressed - first) * 1000), code) for pressed, code in self.keystrokes]
+            # Độ khó và loại nội dung của câu (bài luyện phím yếu không lọc theo hai tiêu chí này)
+            preferences = self.data_manager.current_preferences or {}
+            if preferences.get('practice_mode') != "adaptive":
+                for field in ('difficulty', 'content_type'):
+                    if preferences.get(field):
+                        result[field] = preferences[field]
+
             self.stats_manager.save_result(result)
             # Show completion message in a simple messagebox instead of result_text
             mode_text = "Word by Word" if result.get('mode') == "word_by_word" else "Full Sentence"
@@ -794,12 +969,31 @@ Accuracy: {result['accuracy']:.2f}%
 Characters: {result['user_length']}/{result['text_length']}
 
 {self.get_performance_message(result['wpm'], result['accuracy'])}"""
+            if self.ghost:
+                message += f"\n\n👻 Ghost (best on this sentence): {self.ghost['wpm']:.2f} WPM"
             
             messagebox.showinfo("Test Complete", message)
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to calculate results: {str(e)}")
             
+    def collect_key_stats(self):
+        """Thống kê gõ đúng/sai theo ký tự và bigram của bài vừa xong"""
+        if self.display_mode != "word_by_word":
+            return self.calculator.calculate_key_statistics(self.current_text, self.user_input)
+            
+        key_stats = {}
+        for expected_word, typed_word in zip(self.words_list, self.completed_words):
+            # Từ sai được lưu dạng "(từ đã gõ)"
+            if typed_word != expected_word and typed_word.startswith("(") and typed_word.endswith(")"):
+                typed_word = typed_word[1:-1]
+            word_stats = self.calculator.calculate_key_statistics(expected_word, typed_word)
+            for key, (attempts, errors) in word_stats.items():
+                stats = key_stats.setdefault(key, [0, 0])
+                stats[0] += attempts
+                stats[1] += errors
+        return key_stats
+            
     def display_final_results(self, result):
         self.result_text.config(state=tk.NORMAL)
         self.result_text.delete(1.0, tk.END)
@@ -861,14 +1055,16 @@ Mode: {mode_text}
                         with open(filename, 'r', encoding='utf-8') as f:
                             preview = f.read(200)
                             
+                        report = self.data_manager.last_import_report or {}
                         messagebox.showwarning("No Import", 
                             f"No new texts were imported.\n\n" +
                             f"File preview (first 200 chars):\n{preview[:100]}...\n\n" +
-                            "Possible reasons:\n" +
-                            "• All texts already exist\n" +
-                            "• Lines are too short (need 10+ characters)\n" +
-                            "• File encoding issues\n\n" +
-                            "Format: One sentence per line\n" +
+                            f"Sentences found: {report.get('sentences', 0)}\n" +
+                            f"• Already exist: {report.get('duplicates', 0)}\n" +
+                            f"• Near duplicates: {report.get('near_duplicates', 0)}\n" +
+                            f"• Too short (need 10+ characters): {report.get('too_short', 0)}\n" +
+                            f"• Too long (over 5000 characters): {report.get('too_long', 0)}\n\n" +
+                            "Format: plain text, sentences ending with . ! ? (one per line or wrapped paragraphs)\n" +
                             "Example:\n" +
                             "This is the first sentence.\n" +
                             "This is the second sentence.")
@@ -881,7 +1077,7 @@ Mode: {mode_text}
             messagebox.showerror("Import Error", f"Failed to import file:\n\n{str(e)}")
             
     def add_custom_text(self):
-        if not self.data_manager.texts:
+        if not self.data_manager.has_texts():
             messagebox.showwarning("No Data", "Please import a file first!")
             return
             
@@ -974,12 +1170,14 @@ class StatisticsWindow:
         
     def load_statistics(self):
         try:
+            # Gồm cả các bài do cửa sổ ứng dụng khác (cùng hồ sơ) vừa lưu
+            self.stats_manager.refresh()
             stats = self.stats_manager.get_statistics()
             
             self.stats_text.config(state=tk.NORMAL)
             self.stats_text.delete(1.0, tk.END)
             
-            if not stats['results']:
+            if not stats['total_tests']:
                 self.stats_text.insert(1.0, "No typing tests completed yet.")
             else:
                 stats_str = f"""OVERALL STATISTICS
@@ -991,6 +1189,29 @@ Average Accuracy: {stats['avg_accuracy']:.2f}%
 Best Accuracy: {stats['best_accuracy']:.2f}%
 Total Time Practiced: {stats['total_time']:.0f} seconds
 
+PERCENTILES (p50 / p90 / p99)
+=============================
+"""
+                stats_str += self.format_percentiles("All time", stats.get('percentiles'))
+                stats_str += self.format_percentiles("Today", self.stats_manager.get_daily_stats().get('percentiles'))
+                for mode, percentiles in stats.get('mode_percentiles', {}).items():
+                    stats_str += self.format_percentiles(mode, percentiles)
+                    
+                stats_str += """
+LAST 7 DAYS VS PREVIOUS 7 DAYS
+==============================
+"""
+                stats_str += self.format_comparison(self.compare_weeks())
+                
+                stats_str += """
+TOP WPM (All time)
+==================
+"""
+                for i, record in enumerate(self.stats_manager.get_leaderboard('wpm', limit=5), 1):
+                    mode_info = f" ({record['mode']})" if 'mode' in record else ""
+                    stats_str += f"{i:2d}. {record['wpm']:5.1f} WPM | {record.get('accuracy', 0):5.1f}% | {record['date']}{mode_info}\n"
+                    
+                stats_str += """
 RECENT RESULTS (Last 10)
 ========================
 """
@@ -1008,6 +1229,46 @@ RECENT RESULTS (Last 10)
             self.stats_text.insert(1.0, f"Error loading statistics: {str(e)}")
             self.stats_text.config(state=tk.DISABLED)
             
+    def compare_weeks(self):
+        """7 ngày gần nhất (tính cả hôm nay) so với 7 ngày trước đó"""
+        today = self.stats_manager.day_clock.today()
+        label = self.stats_manager.day_clock.label
+        return self.stats_manager.compare((label(today - 6), label(today)), (label(today - 13), label(today - 7)))
+        
+    @staticmethod
+    def format_comparison(comparison):
+        a, b = comparison['a'], comparison['b']
+        if not a['count'] and not b['count']:
+            return "No tests in the last 14 days.\n"
+        text = ""
+        for label, side in (("Last 7 days", a), ("Previous 7 days", b)):
+            if side['count']:
+                text += (f"{label:<16} WPM {side['wpm']['mean']:6.1f} | Acc {side['accuracy']['mean']:5.1f}% "
+                         f"({side['count']} tests)\n")
+            else:
+                text += f"{label:<16} no tests\n"
+        if comparison['delta']['wpm'] is not None:
+            effect = comparison['effect_size']['wpm']
+            effect_info = f" (effect size {effect:+.2f})" if effect is not None else ""
+            text += (f"{'Change':<16} WPM {comparison['delta']['wpm']:+6.1f} | "
+                     f"Acc {comparison['delta']['accuracy']:+5.1f}%{effect_info}\n")
+        for mode, mode_comparison in comparison['modes'].items():
+            if mode_comparison['delta']['wpm'] is not None:
+                text += (f"  {mode[:14]:<14} WPM {mode_comparison['delta']['wpm']:+6.1f} | "
+                         f"Acc {mode_comparison['delta']['accuracy']:+5.1f}% "
+                         f"({mode_comparison['a']['count']} vs {mode_comparison['b']['count']} tests)\n")
+        return text
+        
+    @staticmethod
+    def format_percentiles(label, percentiles):
+        if not percentiles or not percentiles['count']:
+            return ""
+        wpm = percentiles['wpm']
+        accuracy = percentiles['accuracy']
+        return (f"{label[:14]:<14} WPM {wpm['p50']:6.1f} /{wpm['p90']:6.1f} /{wpm['p99']:6.1f} | "
+                f"Acc {accuracy['p50']:5.1f} /{accuracy['p90']:5.1f} /{accuracy['p99']:5.1f}% "
+                f"({percentiles['count']} tests)\n")
+                
     def clear_data(self):
         if messagebox.askyesno("Confirm", 
                               "Are you sure you want to clear all statistics?"):
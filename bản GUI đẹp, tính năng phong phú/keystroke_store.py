@@ -0,0 +1,155 @@
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, Iterable, List, Tuple
+
+from file_lock import FileLock
+
+class KeystrokeStore:
+    """Bản ghi phím của từng bài trong một file nhị phân chỉ ghi nối (<stats>.keystrokes.bin)
+
+    Mỗi bản ghi: 'KS' + độ dài payload (uint32) + CRC32 của payload (uint32) + payload nén zlib.
+    Payload trước khi nén là chuỗi varint: số phím, rồi với mỗi phím là số ms kể từ phím trước
+    và mã phím (code point Unicode, BACKSPACE = 8). Khoảng cách 100-300 ms chiếm 2 byte và ký tự
+    ASCII 1 byte, nên mỗi phím tốn khoảng 3 byte trước khi nén.
+    Kết quả chỉ lưu vị trí (offset) của bản ghi; file chỉ được đọc khi cần xem lại một bài.
+
+    Ghi hai bước để luồng giao diện không chạm đĩa: reserve() cấp offset từ cuối file đã biết,
+    write() (trên thread ghi nền) ghi bản ghi vào đó. Nếu tiến trình khác đã ghi vào chỗ đã dành,
+    bản ghi được ghi vào cuối file và offset mới được ghi nhận trong relocated.
+    """
+
+    MAGIC = b'KS'
+    _FRAME = struct.Struct('<2sII')
+    BACKSPACE = 8
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_file = path + '.lock'
+        self._lock = threading.Lock()
+        # Cuối file theo các chỗ đã dành (None: chưa đọc kích thước file)
+        self._end = None
+        # offset đã dành -> offset thực sự được ghi, cho các bản ghi phải chuyển chỗ
+        self.relocated: Dict[int, int] = {}
+
+    def size(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    # ---- mã hóa ----
+
+    @staticmethod
+    def _write_varint(buffer: bytearray, value: int) -> None:
+        while value >= 0x80:
+            buffer.append(value & 0x7f | 0x80)
+            value >>= 7
+        buffer.append(value)
+
+    @staticmethod
+    def _read_varint(data: bytes, position: int) -> Tuple[int, int]:
+        value = shift = 0
+        while True:
+            if position >= len(data):
+                raise ValueError("Truncated keystroke recording")
+            byte = data[position]
+            position += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value, position
+            shift += 7
+
+    @classmethod
+    def encode(cls, events: Iterable[Tuple[int, int]]) -> bytes:
+        """Payload nén của các cặp (ms kể từ đầu bài, mã phím), thời điểm không giảm dần"""
+        events = list(events)
+        buffer = bytearray()
+        cls._write_varint(buffer, len(events))
+        previous = 0
+        for offset_ms, code in events:
+            offset_ms, code = int(offset_ms), int(code)
+            if offset_ms < previous or code < 0:
+                raise ValueError("Keystroke times must be non-decreasing and codes non-negative")
+            cls._write_varint(buffer, offset_ms - previous)
+            cls._write_varint(buffer, code)
+            previous = offset_ms
+        return zlib.compress(bytes(buffer), 9)
+
+    @classmethod
+    def decode(cls, payload: bytes) -> List[Tuple[int, int]]:
+        data = zlib.decompress(payload)
+        count, position = cls._read_varint(data, 0)
+        events = []
+        elapsed = 0
+        for _ in range(count):
+            delta, position = cls._read_varint(data, position)
+            code, position = cls._read_varint(data, position)
+            elapsed += delta
+            events.append((elapsed, code))
+        return events
+
+    # ---- đọc / ghi ----
+
+    def append(self, events: Iterable[Tuple[int, int]]) -> int:
+        """Ghi một bản ghi vào cuối file, trả về offset của nó"""
+        payload = self.encode(events)
+        return self.write(self.reserve(payload), payload)
+
+    def sync(self) -> None:
+        """Đọc lại kích thước file để các chỗ dành sau không trùng phần tiến trình khác đã ghi"""
+        size = self.size()
+        with self._lock:
+            self._end = max(self._end or 0, size)
+
+    def reserve(self, payload: bytes) -> int:
+        """Dành chỗ cho payload (đã mã hóa bằng encode) ở cuối file, trả về offset; chưa ghi gì"""
+        if self._end is None:
+            self.sync()
+        with self._lock:
+            offset = self._end
+            self._end += self._FRAME.size + len(payload)
+        return offset
+
+    def write(self, offset: int, payload: bytes) -> int:
+        """Ghi payload vào chỗ đã dành bằng reserve; trả về offset thực sự được ghi"""
+        frame = self._FRAME.pack(self.MAGIC, len(payload), zlib.crc32(payload)) + payload
+        # Khóa để tiến trình khác không chen vào giữa lúc đọc cuối file và lúc ghi
+        with FileLock(self.lock_file):
+            with open(self.path, 'a+b') as f:
+                end = f.seek(0, os.SEEK_END)
+                with self._lock:
+                    # Chỗ đã dành bị tiến trình khác ghi đè lên: chuyển xuống sau mọi chỗ đã dành
+                    target = offset if end <= offset else max(end, self._end)
+                    self._end = max(self._end or 0, target + len(frame))
+                    if target != offset:
+                        self.relocated[offset] = target
+                # Chỗ dành trước chưa được ghi (lần ghi lỗi): để trống, bản ghi sau vẫn đúng offset
+                f.write(b'\0' * (target - end) + frame)
+        return target
+
+    def take_relocated(self) -> Dict[int, int]:
+        """Lấy và xóa bảng offset đã dành -> offset đã ghi"""
+        with self._lock:
+            relocated, self.relocated = self.relocated, {}
+        return relocated
+
+    def read(self, offset: int) -> List[Tuple[int, int]]:
+        """Các cặp (ms kể từ đầu bài, mã phím) của bản ghi tại offset"""
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            header = f.read(self._FRAME.size)
+            if len(header) != self._FRAME.size:
+                raise ValueError("Invalid keystroke recording offset")
+            magic, length, checksum = self._FRAME.unpack(header)
+            payload = f.read(length)
+        if magic != self.MAGIC or len(payload) != length or zlib.crc32(payload) != checksum:
+            raise ValueError("Corrupted keystroke recording")
+        return self.decode(payload)
+
+    def clear(self) -> None:
+        """Xóa mọi bản ghi (khi dữ liệu bị thay bởi import hoặc xóa)"""
+        with FileLock(self.lock_file):
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            with self._lock:
+                self._end = 0
+                self.relocated = {}
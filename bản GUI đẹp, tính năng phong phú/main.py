@@ -1,10 +1,24 @@
+import argparse
 import tkinter as tk
 from gui_manager import TypingTestGUI
 
 def main():
+    parser = argparse.ArgumentParser(description="TypingMaster Pro")
+    parser.add_argument('--profile', help="Tên hồ sơ người dùng (mỗi hồ sơ có thống kê riêng)")
+    parser.add_argument('--timezone', help="Múi giờ dùng để chia ngày trong thống kê, ví dụ Asia/Ho_Chi_Minh "
+                                           "(mặc định múi giờ của máy)")
+    parser.add_argument('--day-start-hour', type=int, default=0,
+                        help="Giờ bắt đầu một ngày mới trong thống kê, 0-23 (mặc định 0)")
+    parser.add_argument('--retention-days', type=int, default=365,
+                        help="Bài cũ hơn số ngày này được lưu trữ nén theo tháng (mặc định 365)")
+    parser.add_argument('--no-archive', action='store_true',
+                        help="Không lưu trữ bài cũ, giữ mọi bài trong log")
+    args = parser.parse_args()
+    
     root = tk.Tk()
-    app = TypingTestGUI(root)
+    app = TypingTestGUI(root, profile=args.profile, timezone=args.timezone, day_start_hour=args.day_start_hour,
+                        retention_days=None if args.no_archive else args.retention_days)
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
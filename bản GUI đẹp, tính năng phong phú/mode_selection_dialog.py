@@ -1,10 +1,10 @@
 import tkinter as tk
 from tkinter import ttk
 import re
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 class ModeSelectionDialog:
-    def __init__(self, parent):
+    def __init__(self, parent, corpora: Optional[List[Dict[str, Any]]] = None):
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("Chọn chế độ luyện tập")
         self.dialog.geometry("550x700")
@@ -19,6 +19,8 @@ class ModeSelectionDialog:
         self.dialog.geometry(f"550x700+{x}+{y}")
         
         self.result = None
+        self.corpora = corpora or []
+        self.corpus_vars = {}
         self.canvas = None  # Store canvas reference
         self.setup_ui()
         
@@ -119,6 +121,44 @@ class ModeSelectionDialog:
         ttk.Radiobutton(display_frame, text="Hiển thị từng từ (Word by Word) - Tập trung từng từ một", 
                        variable=self.display_var, value="word_by_word").pack(anchor=tk.W, pady=5)
         
+        # Practice Mode Section
+        practice_frame = ttk.LabelFrame(main_frame, text="4. Kiểu bài luyện", 
+                                       padding="20")
+        practice_frame.pack(fill=tk.X, pady=(0, 25))
+        
+        self.practice_var = tk.StringVar(value="normal")
+        
+        practice_desc = ttk.Label(practice_frame, 
+                                 text="Chọn cách lấy câu cho mỗi bài:",
+                                 font=("Arial", 10), foreground="gray")
+        practice_desc.pack(anchor=tk.W, pady=(0, 10))
+        
+        ttk.Radiobutton(practice_frame, text="Ngẫu nhiên theo độ khó và loại nội dung", 
+                       variable=self.practice_var, value="normal").pack(anchor=tk.W, pady=5)
+        ttk.Radiobutton(practice_frame, text="Luyện phím yếu - Ưu tiên câu chứa ký tự bạn hay gõ sai", 
+                       variable=self.practice_var, value="adaptive").pack(anchor=tk.W, pady=5)
+        
+        # Corpus Section (chỉ hiện khi có shard trong thư mục corpora)
+        if self.corpora:
+            corpus_frame = ttk.LabelFrame(main_frame, text="5. Kho câu", 
+                                         padding="20")
+            corpus_frame.pack(fill=tk.X, pady=(0, 25))
+            
+            corpus_desc = ttk.Label(corpus_frame, 
+                                   text="Chọn kho câu để luyện tập (chỉ kho được chọn mới được nạp):",
+                                   font=("Arial", 10), foreground="gray")
+            corpus_desc.pack(anchor=tk.W, pady=(0, 10))
+            
+            self.corpus_vars["default"] = tk.BooleanVar(value=True)
+            ttk.Checkbutton(corpus_frame, text="DATA.txt (mặc định)", 
+                           variable=self.corpus_vars["default"]).pack(anchor=tk.W, pady=5)
+            
+            for corpus in self.corpora:
+                self.corpus_vars[corpus['name']] = tk.BooleanVar(value=False)
+                tags = f" [{', '.join(corpus['tags'])}]" if corpus.get('tags') else ""
+                ttk.Checkbutton(corpus_frame, text=f"{corpus['name']} - {corpus['count']} câu{tags}", 
+                               variable=self.corpus_vars[corpus['name']]).pack(anchor=tk.W, pady=5)
+        
         # Tips Section
         tips_frame = ttk.LabelFrame(main_frame, text="Gợi ý", 
                                    padding="20")
@@ -161,6 +201,9 @@ class ModeSelectionDialog:
         self.difficulty_var.trace('w', self.update_preview)
         self.content_var.trace('w', self.update_preview)
         self.display_var.trace('w', self.update_preview)
+        self.practice_var.trace('w', self.update_preview)
+        for corpus_var in self.corpus_vars.values():
+            corpus_var.trace('w', self.update_preview)
         
         # Bind mousewheel to canvas for scrolling with proper error handling
         def _on_mousewheel(event):
@@ -197,18 +240,37 @@ class ModeSelectionDialog:
             "word_by_word": "Hiển thị từng từ"
         }
         
+        practice_text = {
+            "normal": "Ngẫu nhiên",
+            "adaptive": "Luyện phím yếu"
+        }
+        
         preview = f"""Cấu hình hiện tại:
 • Độ khó: {difficulty_text[self.difficulty_var.get()]}
 • Nội dung: {content_text[self.content_var.get()]}
-• Hiển thị: {display_text[self.display_var.get()]}"""
+• Hiển thị: {display_text[self.display_var.get()]}
+• Bài luyện: {practice_text[self.practice_var.get()]}"""
+        
+        selected_corpora = self.get_selected_corpora()
+        if selected_corpora:
+            preview += f"\n• Kho câu: {', '.join(selected_corpora)}"
         
         self.preview_label.config(text=preview, foreground="black")
         
+    def get_selected_corpora(self):
+        """Danh sách kho được chọn; None nếu chỉ dùng DATA.txt mặc định"""
+        selected = [name for name, var in self.corpus_vars.items() if var.get()]
+        if not selected or selected == ["default"]:
+            return None
+        return selected
+        
     def confirm(self):
         self.result = {
             'difficulty': self.difficulty_var.get(),
             'content_type': self.content_var.get(),
-            'display_mode': self.display_var.get()
+            'display_mode': self.display_var.get(),
+            'practice_mode': self.practice_var.get(),
+            'corpus': self.get_selected_corpora()
         }
         self.cleanup_and_close()
         
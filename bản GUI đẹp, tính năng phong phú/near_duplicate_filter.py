@@ -0,0 +1,139 @@
+import re
+import zlib
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+class NearDuplicateFilter:
+    """Lọc câu gần trùng bằng MinHash (one-permutation) + LSH, chạy dạng streaming"""
+
+    _PUNCTUATION = re.compile(r'[^\w\s]', re.UNICODE)
+    _WHITESPACE = re.compile(r'\s+')
+    _MAX_HASH = 0xFFFFFFFF
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, shingle_size: int = 4):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("Threshold must be between 0 and 1")
+        if num_perm < 4:
+            raise ValueError("num_perm must be at least 4")
+        if shingle_size < 1:
+            raise ValueError("shingle_size must be at least 1")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = self._choose_bands(threshold, num_perm)
+
+        # Mỗi câu chiếm đúng num_perm giá trị 32-bit trong một mảng phẳng
+        self._signatures = array('I')
+        self._buckets: List[Dict[int, int]] = [{} for _ in range(self.bands)]
+
+    @staticmethod
+    def _choose_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+        """Chọn (bands, rows) sao cho ngưỡng LSH (1/b)^(1/r) gần threshold nhất"""
+        best = (num_perm, 1)
+        best_gap = float('inf')
+        for rows in range(1, num_perm + 1):
+            if num_perm % rows:
+                continue
+            bands = num_perm // rows
+            gap = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+            if gap < best_gap:
+                best, best_gap = (bands, rows), gap
+        return best
+
+    def __len__(self) -> int:
+        return len(self._signatures) // self.num_perm
+
+    def normalize(self, text: str) -> str:
+        """Chuẩn hóa để so sánh: bỏ dấu câu, gộp khoảng trắng, casefold"""
+        text = self._PUNCTUATION.sub(' ', text.casefold())
+        return self._WHITESPACE.sub(' ', text).strip()
+
+    def signature(self, normalized: str) -> array:
+        k = self.num_perm
+        empty = self._MAX_HASH
+        slots = [empty] * k
+        size = self.shingle_size
+        data = normalized.encode('utf-8')
+
+        if len(data) <= size:
+            shingles = {data}
+        else:
+            shingles = {data[i:i + size] for i in range(len(data) - size + 1)}
+
+        # One-permutation hashing: một hash cho mỗi shingle, chia vào k ngăn
+        crc32 = zlib.crc32
+        for shingle in shingles:
+            rank, slot = divmod(crc32(shingle), k)
+            if rank < slots[slot]:
+                slots[slot] = rank
+
+        if empty in slots:
+            self._densify(slots)
+        return array('I', slots)
+
+    def _densify(self, slots: List[int]) -> None:
+        """Điền ngăn rỗng bằng giá trị của ngăn không rỗng kế tiếp (rotation densification)"""
+        k = self.num_perm
+        empty = self._MAX_HASH
+        original = list(slots)
+        if all(value == empty for value in original):
+            return
+
+        for slot in range(k):
+            if original[slot] != empty:
+                continue
+            offset = 1
+            while original[(slot + offset) % k] == empty:
+                offset += 1
+            # Cộng offset để ngăn mượn không trùng hệt ngăn gốc
+            slots[slot] = (original[(slot + offset) % k] + offset * 0x9E3779B1) & 0xFFFFFFFF
+
+    def _band_keys(self, signature: array) -> List[int]:
+        rows = self.rows
+        return [hash(tuple(signature[b * rows:(b + 1) * rows])) for b in range(self.bands)]
+
+    def _similarity(self, signature: array, doc_id: int) -> float:
+        k = self.num_perm
+        start = doc_id * k
+        stored = self._signatures[start:start + k]
+        matches = sum(1 for a, b in zip(signature, stored) if a == b)
+        return matches / k
+
+    def find_duplicate(self, text: str) -> Optional[int]:
+        """Trả về id của câu gần trùng đã biết, hoặc None"""
+        signature = self.signature(self.normalize(text))
+        return self._query(signature, self._band_keys(signature))
+
+    def _query(self, signature: array, keys: List[int]) -> Optional[int]:
+        checked = set()
+        for band, key in enumerate(keys):
+            doc_id = self._buckets[band].get(key)
+            if doc_id is None or doc_id in checked:
+                continue
+            checked.add(doc_id)
+            if self._similarity(signature, doc_id) >= self.threshold:
+                return doc_id
+        return None
+
+    def add(self, text: str) -> int:
+        """Thêm câu vào chỉ mục, không kiểm tra trùng; trả về id"""
+        signature = self.signature(self.normalize(text))
+        return self._insert(signature, self._band_keys(signature))
+
+    def _insert(self, signature: array, keys: List[int]) -> int:
+        doc_id = len(self)
+        self._signatures.extend(signature)
+        for band, key in enumerate(keys):
+            # Chỉ giữ câu đầu tiên của mỗi bucket để bộ nhớ không phình theo cụm trùng
+            self._buckets[band].setdefault(key, doc_id)
+        return doc_id
+
+    def check_and_add(self, text: str) -> bool:
+        """Thêm câu nếu chưa có câu gần trùng; trả về True nếu câu là mới"""
+        signature = self.signature(self.normalize(text))
+        keys = self._band_keys(signature)
+        if self._query(signature, keys) is not None:
+            return False
+        self._insert(signature, keys)
+        return True
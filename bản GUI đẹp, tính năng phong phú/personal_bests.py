@@ -0,0 +1,98 @@
+import heapq
+import itertools
+from typing import Any, Dict, Iterable, List, Optional
+
+class PersonalBests:
+    """Top-K bài theo từng chỉ số (wpm, accuracy, time, user_length), cho toàn bộ và theo mode
+
+    Mỗi danh sách là một min-heap K phần tử: thêm một bài tốn O(log K) nên kỷ lục được cập nhật
+    ngay khi lưu thay vì quét lại lịch sử. Bằng nhau thì bài cũ hơn đứng trước.
+    """
+
+    FIELDS = ('wpm', 'accuracy', 'time', 'user_length')
+    # Các trường giữ lại của mỗi bài trong bảng kỷ lục
+    RECORD_FIELDS = ('wpm', 'accuracy', 'time', 'user_length', 'timestamp', 'mode', 'difficulty')
+    LIMIT = 10
+
+    def __init__(self, limit: int = LIMIT):
+        self.limit = limit
+        self.overall = self._empty()
+        self.modes: Dict[str, Dict[str, list]] = {}
+        # Phân biệt các phần tử bằng nhau trong heap (dict không so sánh được)
+        self._counter = itertools.count()
+
+    def _empty(self) -> Dict[str, list]:
+        return {field: [] for field in self.FIELDS}
+
+    def add(self, result: Dict[str, Any]) -> None:
+        # None và NaN là giá trị thiếu
+        record = {field: result[field] for field in self.RECORD_FIELDS
+                  if result.get(field) is not None and result[field] == result[field]}
+        timestamp = record.get('timestamp', 0)
+        targets = [self.overall]
+        mode = record.get('mode')
+        if mode is not None:
+            if mode not in self.modes:
+                self.modes[mode] = self._empty()
+            targets.append(self.modes[mode])
+        for field in self.FIELDS:
+            value = record.get(field)
+            if value is None:
+                continue
+            entry = (value, -timestamp, next(self._counter), record)
+            for target in targets:
+                heap = target[field]
+                if len(heap) < self.limit:
+                    heapq.heappush(heap, entry)
+                elif entry[:2] > heap[0][:2]:
+                    heapq.heapreplace(heap, entry)
+
+    def top(self, field: str, mode: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Các bài tốt nhất theo field (giảm dần), trong toàn bộ hoặc một mode"""
+        if field not in self.FIELDS:
+            raise ValueError(f"Unsupported personal best field: {field}")
+        target = self.overall if mode is None else self.modes.get(mode, self._empty())
+        entries = sorted(target[field], key=lambda entry: entry[:2], reverse=True)
+        return [entry[3] for entry in entries[:limit or self.limit]]
+
+    def best(self, field: str) -> Optional[Dict[str, Any]]:
+        records = self.top(field, limit=1)
+        return records[0] if records else None
+
+    # ---- lưu trữ ----
+
+    def to_json(self) -> List[Dict[str, Any]]:
+        """Các bài xuất hiện trong ít nhất một bảng (mỗi bài một lần)"""
+        records = {}
+        for target in [self.overall, *self.modes.values()]:
+            for heap in target.values():
+                for entry in heap:
+                    records[id(entry[3])] = entry[3]
+        return list(records.values())
+
+    @classmethod
+    def from_json(cls, encoded: Any, limit: int = LIMIT) -> Optional['PersonalBests']:
+        """None nếu thiếu hoặc sai định dạng (sẽ được dựng lại từ kết quả)"""
+        if not isinstance(encoded, list):
+            return None
+        try:
+            return cls.from_records(encoded, limit)
+        except (AttributeError, TypeError):
+            return None
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], limit: int = LIMIT) -> 'PersonalBests':
+        bests = cls(limit)
+        for record in records:
+            bests.add(record)
+        return bests
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple], limit: int = LIMIT) -> 'PersonalBests':
+        """Từ các tuple dạng iter_rows
+        (timestamp, wpm, accuracy, time, text_length, user_length, mode, difficulty, content_type)"""
+        bests = cls(limit)
+        for timestamp, wpm, accuracy, time, _, user_length, mode, difficulty, _ in rows:
+            bests.add({'wpm': wpm, 'accuracy': accuracy, 'time': time, 'user_length': user_length,
+                       'timestamp': timestamp, 'mode': mode, 'difficulty': difficulty})
+        return bests
@@ -0,0 +1,93 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Sequence
+
+from running_stats import RunningStats
+
+class ProgressSeries:
+    """Gom nhóm theo thời gian và giảm điểm (LTTB) cho biểu đồ tiến độ"""
+
+    BUCKETS = ('hour', 'day', 'week', 'month')
+
+    @staticmethod
+    def bucket_start(moment: datetime, bucket: str) -> datetime:
+        """Thời điểm bắt đầu của nhóm chứa moment (tuần bắt đầu từ thứ Hai)"""
+        if bucket == 'hour':
+            return moment.replace(minute=0, second=0, microsecond=0)
+        day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        if bucket == 'day':
+            return day
+        if bucket == 'week':
+            return day - timedelta(days=day.weekday())
+        if bucket == 'month':
+            return day.replace(day=1)
+        raise ValueError(f"Unsupported bucket: {bucket}")
+
+    @classmethod
+    def choose_bucket(cls, start: date, end: date, max_points: int) -> str:
+        """Nhóm nhỏ nhất mà số nhóm trong khoảng không vượt quá max_points"""
+        days = (end - start).days + 1
+        if days * 24 <= max_points:
+            return 'hour'
+        if days <= max_points:
+            return 'day'
+        if days / 7 <= max_points:
+            return 'week'
+        return 'month'
+
+    @classmethod
+    def merge_rollups(cls, rollups: Dict[str, Dict[str, RunningStats]], start: date, end: date,
+                      bucket: str, fields: Sequence[str]) -> Dict[datetime, Dict[str, RunningStats]]:
+        """Gộp rollup theo ngày trong khoảng start..end thành rollup theo tuần/tháng (hoặc ngày)"""
+        start_day, end_day = start.isoformat(), end.isoformat()
+        buckets = {}
+        for day, rollup in rollups.items():
+            if not start_day <= day <= end_day:
+                continue
+            key = cls.bucket_start(datetime.fromisoformat(day), bucket)
+            merged = buckets.get(key)
+            if merged is None:
+                merged = buckets[key] = {field: RunningStats() for field in fields}
+            for field in fields:
+                merged[field].merge(rollup[field])
+        return buckets
+
+    @staticmethod
+    def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+        """Largest-Triangle-Three-Buckets: chỉ số của threshold điểm giữ rõ nhất hình dạng chuỗi
+
+        xs phải tăng dần; điểm đầu và cuối luôn được giữ.
+        """
+        count = len(xs)
+        if threshold >= count:
+            return list(range(count))
+        if threshold <= 0:
+            return []
+        if threshold == 1:
+            return [count - 1]
+        if threshold == 2:
+            return [0, count - 1]
+
+        every = (count - 2) / (threshold - 2)
+        selected = [0]
+        anchor = 0
+        for i in range(threshold - 2):
+            # Trung bình của nhóm kế tiếp là đỉnh thứ ba của tam giác
+            next_start = int((i + 1) * every) + 1
+            next_end = min(int((i + 2) * every) + 1, count)
+            span = next_end - next_start
+            average_x = sum(xs[next_start:next_end]) / span
+            average_y = sum(ys[next_start:next_end]) / span
+
+            anchor_x, anchor_y = xs[anchor], ys[anchor]
+            best_area = -1.0
+            best = start = int(i * every) + 1
+            for j in range(start, int((i + 1) * every) + 1):
+                area = abs((anchor_x - average_x) * (ys[j] - anchor_y)
+                           - (anchor_x - xs[j]) * (average_y - anchor_y))
+                if area > best_area:
+                    best_area = area
+                    best = j
+            selected.append(best)
+            anchor = best
+        selected.append(count - 1)
+        return selected
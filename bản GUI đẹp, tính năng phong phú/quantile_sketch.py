@@ -0,0 +1,262 @@
+import bisect
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+class TDigest:
+    """t-digest dạng merging: ước lượng phân vị với bộ nhớ giới hạn, gộp được
+
+    Các giá trị được gom thành centroid (mean, weight); centroid ở hai đuôi phân phối
+    nhỏ hơn nên p90/p99 chính xác hơn trung vị. Số centroid tối đa khoảng compression,
+    khi ít giá trị thì mỗi giá trị là một centroid và kết quả là chính xác.
+    """
+
+    __slots__ = ('compression', 'means', 'weights', 'count', 'minimum', 'maximum', '_buffer')
+
+    def __init__(self, compression: float = 100):
+        self.compression = compression
+        self.means: List[float] = []
+        self.weights: List[float] = []
+        self.count = 0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+        # (mean, weight) chưa gộp vào các centroid
+        self._buffer: List[Tuple[float, float]] = []
+
+    def add(self, value: float, weight: float = 1) -> None:
+        self._buffer.append((value, weight))
+        self.count += weight
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other: 'TDigest') -> None:
+        if not other.count:
+            return
+        self._buffer.extend(zip(other.means, other.weights))
+        self._buffer.extend(other._buffer)
+        self.count += other.count
+        self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+        self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def _k(self, q: float) -> float:
+        """Hàm tỉ lệ k1: k(q) = δ/(2π)·asin(2q - 1)"""
+        return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+    def _q(self, k: float) -> float:
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        items = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+        total = self.count
+        means, weights = [], []
+        mean, weight = items[0]
+        done = 0.0
+        limit = self._q(self._k(0.0) + 1) * total
+        for item_mean, item_weight in items[1:]:
+            if done + weight + item_weight <= limit:
+                weight += item_weight
+                mean += (item_mean - mean) * item_weight / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                done += weight
+                limit = self._q(self._k(done / total) + 1) * total
+                mean, weight = item_mean, item_weight
+        means.append(mean)
+        weights.append(weight)
+        self.means, self.weights = means, weights
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Phân vị q (0..1), nội suy tuyến tính giữa tâm các centroid; None nếu chưa có giá trị"""
+        self._compress()
+        if not self.count:
+            return None
+        if len(self.means) == 1:
+            return self.means[0]
+        # Vị trí theo trọng số; với centroid đơn lẻ trùng với nội suy giữa các giá trị đã sắp xếp
+        target = min(max(q, 0.0), 1.0) * (self.count - 1) + 0.5
+        positions = [0.0]
+        values = [self.minimum]
+        cumulative = 0.0
+        for mean, weight in zip(self.means, self.weights):
+            positions.append(cumulative + weight / 2)
+            values.append(mean)
+            cumulative += weight
+        positions.append(cumulative)
+        values.append(self.maximum)
+        index = bisect.bisect_left(positions, target)
+        if index == 0:
+            return values[0]
+        if index >= len(positions):
+            return values[-1]
+        left, right = positions[index - 1], positions[index]
+        if right == left:
+            return values[index]
+        return values[index - 1] + (values[index] - values[index - 1]) * (target - left) / (right - left)
+
+    def moments(self) -> Tuple[float, float, float]:
+        """(count, tổng, tổng bình phương) suy ra từ các centroid
+
+        Tổng là chính xác; tổng bình phương bỏ qua độ phân tán bên trong từng centroid nên
+        hơi nhỏ hơn thực tế khi centroid gom nhiều giá trị (chính xác khi có ít bài).
+        """
+        self._compress()
+        total = sum(mean * weight for mean, weight in zip(self.means, self.weights))
+        squares = sum(mean * mean * weight for mean, weight in zip(self.means, self.weights))
+        return self.count, total, squares
+
+    def to_list(self) -> list:
+        """[min, max, mean1, weight1, mean2, weight2, ...]"""
+        self._compress()
+        encoded = [self.minimum, self.maximum]
+        for mean, weight in zip(self.means, self.weights):
+            encoded.append(mean)
+            encoded.append(weight)
+        return encoded
+
+    @classmethod
+    def from_list(cls, encoded: list, compression: float = 100) -> 'TDigest':
+        if len(encoded) < 2 or len(encoded) % 2:
+            raise ValueError("Invalid t-digest encoding")
+        digest = cls(compression)
+        digest.means = [float(value) for value in encoded[2::2]]
+        digest.weights = [float(value) for value in encoded[3::2]]
+        digest.count = sum(digest.weights)
+        if digest.count:
+            digest.minimum = float(encoded[0])
+            digest.maximum = float(encoded[1])
+        return digest
+
+class QuantileSketches:
+    """t-digest của wpm/accuracy theo (ngày, mode), cộng bản gộp toàn bộ và theo mode
+
+    Phân vị của một khoảng ngày được tính bằng cách gộp sketch của các ngày trong khoảng.
+    Bài không có mode được tính vào ngày và toàn bộ nhưng không vào thống kê theo mode.
+    """
+
+    FIELDS = ('wpm', 'accuracy')
+    PERCENTILES = (50, 90, 99)
+    # Key của bài không có mode trong sketch theo ngày
+    NO_MODE = ''
+
+    def __init__(self, compression: float = 100):
+        self.compression = compression
+        self.daily: Dict[str, Dict[str, Dict[str, TDigest]]] = {}
+        self.overall = self._empty()
+        self.modes: Dict[str, Dict[str, TDigest]] = {}
+
+    def _empty(self) -> Dict[str, TDigest]:
+        return {field: TDigest(self.compression) for field in self.FIELDS}
+
+    def add(self, day: str, mode: Optional[str], result: Dict[str, Any]) -> None:
+        mode = mode or self.NO_MODE
+        targets = [self.overall, self._daily(day, mode)]
+        if mode != self.NO_MODE:
+            if mode not in self.modes:
+                self.modes[mode] = self._empty()
+            targets.append(self.modes[mode])
+        for field in self.FIELDS:
+            value = result[field]
+            for target in targets:
+                target[field].add(value)
+
+    def _daily(self, day: str, mode: str) -> Dict[str, TDigest]:
+        modes = self.daily.setdefault(day, {})
+        if mode not in modes:
+            modes[mode] = self._empty()
+        return modes[mode]
+
+    def _load(self, day: str, mode: str, digests: Dict[str, TDigest]) -> None:
+        self.daily.setdefault(day, {})[mode] = digests
+        for field in self.FIELDS:
+            self.overall[field].merge(digests[field])
+        if mode != self.NO_MODE:
+            if mode not in self.modes:
+                self.modes[mode] = self._empty()
+            for field in self.FIELDS:
+                self.modes[mode][field].merge(digests[field])
+
+    def range(self, start_day: Optional[str] = None, end_day: Optional[str] = None,
+              mode: Optional[str] = None) -> Dict[str, TDigest]:
+        """Sketch gộp của các ngày start_day..end_day (tính cả hai đầu, 'YYYY-MM-DD')"""
+        if start_day is None and end_day is None:
+            return self.overall if mode is None else self.modes.get(mode, self._empty())
+        merged = self._empty()
+        for day, modes in self.daily.items():
+            if start_day is not None and day < start_day or end_day is not None and day > end_day:
+                continue
+            for day_mode, digests in modes.items():
+                if mode is not None and day_mode != mode:
+                    continue
+                for field in self.FIELDS:
+                    merged[field].merge(digests[field])
+        return merged
+
+    def by_mode(self, days: Iterable[str]) -> Dict[str, Dict[str, TDigest]]:
+        """Sketch gộp theo mode của các ngày đã cho (key NO_MODE là các bài không có mode)"""
+        merged: Dict[str, Dict[str, TDigest]] = {}
+        for day in days:
+            for mode, digests in self.daily.get(day, {}).items():
+                if mode not in merged:
+                    merged[mode] = self._empty()
+                for field in self.FIELDS:
+                    merged[mode][field].merge(digests[field])
+        return merged
+
+    @classmethod
+    def percentiles(cls, digests: Dict[str, TDigest]) -> Dict[str, Any]:
+        """{'count', 'wpm': {'p50', 'p90', 'p99'}, 'accuracy': {...}}; None khi không có bài"""
+        summary = {'count': int(digests[cls.FIELDS[0]].count)}
+        for field in cls.FIELDS:
+            values = {}
+            for percentile in cls.PERCENTILES:
+                value = digests[field].quantile(percentile / 100)
+                values[f'p{percentile}'] = None if value is None else round(value, 2)
+            summary[field] = values
+        return summary
+
+    # ---- lưu trữ ----
+
+    def to_json(self, days: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, List[list]]]:
+        """{day: {mode: [wpm, accuracy]}} với mỗi sketch dạng TDigest.to_list(); days: chỉ các ngày này"""
+        days = self.daily if days is None else [day for day in days if day in self.daily]
+        return {
+            day: {mode: [digests[field].to_list() for field in self.FIELDS]
+                  for mode, digests in self.daily[day].items()}
+            for day in days
+        }
+
+    @classmethod
+    def from_json(cls, encoded: Any, compression: float = 100) -> Optional['QuantileSketches']:
+        """None nếu thiếu hoặc sai định dạng (sẽ được dựng lại từ kết quả)"""
+        if not isinstance(encoded, dict):
+            return None
+        sketches = cls(compression)
+        try:
+            for day, modes in encoded.items():
+                for mode, fields in modes.items():
+                    if len(fields) != len(cls.FIELDS):
+                        return None
+                    sketches._load(day, mode, {field: TDigest.from_list(value, compression)
+                                               for field, value in zip(cls.FIELDS, fields)})
+        except (AttributeError, TypeError, ValueError):
+            return None
+        return sketches
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, str, list]], compression: float = 100) -> 'QuantileSketches':
+        sketches = cls(compression)
+        for day, mode, fields in rows:
+            sketches._load(day, mode, {field: TDigest.from_list(value, compression)
+                                       for field, value in zip(cls.FIELDS, fields)})
+        return sketches
@@ -0,0 +1,85 @@
+import math
+from typing import Any, Dict, Optional
+
+from running_stats import RunningStats
+from quantile_sketch import QuantileSketches, TDigest
+
+class RangeComparison:
+    """So sánh hai khoảng ngày từ rollup theo ngày và sketch theo (ngày, mode)
+
+    Tổng thể dùng rollup (count, tổng, tổng bình phương chính xác); theo mode dùng moments()
+    của sketch nên độ lệch chuẩn và effect size theo mode là gần đúng. Không đọc lại từng bài.
+    """
+
+    FIELDS = ('wpm', 'accuracy')
+
+    @staticmethod
+    def from_digest(digest: TDigest) -> RunningStats:
+        count, total, squares = digest.moments()
+        return RunningStats(int(count), total, squares, digest.minimum, digest.maximum)
+
+    @classmethod
+    def combine(cls, modes: Dict[str, Dict[str, TDigest]]) -> Dict[str, TDigest]:
+        """Gộp sketch của mọi mode (kể cả bài không có mode)"""
+        merged = {field: TDigest() for field in cls.FIELDS}
+        for digests in modes.values():
+            for field in cls.FIELDS:
+                merged[field].merge(digests[field])
+        return merged
+
+    @staticmethod
+    def effect_size(a: RunningStats, b: RunningStats) -> Optional[float]:
+        """Cohen's d của a so với b (độ lệch chuẩn gộp); None khi quá ít bài hoặc không có biến thiên"""
+        if not a.count or not b.count or a.count + b.count < 3:
+            return None
+        # n·phương sai tổng thể = (n - 1)·phương sai mẫu
+        pooled = (a.count * a.stddev ** 2 + b.count * b.stddev ** 2) / (a.count + b.count - 2)
+        if pooled <= 0:
+            return None
+        return round((a.mean - b.mean) / math.sqrt(pooled), 3)
+
+    @classmethod
+    def summarize(cls, stats: Dict[str, RunningStats],
+                  digests: Optional[Dict[str, TDigest]] = None) -> Dict[str, Any]:
+        summary = {'count': stats[cls.FIELDS[0]].count}
+        for field in cls.FIELDS:
+            values = {'mean': round(stats[field].mean, 2), 'stddev': round(stats[field].stddev, 2)}
+            if digests is not None:
+                for percentile in (50, 90):
+                    value = digests[field].quantile(percentile / 100)
+                    values[f'p{percentile}'] = None if value is None else round(value, 2)
+            summary[field] = values
+        return summary
+
+    @classmethod
+    def compare(cls, a: Dict[str, RunningStats], b: Dict[str, RunningStats],
+                digests_a: Optional[Dict[str, TDigest]] = None,
+                digests_b: Optional[Dict[str, TDigest]] = None) -> Dict[str, Any]:
+        """Tóm tắt hai phía, chênh lệch trung bình (a - b) và effect size của từng chỉ số"""
+        comparison = {'a': cls.summarize(a, digests_a), 'b': cls.summarize(b, digests_b),
+                      'delta': {}, 'effect_size': {}}
+        for field in cls.FIELDS:
+            if a[field].count and b[field].count:
+                comparison['delta'][field] = round(a[field].mean - b[field].mean, 2)
+            else:
+                comparison['delta'][field] = None
+            comparison['effect_size'][field] = cls.effect_size(a[field], b[field])
+        return comparison
+
+    @classmethod
+    def compare_modes(cls, modes_a: Dict[str, Dict[str, TDigest]],
+                      modes_b: Dict[str, Dict[str, TDigest]]) -> Dict[str, Dict[str, Any]]:
+        """compare cho từng mode có bài ở ít nhất một phía (bỏ các bài không có mode)"""
+        empty = {field: TDigest() for field in cls.FIELDS}
+        breakdown = {}
+        for mode in sorted(set(modes_a) | set(modes_b)):
+            if mode == QuantileSketches.NO_MODE:
+                continue
+            digests_a = modes_a.get(mode, empty)
+            digests_b = modes_b.get(mode, empty)
+            breakdown[mode] = cls.compare(
+                {field: cls.from_digest(digests_a[field]) for field in cls.FIELDS},
+                {field: cls.from_digest(digests_b[field]) for field in cls.FIELDS},
+                digests_a, digests_b
+            )
+        return breakdown
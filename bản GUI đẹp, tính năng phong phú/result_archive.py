@@ -0,0 +1,250 @@
+import gzip
+import json
+import lzma
+import math
+import os
+from collections import OrderedDict
+from datetime import date
+from itertools import groupby
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from day_clock import DayClock
+from result_columns import ResultColumns
+from running_stats import RunningStats
+
+class ResultArchive:
+    """Kết quả cũ được lưu trữ nén theo tháng trong thư mục <stats>.archive
+
+    - <YYYY-MM>.<n>.jsonl.xz (lzma) hoặc .jsonl.gz (gzip): các bài của một tháng (tháng chứa ngày
+      của bài theo DayClock), sắp theo timestamp; thêm bài vào tháng đã lưu trữ tạo file mới với n tăng dần
+    - manifest.json: cutoff (mọi bài có timestamp < cutoff đã nằm trong archive), cấu hình DayClock
+      đã dùng để chia tháng, file, số bài và tổng hợp của từng tháng; chỉ được ghi (atomic) sau khi
+      các segment đã ghi xong, nên segment mà manifest trỏ tới luôn đầy đủ
+    Segment chỉ được đọc khi truy vấn chạm tới khoảng thời gian của nó; tối đa CACHE_MONTHS
+    tháng được giữ lại trong bộ nhớ dạng cột.
+    """
+
+    VERSION = 1
+    COMPRESSIONS = {'lzma': '.jsonl.xz', 'gzip': '.jsonl.gz'}
+    TRACKED_FIELDS = ('wpm', 'accuracy', 'time')
+    CACHE_MONTHS = 12
+
+    def __init__(self, directory: str, compression: str = 'lzma', day_clock: Optional[DayClock] = None):
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f"Unsupported archive compression: {compression}")
+        self.directory = directory
+        self.compression = compression
+        # Cấu hình dùng khi archive còn trống; archive đã có dùng cấu hình ghi trong manifest
+        # (manifest cũ không có thì là giờ máy) cho tới khi repartition
+        self.default_clock = day_clock or DayClock()
+        self.day_clock = self.default_clock
+        self.manifest_file = os.path.join(directory, "manifest.json")
+        self.cutoff: Optional[float] = None
+        self.months: Dict[str, Dict[str, Any]] = {}
+        self._loaded: 'OrderedDict[str, ResultColumns]' = OrderedDict()
+        self.reload()
+
+    def reload(self) -> None:
+        """Đọc lại manifest (sau khi tiến trình khác lưu trữ thêm) và bỏ các tháng đã nạp"""
+        self._loaded.clear()
+        self.cutoff = None
+        self.months = {}
+        self.day_clock = self.default_clock
+        if not os.path.exists(self.manifest_file):
+            return
+        with open(self.manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if not isinstance(manifest, dict) or manifest.get('version') != self.VERSION:
+            raise ValueError("Invalid archive manifest")
+        if not isinstance(manifest.get('months'), dict):
+            raise ValueError("Invalid archive manifest")
+        self.cutoff = manifest.get('cutoff')
+        self.months = manifest['months']
+        self.day_clock = DayClock.from_json(manifest.get('day_clock'))
+
+    def month_of(self, timestamp: float) -> str:
+        """Tháng của ngày chứa bài theo day_clock"""
+        return date.fromordinal(self.day_clock.ordinal(timestamp)).strftime('%Y-%m')
+
+    def month_bounds(self, month: str) -> Tuple[float, float]:
+        """[đầu ngày đầu tháng, đầu ngày đầu tháng sau) dạng timestamp theo day_clock"""
+        year, number = map(int, month.split('-'))
+        start = date(year, number, 1)
+        end = date(year + 1, 1, 1) if number == 12 else date(year, number + 1, 1)
+        return self.day_clock.day_bounds(start.toordinal())[0], self.day_clock.day_bounds(end.toordinal())[0]
+
+    def __len__(self) -> int:
+        return sum(entry['count'] for entry in self.months.values())
+
+    def size(self) -> int:
+        return sum(os.path.getsize(self._path(entry['file'])) for entry in self.months.values()
+                   if os.path.exists(self._path(entry['file'])))
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    # ---- đọc ----
+
+    def _iter_segment(self, month: str) -> Iterator[Dict[str, Any]]:
+        entry = self.months.get(month)
+        if entry is None:
+            return
+        path = self._path(entry['file'])
+        opener = gzip.open if path.endswith('.gz') else lzma.open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def load(self, month: str) -> ResultColumns:
+        """Các bài của một tháng dạng cột (đọc file khi cần, giữ lại CACHE_MONTHS tháng gần dùng nhất)"""
+        columns = self._loaded.get(month)
+        if columns is not None:
+            self._loaded.move_to_end(month)
+            return columns
+        columns = ResultColumns.from_records(self._iter_segment(month))
+        self._loaded[month] = columns
+        if len(self._loaded) > self.CACHE_MONTHS:
+            self._loaded.popitem(last=False)
+        return columns
+
+    def months_between(self, start: Optional[float], end: Optional[float]) -> List[str]:
+        months = []
+        for month in sorted(self.months):
+            month_start, month_end = self.month_bounds(month)
+            if start is not None and month_end <= start or end is not None and month_start >= end:
+                continue
+            months.append(month)
+        return months
+
+    def iter_rows(self, start: Optional[float] = None, end: Optional[float] = None,
+                  mode: Optional[str] = None) -> Iterator[tuple]:
+        """Như ResultColumns.iter_rows, chỉ nạp các tháng giao với [start, end)"""
+        for month in self.months_between(start, end):
+            yield from self.load(month).iter_rows(start, end, mode)
+
+    def iter_results(self) -> Iterator[Dict[str, Any]]:
+        """Toàn bộ bài đã lưu trữ dạng dict JSON, đọc dần từng tháng (không giữ trong bộ nhớ)"""
+        for month in sorted(self.months):
+            yield from self._iter_segment(month)
+
+    def identities(self) -> Iterator[tuple]:
+        """(timestamp, wpm, time) của các bài đã lưu trữ, cùng dạng với ResultColumns.identities"""
+        return ((record['timestamp'], record['wpm'], record['time']) for record in self.iter_results())
+
+    def stats(self) -> Dict[str, RunningStats]:
+        """Tổng hợp của toàn bộ bài đã lưu trữ, lấy từ manifest"""
+        merged = {field: RunningStats() for field in self.TRACKED_FIELDS}
+        for entry in self.months.values():
+            for field, values in zip(self.TRACKED_FIELDS, entry['stats']):
+                merged[field].merge(RunningStats.from_list(values))
+        return merged
+
+    # ---- ghi ----
+
+    @staticmethod
+    def _identity(record: Dict[str, Any]) -> tuple:
+        return record['timestamp'], record.get('wpm'), record.get('time')
+
+    def add(self, records: Iterable[Dict[str, Any]], cutoff: float) -> int:
+        """Lưu trữ các bài có timestamp < cutoff, gộp vào segment sẵn có của tháng (bỏ bài trùng)
+
+        Trả về số bài đã nhận. Segment mới được ghi ra file mới và manifest chỉ trỏ sang chúng
+        sau khi ghi xong, nên nếu dừng giữa chừng archive vẫn giữ nguyên như trước.
+        """
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            groups.setdefault(self.month_of(record['timestamp']), []).append(record)
+        if not groups:
+            return 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        months = dict(self.months)
+        for month, month_records in groups.items():
+            merged = {}
+            if month in self.months:
+                for record in self._iter_segment(month):
+                    merged[self._identity(record)] = record
+            for record in month_records:
+                merged[self._identity(record)] = record
+            kept = sorted(merged.values(), key=lambda record: record['timestamp'])
+            version = self.months[month]['version'] + 1 if month in self.months else 1
+            months[month] = self._write_segment(month, version, kept)
+
+        replaced = [self.months[month]['file'] for month in groups if month in self.months]
+        self._write_manifest(max(cutoff, self.cutoff or cutoff), months)
+        for filename in replaced:
+            if os.path.exists(self._path(filename)):
+                os.remove(self._path(filename))
+        for month in groups:
+            self._loaded.pop(month, None)
+        return sum(len(month_records) for month_records in groups.values())
+
+    def _write_segment(self, month: str, version: int, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        filename = f"{month}.{version}{self.COMPRESSIONS[self.compression]}"
+        path = self._path(filename)
+        temp_path = path + '.tmp'
+        opener = gzip.open if self.compression == 'gzip' else lzma.open
+        stats = {field: RunningStats() for field in self.TRACKED_FIELDS}
+        with opener(temp_path, 'wt', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+                f.write('\n')
+                for field in self.TRACKED_FIELDS:
+                    value = record.get(field)
+                    if value is not None and not math.isnan(value):
+                        stats[field].add(value)
+        with open(temp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        return {
+            'file': filename,
+            'version': version,
+            'count': len(records),
+            'stats': [stats[field].to_list() for field in self.TRACKED_FIELDS]
+        }
+
+    def _write_manifest(self, cutoff: float, months: Dict[str, Dict[str, Any]]) -> None:
+        temp_file = self.manifest_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'cutoff': cutoff, 'day_clock': self.day_clock.to_json(),
+                       'months': months}, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.manifest_file)
+        self.cutoff = cutoff
+        self.months = months
+
+    def repartition(self, day_clock: DayClock) -> None:
+        """Chia lại các segment theo tháng của day_clock mới (sau khi đổi múi giờ/giờ bắt đầu ngày)
+
+        Các bài được đọc theo thứ tự timestamp nên mỗi lần chỉ giữ một tháng mới trong bộ nhớ;
+        như add, manifest chỉ trỏ sang segment mới sau khi ghi xong rồi mới xóa file cũ.
+        """
+        if not self.months:
+            self.day_clock = day_clock
+            return
+        old = self.months
+        self.day_clock = day_clock
+        months = {}
+        # Các tháng cũ không chồng lên nhau và mỗi segment đã sắp theo timestamp: tháng mới liên tiếp
+        for month, month_records in groupby(self.iter_results(), key=lambda record: self.month_of(record['timestamp'])):
+            version = old[month]['version'] + 1 if month in old else 1
+            months[month] = self._write_segment(month, version, list(month_records))
+        self._write_manifest(self.cutoff, months)
+        kept_files = {entry['file'] for entry in months.values()}
+        for entry in old.values():
+            if entry['file'] not in kept_files and os.path.exists(self._path(entry['file'])):
+                os.remove(self._path(entry['file']))
+        self._loaded.clear()
+
+    def clear(self) -> None:
+        """Xóa toàn bộ archive (khi dữ liệu bị thay bởi import hoặc xóa)"""
+        if os.path.exists(self.manifest_file):
+            os.remove(self.manifest_file)
+        for entry in self.months.values():
+            if os.path.exists(self._path(entry['file'])):
+                os.remove(self._path(entry['file']))
+        self._loaded.clear()
+        self.cutoff = None
+        self.months = {}
@@ -0,0 +1,232 @@
+import math
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from running_stats import RunningStats
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class ResultColumns:
+    """Kết quả lưu theo cột trong bộ nhớ thay cho danh sách dict
+
+    - wpm, accuracy, time, timestamp: array('d') (thiếu giá trị = NaN)
+    - text_length, user_length: array('I')
+    - mode, difficulty, content_type: mã số nhỏ array('B'), 0 = không có
+    - recording (offset bản ghi phím trong KeystrokeStore), text_hash (GhostIndex.text_hash của câu):
+      số nguyên không âm array('q'), -1 = không có
+    - day: ngày địa phương (ordinal của DayClock) tính một lần khi lưu, cùng dạng với recording
+    Chỉ chuyển sang dict JSON khi ghi file, export hoặc trả về một bài cụ thể;
+    'date' không được lưu mà tính lại từ timestamp.
+    """
+
+    FLOAT_FIELDS = ('wpm', 'accuracy', 'time', 'timestamp')
+    INT_FIELDS = ('text_length', 'user_length')
+    CODED_FIELDS = ('mode', 'difficulty', 'content_type')
+    ID_FIELDS = ('recording', 'text_hash', 'day')
+    # Các trường được biểu diễn bằng cột; 'date' suy ra từ timestamp
+    KNOWN_FIELDS = FLOAT_FIELDS + INT_FIELDS + CODED_FIELDS + ID_FIELDS + ('date',)
+
+    def __init__(self):
+        self.columns: Dict[str, array] = {field: array('d') for field in self.FLOAT_FIELDS}
+        self.columns.update({field: array('I') for field in self.INT_FIELDS})
+        self.columns.update({field: array('B') for field in self.CODED_FIELDS})
+        self.columns.update({field: array('q') for field in self.ID_FIELDS})
+        # Bảng mã của cột phân loại: labels[field][code] -> tên
+        self.labels: Dict[str, List[Optional[str]]] = {field: [None] for field in self.CODED_FIELDS}
+        self._codes: Dict[str, Dict[str, int]] = {field: {} for field in self.CODED_FIELDS}
+        # Trường hiếm gặp (dữ liệu import) theo chỉ số bài
+        self.extras: Dict[int, Dict[str, Any]] = {}
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> 'ResultColumns':
+        columns = cls()
+        for record in records:
+            columns.append(record)
+        return columns
+
+    def __len__(self) -> int:
+        return len(self.columns['timestamp'])
+
+    def _code(self, field: str, label: Any) -> int:
+        if label is None:
+            return 0
+        codes = self._codes[field]
+        code = codes.get(label)
+        if code is None:
+            labels = self.labels[field]
+            if len(labels) > 255:
+                raise ValueError(f"Too many distinct values for {field}")
+            code = codes[label] = len(labels)
+            labels.append(label)
+        return code
+
+    def code_of(self, field: str, label: str) -> Optional[int]:
+        """Mã của một giá trị phân loại, None nếu chưa từng xuất hiện"""
+        return self._codes[field].get(label)
+
+    def append(self, record: Dict[str, Any]) -> None:
+        # Tính mọi giá trị trước khi nối để một bài lỗi không làm lệch các cột
+        floats = [float(record[field]) if record.get(field) is not None else math.nan
+                  for field in self.FLOAT_FIELDS]
+        ints = [int(record.get(field) or 0) for field in self.INT_FIELDS]
+        if any(value < 0 for value in ints):
+            raise ValueError("Lengths must be non-negative")
+        codes = [self._code(field, record.get(field)) for field in self.CODED_FIELDS]
+        ids = [int(record[field]) if record.get(field) is not None else -1 for field in self.ID_FIELDS]
+        if any(value < -1 for value in ids):
+            raise ValueError("Identifiers must be non-negative")
+        extra = {key: value for key, value in record.items() if key not in self.KNOWN_FIELDS}
+
+        index = len(self)
+        for field, value in zip(self.FLOAT_FIELDS, floats):
+            self.columns[field].append(value)
+        for field, value in zip(self.INT_FIELDS, ints):
+            self.columns[field].append(value)
+        for field, value in zip(self.CODED_FIELDS, codes):
+            self.columns[field].append(value)
+        for field, value in zip(self.ID_FIELDS, ids):
+            self.columns[field].append(value)
+        if extra:
+            self.extras[index] = extra
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        """Bài thứ index ở định dạng JSON"""
+        if index < 0:
+            index += len(self)
+        record = {}
+        for field in ('wpm', 'accuracy', 'time'):
+            value = self.columns[field][index]
+            if not math.isnan(value):
+                record[field] = value
+        for field in self.INT_FIELDS:
+            record[field] = self.columns[field][index]
+        timestamp = self.columns['timestamp'][index]
+        if not math.isnan(timestamp):
+            record['timestamp'] = timestamp
+            record['date'] = datetime.fromtimestamp(timestamp).isoformat()
+        for field in self.CODED_FIELDS:
+            code = self.columns[field][index]
+            if code:
+                record[field] = self.labels[field][code]
+        for field in self.ID_FIELDS:
+            if self.columns[field][index] >= 0:
+                record[field] = self.columns[field][index]
+        record.update(self.extras.get(index, {}))
+        return record
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        # Duyệt song song các cột thay vì gọi __getitem__ cho từng chỉ số (nhanh hơn khi export)
+        columns = self.columns
+        mode_labels = self.labels['mode']
+        difficulty_labels = self.labels['difficulty']
+        content_type_labels = self.labels['content_type']
+        extras = self.extras
+        isnan = math.isnan
+        rows = zip(columns['wpm'], columns['accuracy'], columns['time'], columns['text_length'],
+                   columns['user_length'], columns['timestamp'], columns['mode'], columns['difficulty'],
+                   columns['content_type'], columns['recording'], columns['text_hash'], columns['day'])
+        for index, (wpm, accuracy, time, text_length, user_length, timestamp, mode, difficulty,
+                    content_type, recording, text_hash, day) in enumerate(rows):
+            record = {}
+            if not isnan(wpm):
+                record['wpm'] = wpm
+            if not isnan(accuracy):
+                record['accuracy'] = accuracy
+            if not isnan(time):
+                record['time'] = time
+            record['text_length'] = text_length
+            record['user_length'] = user_length
+            if not isnan(timestamp):
+                record['timestamp'] = timestamp
+                record['date'] = datetime.fromtimestamp(timestamp).isoformat()
+            if mode:
+                record['mode'] = mode_labels[mode]
+            if difficulty:
+                record['difficulty'] = difficulty_labels[difficulty]
+            if content_type:
+                record['content_type'] = content_type_labels[content_type]
+            if recording >= 0:
+                record['recording'] = recording
+            if text_hash >= 0:
+                record['text_hash'] = text_hash
+            if day >= 0:
+                record['day'] = day
+            if index in extras:
+                record.update(extras[index])
+            yield record
+
+    def iter_rows(self, start: Optional[float] = None, end: Optional[float] = None,
+                  mode: Optional[str] = None) -> Iterator[tuple]:
+        """Các bài có start <= timestamp < end (và đúng mode) dạng tuple
+        (timestamp, wpm, accuracy, time, text_length, user_length, mode, difficulty, content_type)
+        """
+        columns = self.columns
+        mode_code = None
+        if mode is not None:
+            mode_code = self._codes['mode'].get(mode)
+            if mode_code is None:
+                return
+        mode_labels = self.labels['mode']
+        difficulty_labels = self.labels['difficulty']
+        content_labels = self.labels['content_type']
+        for row in zip(columns['timestamp'], columns['wpm'], columns['accuracy'], columns['time'],
+                       columns['text_length'], columns['user_length'], columns['mode'], columns['difficulty'],
+                       columns['content_type']):
+            timestamp = row[0]
+            # So sánh với NaN luôn sai nên bài thiếu timestamp bị loại khi có lọc ngày
+            if start is not None and not timestamp >= start:
+                continue
+            if end is not None and not timestamp < end:
+                continue
+            if mode_code is not None and row[6] != mode_code:
+                continue
+            yield row[:6] + (mode_labels[row[6]], difficulty_labels[row[7]], content_labels[row[8]])
+
+    def identities(self) -> Iterator[tuple]:
+        """(timestamp, wpm, time) của từng bài, cùng dạng với SqliteResultStore.identities"""
+        columns = self.columns
+        return zip(columns['timestamp'], columns['wpm'], columns['time'])
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+    def view(self, field: str):
+        """NumPy view (không sao chép) của một cột, None nếu không có NumPy
+
+        Không giữ view lâu: array không thể nối thêm phần tử khi còn view trỏ vào.
+        """
+        if np is None:
+            return None
+        column = self.columns[field]
+        return np.frombuffer(column, dtype=np.dtype(column.typecode)) if len(column) else np.empty(0)
+
+    def stats(self, field: str) -> RunningStats:
+        """count/sum/sum bình phương/min/max của một cột, bỏ qua giá trị thiếu"""
+        values = self.view(field)
+        if values is None:
+            column = self.columns[field]
+            return RunningStats.from_values(value for value in column if not math.isnan(value))
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return RunningStats()
+        return RunningStats(int(len(values)), float(values.sum()), float(np.dot(values, values)),
+                            float(values.min()), float(values.max()))
+
+    def argmax(self, field: str) -> int:
+        """Chỉ số bài có giá trị lớn nhất (bài đầu tiên khi bằng nhau); giá trị thiếu coi như 0"""
+        values = self.view(field)
+        if values is None:
+            column = self.columns[field]
+            return max(range(len(column)),
+                       key=lambda index: 0 if math.isnan(column[index]) else column[index])
+        if values.dtype.kind == 'f':
+            values = np.nan_to_num(values, nan=0.0)
+        return int(values.argmax())
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.itemsize * len(column) for column in self.columns.values())
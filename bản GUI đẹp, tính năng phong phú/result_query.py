@@ -0,0 +1,233 @@
+import bisect
+import heapq
+import math
+import operator
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from result_columns import ResultColumns
+from day_clock import DayClock
+
+class ResultQuery:
+    """Bộ lọc đã kiểm tra của StatisticsManager.query
+
+    filter (mọi điều kiện kết hợp bằng AND):
+    - 'mode', 'difficulty', 'content_type': một giá trị hoặc danh sách giá trị
+    - 'start_date', 'end_date': 'YYYY-MM-DD', tính cả hai đầu; 'last_days': N ngày gần nhất
+    - 'wpm', 'accuracy', 'time', 'text_length', 'user_length': {toán tử: giá trị},
+      toán tử là '>', '>=', '<', '<=', '=='; ví dụ {'wpm': {'>': 60}}
+    order_by: tên cột ('timestamp' hoặc cột số), thêm '-' phía trước để sắp giảm dần.
+    day_clock: ranh giới ngày của start_date/end_date (mặc định nửa đêm giờ máy).
+    """
+
+    CATEGORY_FIELDS = ('mode', 'difficulty', 'content_type')
+    NUMERIC_FIELDS = ('wpm', 'accuracy', 'time', 'text_length', 'user_length')
+    ORDER_FIELDS = ('timestamp',) + NUMERIC_FIELDS
+    OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le, '==': operator.eq}
+
+    def __init__(self, filter: Optional[Dict[str, Any]] = None, order_by: Optional[str] = None,
+                 limit: Optional[int] = None, day_clock: Optional[DayClock] = None):
+        filter = dict(filter or {})
+        self.start: Optional[float] = None
+        self.end: Optional[float] = None
+        if 'last_days' in filter:
+            days = filter.pop('last_days')
+            if not isinstance(days, (int, float)) or days < 0:
+                raise ValueError("last_days must be a non-negative number")
+            self.start = (datetime.now() - timedelta(days=days)).timestamp()
+        if 'start_date' in filter:
+            start = datetime.fromisoformat(filter.pop('start_date'))
+            start = day_clock.day_bounds(start.toordinal())[0] if day_clock else start.timestamp()
+            self.start = start if self.start is None else max(self.start, start)
+        if 'end_date' in filter:
+            end = datetime.fromisoformat(filter.pop('end_date'))
+            self.end = day_clock.day_bounds(end.toordinal())[1] if day_clock else (end + timedelta(days=1)).timestamp()
+
+        # {field: tập giá trị được chấp nhận}
+        self.categories: Dict[str, frozenset] = {}
+        for field in self.CATEGORY_FIELDS:
+            if field in filter:
+                values = filter.pop(field)
+                values = [values] if isinstance(values, str) else list(values)
+                if not all(isinstance(value, str) for value in values):
+                    raise ValueError(f"Invalid {field} filter")
+                self.categories[field] = frozenset(values)
+
+        # (field, tên toán tử, giá trị)
+        self.conditions: List[Tuple[str, str, float]] = []
+        for field in self.NUMERIC_FIELDS:
+            if field in filter:
+                bounds = filter.pop(field)
+                if not isinstance(bounds, dict):
+                    raise ValueError(f"Invalid {field} filter")
+                for op, value in bounds.items():
+                    if op not in self.OPERATORS or not isinstance(value, (int, float)):
+                        raise ValueError(f"Invalid {field} filter")
+                    self.conditions.append((field, op, value))
+        if filter:
+            raise ValueError(f"Unsupported query filter: {', '.join(sorted(filter))}")
+
+        order_by = order_by or 'timestamp'
+        self.descending = order_by.startswith('-')
+        self.order_field = order_by.lstrip('-')
+        if self.order_field not in self.ORDER_FIELDS:
+            raise ValueError(f"Unsupported order_by: {order_by}")
+        if limit is not None and limit < 0:
+            raise ValueError("limit must be non-negative")
+        self.limit = limit
+
+    def _residual(self, columns: ResultColumns, skip: Optional[str] = None) -> List[tuple]:
+        """Các điều kiện kiểm tra trên từng dòng: (cột, hàm so sánh, giá trị)"""
+        checks = []
+        for field, values in self.categories.items():
+            if field != skip:
+                codes = {columns.code_of(field, value) for value in values} - {None}
+                checks.append((columns.columns[field], operator.contains, codes))
+        for field, op, value in self.conditions:
+            checks.append((columns.columns[field], self.OPERATORS[op], value))
+        return checks
+
+    def scan(self, columns: ResultColumns) -> List[int]:
+        """Quét tuần tự (các tháng lưu trữ): chỉ số các dòng thỏa mãn, theo thứ tự lưu"""
+        timestamps = columns.columns['timestamp']
+        checks = self._residual(columns)
+        return [index for index in range(len(columns))
+                if self._in_range(timestamps[index]) and self._passes(checks, index)]
+
+    def _in_range(self, timestamp: float) -> bool:
+        # So sánh với NaN luôn sai nên bài thiếu timestamp bị loại khi có lọc thời gian
+        return ((self.start is None or timestamp >= self.start)
+                and (self.end is None or timestamp < self.end))
+
+    @staticmethod
+    def _passes(checks: List[tuple], index: int) -> bool:
+        for column, compare, value in checks:
+            if compare is operator.contains:
+                if column[index] not in value:
+                    return False
+            elif not compare(column[index], value):
+                return False
+        return True
+
+    def order_key(self, columns: ResultColumns):
+        column = columns.columns[self.order_field]
+        if column.typecode == 'd':
+            # Giá trị thiếu luôn xếp cuối
+            missing = -math.inf if self.descending else math.inf
+            return lambda index: missing if math.isnan(column[index]) else column[index]
+        return column.__getitem__
+
+    def order_records(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Sắp xếp và cắt theo limit các bài dạng dict (gộp kết quả từ archive và bài mới)"""
+        def key(record):
+            value = record.get(self.order_field)
+            if value is None:
+                return (1, 0, 0)
+            value = -value if self.descending else value
+            # Bằng nhau thì bài cũ hơn đứng trước, như khi duyệt index theo thời gian
+            return (0, value, 0 if self.order_field == 'timestamp' else record.get('timestamp', 0))
+        ordered = sorted(records, key=key)
+        return ordered if self.limit is None else ordered[:self.limit]
+
+class ResultIndex:
+    """Index trong bộ nhớ trên ResultColumns cho StatisticsManager.query
+
+    - thứ tự theo timestamp: mảng timestamp đã sắp xếp và chỉ số dòng tương ứng
+    - posting list cho mode, difficulty, content_type: với mỗi giá trị, các dòng sắp theo timestamp
+    Bài mới được nối vào index khi truy vấn (bài thường tới theo thứ tự thời gian nên chỉ là
+    append; bài import cũ hơn được chèn đúng chỗ). Planner ước lượng số dòng mà mỗi index
+    phải duyệt bằng bisect và chọn index nhỏ nhất; các điều kiện còn lại kiểm tra trên từng dòng.
+    """
+
+    def __init__(self, columns: ResultColumns):
+        self.columns = columns
+        self.timestamps = array('d')
+        self.rows = array('I')
+        # postings[field][code] = (timestamps, rows)
+        self.postings: Dict[str, Dict[int, Tuple[array, array]]] = {
+            field: {} for field in ResultQuery.CATEGORY_FIELDS
+        }
+        self._covered = 0
+        self.sync()
+
+    @staticmethod
+    def _insert(timestamps: array, rows: array, timestamp: float, row: int) -> None:
+        if not timestamps or timestamp >= timestamps[-1]:
+            timestamps.append(timestamp)
+            rows.append(row)
+        else:
+            position = bisect.bisect_right(timestamps, timestamp)
+            timestamps.insert(position, timestamp)
+            rows.insert(position, row)
+
+    def sync(self) -> None:
+        """Đưa các dòng mới nối vào ResultColumns vào index"""
+        columns = self.columns.columns
+        for row in range(self._covered, len(self.columns)):
+            timestamp = columns['timestamp'][row]
+            # Bài thiếu timestamp đứng đầu, bị loại bởi mọi lọc thời gian
+            if math.isnan(timestamp):
+                timestamp = -math.inf
+            self._insert(self.timestamps, self.rows, timestamp, row)
+            for field, postings in self.postings.items():
+                code = columns[field][row]
+                if code:
+                    if code not in postings:
+                        postings[code] = (array('d'), array('I'))
+                    self._insert(*postings[code], timestamp, row)
+        self._covered = len(self.columns)
+
+    @staticmethod
+    def _bounds(timestamps: array, query: ResultQuery) -> Tuple[int, int]:
+        low = 0 if query.start is None else bisect.bisect_left(timestamps, query.start)
+        high = len(timestamps) if query.end is None else bisect.bisect_left(timestamps, query.end)
+        return low, max(low, high)
+
+    def plan(self, query: ResultQuery) -> Tuple[Optional[str], int]:
+        """(index được chọn, số dòng ước lượng phải duyệt); None là index thời gian"""
+        low, high = self._bounds(self.timestamps, query)
+        best: Tuple[Optional[str], int] = (None, high - low)
+        for field, values in query.categories.items():
+            estimate = 0
+            for value in values:
+                posting = self.postings[field].get(self.columns.code_of(field, value))
+                if posting is not None:
+                    low, high = self._bounds(posting[0], query)
+                    estimate += high - low
+            if estimate < best[1]:
+                best = (field, estimate)
+        return best
+
+    def _candidates(self, query: ResultQuery, field: Optional[str]) -> Iterator[int]:
+        """Các dòng của index đã chọn trong khoảng thời gian, theo thứ tự timestamp"""
+        if field is None:
+            low, high = self._bounds(self.timestamps, query)
+            return iter(self.rows[low:high])
+        slices = []
+        for value in query.categories[field]:
+            posting = self.postings[field].get(self.columns.code_of(field, value))
+            if posting is not None:
+                low, high = self._bounds(posting[0], query)
+                slices.append(zip(posting[0][low:high], posting[1][low:high]))
+        # Gộp các posting list (đã sắp theo timestamp) của nhiều giá trị
+        return (row for _, row in heapq.merge(*slices))
+
+    def execute(self, query: ResultQuery) -> List[int]:
+        """Chỉ số các dòng thỏa mãn, theo order_by và giới hạn limit"""
+        self.sync()
+        field, _ = self.plan(query)
+        checks = query._residual(self.columns, skip=field)
+        matches = (row for row in self._candidates(query, field) if query._passes(checks, row))
+        if query.order_field == 'timestamp':
+            # Index đã theo thứ tự thời gian: dừng ngay khi đủ limit
+            if query.descending:
+                matches = reversed(list(matches))
+            if query.limit is None:
+                return list(matches)
+            return [row for row, _ in zip(matches, range(query.limit))]
+        key = query.order_key(self.columns)
+        if query.limit is None:
+            return sorted(matches, key=key, reverse=query.descending)
+        select = heapq.nlargest if query.descending else heapq.nsmallest
+        return select(query.limit, matches, key=key)
@@ -0,0 +1,233 @@
+import json
+import os
+import shutil
+import time
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+class ResultsLog:
+    """Lưu kết quả dạng JSON Lines chỉ ghi nối (write-ahead log) + một file header (checkpoint)
+
+    - header (typing_stats.json): metadata, session_data, preferences và log_offset,
+      tức vị trí byte trong log mà session_data đã gộp tới; có checksum.
+      Checkpoint trước được giữ ở .bak để dùng khi header hỏng.
+    - log (typing_stats.results.jsonl): mỗi dòng một kết quả kèm "_crc" (CRC32 của dòng),
+      không bao giờ ghi đè khi lưu. Log sau compaction bắt đầu bằng dòng {"_generation": n};
+      header ghi log_generation để biết nó thuộc về log nào.
+    """
+
+    VERSION = 3
+    # Hậu tố ,"_crc":"xxxxxxxx"} ở cuối mỗi dòng
+    _CRC_PREFIX = b',"_crc":"'
+    _CRC_SUFFIX_LENGTH = len(_CRC_PREFIX) + 8 + 2
+
+    def __init__(self, header_file: str, log_file: Optional[str] = None):
+        self.header_file = header_file
+        self.backup_file = header_file + '.bak'
+        if log_file is None:
+            base, _ = os.path.splitext(header_file)
+            log_file = base + ".results.jsonl"
+        self.log_file = log_file
+        # Số dòng hỏng (ghi dở, sai JSON, sai checksum) gặp ở lần đọc gần nhất
+        self.bad_lines = 0
+        self.generation = 0
+        # Header đọc được không khớp log hiện tại (log đã compact sau checkpoint đó)
+        self.header_stale = False
+        # Header chính hỏng: không đẩy nó sang .bak ở lần ghi tới
+        self._rotate_backup = True
+        # Sau mỗi lần đọc: vị trí cuối dòng đầy đủ cuối cùng và inode của file log đã đọc
+        # (inode đổi nghĩa là log đã được compact, có thể bởi tiến trình khác)
+        self.end_offset = 0
+        self.inode: Optional[int] = None
+        # iter_records(generation=...) gặp log thuộc thế hệ khác (inode có thể được dùng lại)
+        self.generation_changed = False
+
+    @classmethod
+    def _encode(cls, record: Dict[str, Any]) -> bytes:
+        body = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        checksum = b'%08x' % zlib.crc32(body)
+        return body[:-1] + cls._CRC_PREFIX + checksum + b'"}\n'
+
+    @classmethod
+    def _decode(cls, line: bytes) -> Optional[Dict[str, Any]]:
+        """Record của một dòng (không gồm '\\n'); None nếu hỏng hoặc sai checksum"""
+        suffix = line[-cls._CRC_SUFFIX_LENGTH:]
+        if suffix.startswith(cls._CRC_PREFIX):
+            body = line[:-cls._CRC_SUFFIX_LENGTH] + b'}'
+            if suffix[len(cls._CRC_PREFIX):-2] != b'%08x' % zlib.crc32(body):
+                return None
+            line = body
+        # Dòng không có _crc được ghi bởi phiên bản cũ
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        return record if isinstance(record, dict) else None
+
+    @staticmethod
+    def _checksum(header: Dict[str, Any]) -> str:
+        canonical = json.dumps(header, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return '%08x' % zlib.crc32(canonical.encode('utf-8'))
+
+    def _read_checkpoint(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                header = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(header, dict):
+            return None
+        checksum = header.pop('checksum', None)
+        if checksum is not None and checksum != self._checksum(header):
+            return None
+        return header
+
+    def read_generation(self) -> int:
+        """Thế hệ của log hiện tại (0 với log chưa từng compact hoặc ghi bởi phiên bản cũ)"""
+        try:
+            with open(self.log_file, 'rb') as f:
+                return self._file_generation(f)
+        except OSError:
+            return 0
+            
+    @classmethod
+    def _file_generation(cls, f) -> int:
+        record = cls._decode(f.readline().rstrip(b'\n'))
+        if record and isinstance(record.get('_generation'), int):
+            return record['_generation']
+        return 0
+
+    def read_header(self) -> Optional[Dict[str, Any]]:
+        """Đọc checkpoint tốt nhất còn dùng được; None nếu không có
+
+        Thứ tự: header chính, header ghi dở của compaction (.tmp), checkpoint trước (.bak).
+        Ưu tiên checkpoint khớp thế hệ log; nếu không có, trả về checkpoint đọc được
+        và đặt header_stale. File định dạng cũ (có 'results') được trả nguyên.
+        """
+        self.generation = self.read_generation()
+        self.header_stale = False
+        self._rotate_backup = True
+        fallback = None
+        for path in (self.header_file, self.header_file + '.tmp', self.backup_file):
+            header = self._read_checkpoint(path)
+            if header is None:
+                if path == self.header_file and os.path.exists(path):
+                    self._rotate_backup = False
+                continue
+            if 'results' in header or header.get('log_generation', 0) == self.generation:
+                return header
+            if fallback is None:
+                fallback = header
+        if fallback is not None:
+            self.header_stale = True
+        return fallback
+
+    def write_header(self, header: Dict[str, Any], fsync: bool = True) -> None:
+        """Ghi checkpoint atomic; checkpoint cũ (nếu đọc được) được giữ lại ở .bak"""
+        self._write_file(self.header_file + '.tmp', self._header_bytes(header), fsync)
+        self._install_header()
+
+    def _header_bytes(self, header: Dict[str, Any]) -> bytes:
+        header = dict(header, version=self.VERSION, results_log=os.path.basename(self.log_file),
+                      log_generation=self.generation)
+        header['checksum'] = self._checksum(header)
+        return json.dumps(header, indent=2, ensure_ascii=False).encode('utf-8')
+
+    def _install_header(self) -> None:
+        """Đưa header .tmp đã ghi xong vào chỗ header chính"""
+        if self._rotate_backup and os.path.exists(self.header_file):
+            os.replace(self.header_file, self.backup_file)
+        os.replace(self.header_file + '.tmp', self.header_file)
+        self._rotate_backup = True
+
+    @staticmethod
+    def _write_file(path: str, data: bytes, fsync: bool = True) -> None:
+        with open(path, 'wb') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def size(self) -> int:
+        return os.path.getsize(self.log_file) if os.path.exists(self.log_file) else 0
+
+    def iter_records(self, start: int = 0, generation: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Duyệt log từ vị trí start theo thứ tự ghi, trả về (offset đầu dòng, record); bỏ qua dòng hỏng
+
+        Nếu có generation mà log đang mở thuộc thế hệ khác thì không trả record nào
+        và đặt generation_changed.
+        """
+        self.bad_lines = 0
+        self.end_offset = start
+        self.generation_changed = False
+        if not os.path.exists(self.log_file):
+            self.inode = None
+            return
+
+        offset = start
+        with open(self.log_file, 'rb') as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            if generation is not None and self._file_generation(f) != generation:
+                self.generation_changed = True
+                return
+            f.seek(start)
+            for line in f:
+                line_start = offset
+                offset += len(line)
+                if not line.endswith(b'\n'):
+                    # Dòng cuối bị cắt ngang khi đang ghi (hoặc tiến trình khác đang ghi dở)
+                    self.bad_lines += 1
+                    continue
+                self.end_offset = offset
+                record = self._decode(line[:-1])
+                if record is None:
+                    self.bad_lines += 1
+                elif '_generation' not in record:
+                    yield line_start, record
+
+    def append(self, records: Iterable[Dict[str, Any]], fsync: bool = False) -> int:
+        """Ghi nối các record bằng một lần write, trả về offset cuối log
+
+        Chi phí không phụ thuộc độ dài lịch sử.
+        """
+        data = b''.join(self._encode(record) for record in records)
+        with open(self.log_file, 'ab') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+            return f.tell()
+
+    def rewrite(self, records: Iterable[Dict[str, Any]], header: Dict[str, Any]) -> None:
+        """Compaction: ghi log mới (thế hệ mới, bỏ dòng hỏng) rồi header trỏ tới cuối log mới
+
+        Log mới và header mới đều được ghi xong (fsync) trước khi thay file nào. Nếu dừng
+        giữa hai lần thay, read_header() tìm thấy header mới ở .tmp nhờ log_generation.
+        """
+        temp_log = self.log_file + '.tmp'
+        # Log có thể đã được tiến trình khác compact: thế hệ mới phải khác mọi thế hệ trước
+        generation = max(self.generation, self.read_generation()) + 1
+        with open(temp_log, 'wb') as f:
+            f.write(self._encode({'_generation': generation}))
+            for record in records:
+                f.write(self._encode(record))
+            f.flush()
+            os.fsync(f.fileno())
+            log_size = f.tell()
+            inode = os.fstat(f.fileno()).st_ino
+
+        self.generation = generation
+        self._write_file(self.header_file + '.tmp', self._header_bytes(dict(header, log_offset=log_size)))
+        os.replace(temp_log, self.log_file)
+        self._install_header()
+        self.bad_lines = 0
+        self.header_stale = False
+        self.end_offset = log_size
+        self.inode = inode
+
+    def preserve(self) -> None:
+        """Giữ bản sao header và log không đọc được trước khi bắt đầu lại từ dữ liệu trống"""
+        suffix = time.strftime('.corrupt-%Y%m%d_%H%M%S')
+        for path in (self.header_file, self.log_file):
+            if os.path.exists(path):
+                shutil.copy2(path, path + suffix)
@@ -0,0 +1,61 @@
+import math
+from typing import Iterable, Optional
+
+class RunningStats:
+    """count, tổng, tổng bình phương, min, max của một chỉ số, cập nhật O(1) mỗi giá trị"""
+
+    __slots__ = ('count', 'total', 'squares', 'minimum', 'maximum')
+
+    def __init__(self, count: int = 0, total: float = 0.0, squares: float = 0.0,
+                 minimum: Optional[float] = None, maximum: Optional[float] = None):
+        self.count = count
+        self.total = total
+        self.squares = squares
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @classmethod
+    def from_values(cls, values: Iterable[float]) -> 'RunningStats':
+        stats = cls()
+        for value in values:
+            stats.add(value)
+        return stats
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.squares += value * value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def merge(self, other: 'RunningStats') -> None:
+        """Gộp thống kê của một tập khác (ví dụ các ngày khác nhau)"""
+        if not other.count:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.squares += other.squares
+        self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+        self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def stddev(self) -> float:
+        """Độ lệch chuẩn tổng thể"""
+        if self.count < 2:
+            return 0.0
+        variance = self.squares / self.count - self.mean ** 2
+        # Sai số làm tròn có thể cho phương sai âm rất nhỏ
+        return math.sqrt(max(variance, 0.0))
+
+    def to_list(self) -> list:
+        return [self.count, self.total, self.squares, self.minimum, self.maximum]
+
+    @classmethod
+    def from_list(cls, values: list) -> 'RunningStats':
+        return cls(*values)
@@ -0,0 +1,159 @@
+import re
+import unicodedata
+from itertools import islice
+from typing import Iterable, Iterator
+
+class SentenceSegmenter:
+    """Tách văn xuôi (dòng bị ngắt, đoạn văn) thành từng câu, chạy dạng generator"""
+
+    # Từ viết tắt thường đứng trước tên riêng/danh từ, không bao giờ kết thúc câu
+    ABBREVIATIONS = {
+        # English
+        'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'mt', 'vs', 'no', 'nos',
+        'fig', 'figs', 'vol', 'ch', 'sec', 'p', 'pp', 'ed', 'eds', 'gen', 'col',
+        'lt', 'sgt', 'capt', 'rev', 'hon', 'inc', 'ltd', 'co', 'corp', 'approx',
+        'jan', 'feb', 'mar', 'apr', 'jun', 'jul', 'aug', 'sep', 'sept', 'oct', 'nov', 'dec',
+        'e.g', 'i.e', 'cf', 'al',
+        # Tiếng Việt
+        'tp', 'ts', 'ths', 'pgs', 'gs', 'bs', 'ks', 'cn', 'th', 'q', 'ph', 'nxb',
+        'đh', 'tt', 'ubnd', 'hđnd', 'tw', 'đc', 'sđt', 'tr', 'ng',
+    }
+
+    TERMINATORS = '.!?…'
+    CLOSERS = '"\')]}»'
+
+    _QUOTES = str.maketrans({
+        '“': '"', '”': '"', '„': '"', '‟': '"', '«': '"', '»': '"',
+        '‘': "'", '’': "'", '‚': "'", '‛': "'", '′': "'",
+        '\u2013': '-', '\u2014': '-', '\u2212': '-',
+        '\u00a0': ' ', '\u2009': ' ', '\u202f': ' ',
+        '\u200b': None, '\ufeff': None,
+    })
+    _WHITESPACE = re.compile(r'\s+')
+    # Dấu kết thúc câu (kèm ngoặc/nháy đóng) theo sau là khoảng trắng
+    _BOUNDARY = re.compile(r'([.!?…]+)(["\')\]}]*)\s+')
+
+    def __init__(self, max_sentence_length: int = 5000):
+        self.max_sentence_length = max_sentence_length
+
+    def normalize(self, text: str) -> str:
+        """Chuẩn hóa Unicode (NFC), dấu nháy, dấu gạch và khoảng trắng"""
+        text = unicodedata.normalize('NFC', text).translate(self._QUOTES)
+        text = text.replace('…', '...')
+        return self._WHITESPACE.sub(' ', text).strip()
+
+    def segment(self, lines: Iterable[str], line_per_sentence: bool = False) -> Iterator[str]:
+        """Nhận các dòng thô, trả về từng câu đã chuẩn hóa
+
+        Mặc định (văn xuôi) câu chỉ kết thúc ở dấu kết thúc câu hoặc dòng trống; xuống dòng chỉ là
+        ngắt dòng, kể cả khi dòng sau bắt đầu bằng tên riêng, "I", chữ số hay dấu nháy.
+        line_per_sentence=True dành cho file mỗi dòng một câu (có thể thiếu dấu chấm): dòng mới không
+        bắt đầu bằng chữ thường được coi là câu mới.
+        """
+        pending = ''
+
+        for raw_line in lines:
+            line = self.normalize(raw_line)
+
+            if not line:
+                # Dòng trống kết thúc đoạn văn
+                if pending:
+                    yield from self._emit(pending)
+                    pending = ''
+                continue
+
+            if pending and line_per_sentence and self._is_line_boundary(pending, line):
+                yield from self._emit(pending)
+                pending = ''
+
+            if not pending:
+                pending = line
+            elif pending.endswith('-') and line[0].islower() and pending[-2:-1].isalpha():
+                # Từ bị ngắt bằng dấu gạch nối ở cuối dòng
+                pending = pending[:-1] + line
+            else:
+                pending = pending + ' ' + line
+
+            sentences, pending = self._split_complete(pending)
+            yield from sentences
+
+            if len(pending) > self.max_sentence_length:
+                yield from self._emit(pending)
+                pending = ''
+
+        if pending:
+            yield from self._emit(pending)
+
+    def is_line_oriented(self, lines: Iterable[str], sample: int = 200) -> bool:
+        """Đoán file mỗi dòng một câu từ sample dòng đầu: phần lớn các dòng không có dấu kết thúc
+        và dòng sau chúng không bắt đầu bằng chữ thường (văn xuôi bị ngắt dòng thì ngược lại)"""
+        pairs = open_lines = boundaries = 0
+        previous = None
+        for raw_line in islice(lines, sample):
+            line = self.normalize(raw_line)
+            if not line:
+                previous = None
+                continue
+            if previous is not None:
+                pairs += 1
+                stripped = previous.rstrip(self.CLOSERS)
+                if not stripped or stripped[-1] not in self.TERMINATORS:
+                    open_lines += 1
+                    if not line[0].islower():
+                        boundaries += 1
+            previous = line
+        return open_lines * 2 > pairs and boundaries * 2 > open_lines
+
+    def _is_line_boundary(self, previous: str, line: str) -> bool:
+        """Xuống dòng có phải ranh giới câu không (file mỗi dòng một câu, dòng trước không có dấu kết thúc)"""
+        if previous[-1] in ',;:-(&/':
+            return False
+        if previous.endswith('.') and self._ends_with_abbreviation(previous, 0, len(previous) - 1):
+            return False
+        first = line[0]
+        # Dòng bị ngắt giữa câu thường bắt đầu bằng chữ thường
+        return not first.islower()
+
+    def _split_complete(self, text: str):
+        """Tách các câu hoàn chỉnh ra khỏi text, trả về (danh sách câu, phần còn dở)"""
+        sentences = []
+        start = 0
+
+        for match in self._BOUNDARY.finditer(text):
+            end = match.end(2)
+            next_char = text[match.end():match.end() + 1]
+            if not next_char or next_char.islower():
+                continue
+            if match.group(1).endswith('.') and self._ends_with_abbreviation(text, start, match.start(1)):
+                continue
+            sentence = text[start:end].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+
+        remainder = text[start:]
+        # Câu cuối đoạn đã có dấu kết thúc thì phát luôn
+        stripped = remainder.rstrip(self.CLOSERS)
+        if stripped and stripped[-1] in self.TERMINATORS and not (
+                stripped.endswith('.') and self._ends_with_abbreviation(text, start, start + len(stripped) - 1)):
+            sentences.append(remainder.strip())
+            remainder = ''
+
+        return sentences, remainder
+
+    def _ends_with_abbreviation(self, text: str, start: int, dot_index: int) -> bool:
+        word_start = dot_index
+        while word_start > start and not text[word_start - 1].isspace() and text[word_start - 1] not in '("\'':
+            word_start -= 1
+        word = text[word_start:dot_index].lower()
+        if not word:
+            return False
+        # Chữ cái viết tắt trong tên người: "J. K. Rowling", "Nguyễn V. A."
+        if len(word) == 1 and word.isalpha():
+            return True
+        return word in self.ABBREVIATIONS
+
+    def _emit(self, text: str) -> Iterator[str]:
+        sentence = text.strip()
+        if sentence:
+            yield sentence
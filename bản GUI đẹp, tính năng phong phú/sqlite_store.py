@@ -0,0 +1,416 @@
+import json
+import os
+import sqlite3
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from running_stats import RunningStats
+from quantile_sketch import QuantileSketches, TDigest
+from result_query import ResultQuery
+
+class SqliteResultStore:
+    """Lưu kết quả trong SQLite; các thống kê là truy vấn tổng hợp dùng index
+
+    - results: mỗi dòng một bài, index theo timestamp, ngày địa phương (day), mode, difficulty,
+      content_type và (text_hash, wpm) để tìm bài tốt nhất của một câu
+    - daily_rollups: tổng hợp theo ngày (count, sum, sum bình phương, min, max), cập nhật khi lưu
+    - key_stats: tổng số lần gõ/sai theo ký tự và bigram
+    - sketches: t-digest wpm/accuracy theo (ngày, mode), gộp thêm trong cùng transaction với bài mới
+      nên nhiều phiên bản ứng dụng ghi đồng thời không ghi đè lên nhau
+    - meta: header (session_data không gồm key_stats, preferences, created_at, last_updated)
+    """
+
+    SCHEMA_VERSION = 1
+
+    # Các cột riêng; trường khác của kết quả được giữ trong cột extra (JSON)
+    COLUMNS = ('timestamp', 'day', 'mode', 'difficulty', 'wpm', 'accuracy', 'time',
+               'text_length', 'user_length', 'date', 'content_type', 'recording', 'text_hash')
+    # Cột được thêm sau phiên bản đầu: (tên, kiểu), thêm vào database cũ khi mở
+    ADDED_COLUMNS = (('content_type', 'TEXT'), ('recording', 'INTEGER'), ('text_hash', 'INTEGER'))
+    ROLLUP_FIELDS = ('wpm', 'accuracy', 'time')
+
+    def __init__(self, db_file: str, check_same_thread: bool = True):
+        self.db_file = db_file
+        # check_same_thread=False cho kết nối riêng của thread ghi nền (chỉ thread đó dùng)
+        self.conn = sqlite3.connect(db_file, check_same_thread=check_same_thread)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        rollup_columns = ', '.join(
+            f"{field}_sum REAL, {field}_squares REAL, {field}_min REAL, {field}_max REAL"
+            for field in self.ROLLUP_FIELDS)
+        with self.conn:
+            self.conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS results (
+                    id INTEGER PRIMARY KEY,
+                    timestamp REAL NOT NULL,
+                    day TEXT NOT NULL,
+                    mode TEXT,
+                    difficulty TEXT,
+                    wpm REAL NOT NULL,
+                    accuracy REAL NOT NULL,
+                    time REAL NOT NULL,
+                    text_length INTEGER NOT NULL DEFAULT 0,
+                    user_length INTEGER NOT NULL DEFAULT 0,
+                    date TEXT,
+                    extra TEXT,
+                    content_type TEXT,
+                    recording INTEGER,
+                    text_hash INTEGER
+                );
+                CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results(timestamp);
+                CREATE INDEX IF NOT EXISTS idx_results_day ON results(day);
+                CREATE INDEX IF NOT EXISTS idx_results_mode ON results(mode, timestamp);
+                CREATE INDEX IF NOT EXISTS idx_results_difficulty ON results(difficulty, timestamp);
+                CREATE TABLE IF NOT EXISTS daily_rollups (
+                    day TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL,
+                    {rollup_columns}
+                );
+                CREATE TABLE IF NOT EXISTS key_stats (
+                    key TEXT PRIMARY KEY,
+                    attempts INTEGER NOT NULL,
+                    errors INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS sketches (
+                    day TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    digests TEXT NOT NULL,
+                    PRIMARY KEY (day, mode)
+                );
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+            """)
+            # Database tạo trước khi có các cột mới: thêm cột (bài cũ để NULL)
+            result_columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(results)")}
+            for column, column_type in self.ADDED_COLUMNS:
+                if column not in result_columns:
+                    self._add_column(column, column_type)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_results_content_type ON results(content_type, timestamp)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_results_text_hash ON results(text_hash, wpm)")
+            self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)",
+                              (json.dumps(self.SCHEMA_VERSION),))
+            # Database tạo trước khi có rollup: dựng lại một lần từ bảng results
+            has_results = self.conn.execute("SELECT 1 FROM results LIMIT 1").fetchone()
+            if has_results and not self.conn.execute("SELECT 1 FROM daily_rollups LIMIT 1").fetchone():
+                self._rebuild_rollups()
+            # Sketch chỉ ghi khi checkpoint (phiên bản trước) có thể thiếu các bài sau checkpoint
+            stale_sketches = self.conn.execute("SELECT 1 FROM meta WHERE key = 'sketches_through'").fetchone()
+            if has_results and (stale_sketches or not self.conn.execute("SELECT 1 FROM sketches LIMIT 1").fetchone()):
+                self._rebuild_sketches()
+
+    def _add_column(self, column: str, column_type: str) -> None:
+        self.conn.execute(f"ALTER TABLE results ADD COLUMN {column} {column_type}")
+        # Trước đây trường này (nếu có) nằm trong extra
+        for row in self.conn.execute("SELECT id, extra FROM results WHERE extra LIKE ?",
+                                     (f'%"{column}"%',)).fetchall():
+            extra = json.loads(row['extra'])
+            value = extra.pop(column, None)
+            self.conn.execute(f"UPDATE results SET {column} = ?, extra = ? WHERE id = ?",
+                              (value, json.dumps(extra, ensure_ascii=False) if extra else None, row['id']))
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def size(self) -> int:
+        return sum(os.path.getsize(path) for path in (self.db_file, self.db_file + '-wal')
+                   if os.path.exists(path))
+
+    # ---- header / key_stats ----
+
+    def read_header(self) -> Optional[Dict[str, Any]]:
+        """Header đã lưu, None nếu database mới tạo (chưa từng ghi)"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'header'").fetchone()
+        return json.loads(row['value']) if row else None
+
+    def _write_header(self, header: Dict[str, Any]) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('header', ?)",
+                          (json.dumps(header, ensure_ascii=False),))
+
+    def write_header(self, header: Dict[str, Any]) -> None:
+        with self.conn:
+            self._write_header(header)
+
+    # ---- sketch phân vị ----
+
+    @staticmethod
+    def _sketch_key(result: Dict[str, Any], day: str) -> Tuple[str, str]:
+        return day, result.get('mode') or QuantileSketches.NO_MODE
+
+    def _add_to_sketches(self, groups: Dict[Tuple[str, str], List[Dict[str, Any]]]) -> None:
+        """Gộp các bài mới vào sketch đã lưu (đọc - gộp - ghi trong transaction ghi đang mở)"""
+        for (day, mode), results in groups.items():
+            row = self.conn.execute("SELECT digests FROM sketches WHERE day = ? AND mode = ?",
+                                    (day, mode)).fetchone()
+            if row:
+                digests = [TDigest.from_list(encoded) for encoded in json.loads(row['digests'])]
+            else:
+                digests = [TDigest() for _ in QuantileSketches.FIELDS]
+            for result in results:
+                for digest, field in zip(digests, QuantileSketches.FIELDS):
+                    digest.add(result[field])
+            self.conn.execute("INSERT OR REPLACE INTO sketches (day, mode, digests) VALUES (?, ?, ?)",
+                              (day, mode, json.dumps([digest.to_list() for digest in digests])))
+
+    def _rebuild_sketches(self) -> None:
+        self.conn.execute("DELETE FROM sketches")
+        self.conn.execute("DELETE FROM meta WHERE key = 'sketches_through'")
+        groups = {}
+        for row in self.conn.execute("SELECT day, mode, wpm, accuracy FROM results"):
+            groups.setdefault((row['day'], row['mode'] or QuantileSketches.NO_MODE), []).append(row)
+        self._add_to_sketches(groups)
+
+    def read_sketches(self) -> List[Tuple[str, str, list]]:
+        """Các dòng (day, mode, [wpm, accuracy]) với mỗi sketch dạng TDigest.to_list()"""
+        return [(row['day'], row['mode'], json.loads(row['digests']))
+                for row in self.conn.execute("SELECT day, mode, digests FROM sketches")]
+
+    def read_key_stats(self) -> Dict[str, List[int]]:
+        return {row['key']: [row['attempts'], row['errors']]
+                for row in self.conn.execute("SELECT key, attempts, errors FROM key_stats")}
+
+    def _add_key_stats(self, key_stats: Iterable[Tuple[str, int, int]]) -> None:
+        self.conn.executemany("""
+            INSERT INTO key_stats (key, attempts, errors) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET attempts = attempts + excluded.attempts,
+                                           errors = errors + excluded.errors
+        """, key_stats)
+
+    # ---- ghi ----
+
+    def _row(self, result: Dict[str, Any], day: str) -> tuple:
+        extra = {key: value for key, value in result.items() if key not in self.COLUMNS}
+        return (result['timestamp'], day, result.get('mode'), result.get('difficulty'),
+                result['wpm'], result['accuracy'], result['time'],
+                result.get('text_length', 0), result.get('user_length', 0), result.get('date'),
+                json.dumps(extra, ensure_ascii=False) if extra else None, result.get('content_type'),
+                result.get('recording'), result.get('text_hash'))
+
+    def _insert(self, rows: Iterable[tuple]) -> None:
+        self.conn.executemany("""
+            INSERT INTO results (timestamp, day, mode, difficulty, wpm, accuracy, time,
+                                 text_length, user_length, date, extra, content_type, recording, text_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+    def _rebuild_rollups(self) -> None:
+        self.conn.execute("DELETE FROM daily_rollups")
+        selects = ', '.join(f"TOTAL({field}), TOTAL({field} * {field}), MIN({field}), MAX({field})"
+                            for field in self.ROLLUP_FIELDS)
+        self.conn.execute(f"INSERT INTO daily_rollups SELECT day, COUNT(*), {selects} FROM results GROUP BY day")
+
+    def _add_to_rollup(self, result: Dict[str, Any], day: str) -> None:
+        values = [day, 1]
+        updates = ["count = count + 1"]
+        for field in self.ROLLUP_FIELDS:
+            value = result[field]
+            values.extend((value, value * value, value, value))
+            updates.append(f"{field}_sum = {field}_sum + excluded.{field}_sum, "
+                           f"{field}_squares = {field}_squares + excluded.{field}_squares, "
+                           f"{field}_min = MIN({field}_min, excluded.{field}_min), "
+                           f"{field}_max = MAX({field}_max, excluded.{field}_max)")
+        self.conn.execute(f"""
+            INSERT INTO daily_rollups VALUES ({', '.join('?' * len(values))})
+            ON CONFLICT(day) DO UPDATE SET {', '.join(updates)}
+        """, values)
+
+    def append(self, entries: Iterable[Tuple[Dict[str, Any], str, Optional[List[Tuple[str, int, int]]]]],
+               header: Optional[Dict[str, Any]] = None) -> None:
+        """Ghi các bộ (kết quả, day, key_stats) cùng header trong một transaction"""
+        with self.conn:
+            groups = {}
+            for result, day, key_stats in entries:
+                self._insert([self._row(result, day)])
+                self._add_to_rollup(result, day)
+                if key_stats:
+                    self._add_key_stats(key_stats)
+                groups.setdefault(self._sketch_key(result, day), []).append(result)
+            self._add_to_sketches(groups)
+            if header is not None:
+                self._write_header(header)
+
+    def replace_all(self, results: Iterable[Tuple[Dict[str, Any], str]],
+                    key_stats: Dict[str, List[int]], header: Dict[str, Any]) -> None:
+        """Thay toàn bộ dữ liệu (import, xóa, chuyển từ JSON); results là các cặp (kết quả, day)"""
+        with self.conn:
+            self.conn.execute("DELETE FROM results")
+            self.conn.execute("DELETE FROM key_stats")
+            self._insert(self._row(result, day) for result, day in results)
+            self._rebuild_rollups()
+            self._rebuild_sketches()
+            self._add_key_stats((key, attempts, errors) for key, (attempts, errors) in key_stats.items())
+            self._write_header(header)
+
+    def recompute_days(self, day_of: Callable[[float], str], header: Dict[str, Any]) -> None:
+        """Tính lại cột day (đổi múi giờ/giờ bắt đầu ngày) rồi dựng lại rollup và sketch theo ngày"""
+        with self.conn:
+            rows = self.conn.execute("SELECT id, timestamp FROM results ORDER BY timestamp").fetchall()
+            self.conn.executemany("UPDATE results SET day = ? WHERE id = ?",
+                                  ((day_of(row['timestamp']), row['id']) for row in rows))
+            self._rebuild_rollups()
+            self._rebuild_sketches()
+            self._write_header(header)
+
+    # ---- đọc ----
+
+    @staticmethod
+    def _to_result(row: sqlite3.Row) -> Dict[str, Any]:
+        result = {
+            'wpm': row['wpm'],
+            'accuracy': row['accuracy'],
+            'time': row['time'],
+            'text_length': row['text_length'],
+            'user_length': row['user_length'],
+            'timestamp': row['timestamp'],
+            'date': row['date']
+        }
+        for key in ('mode', 'difficulty', 'content_type', 'recording', 'text_hash'):
+            if row[key] is not None:
+                result[key] = row[key]
+        if row['extra']:
+            result.update(json.loads(row['extra']))
+        return result
+
+    def iter_results(self) -> Iterator[Dict[str, Any]]:
+        """Duyệt toàn bộ kết quả theo thứ tự lưu, không nạp hết vào bộ nhớ"""
+        for row in self.conn.execute("SELECT * FROM results ORDER BY id"):
+            yield self._to_result(row)
+
+    def iter_rows(self, start: Optional[float] = None, end: Optional[float] = None,
+                  mode: Optional[str] = None) -> Iterator[tuple]:
+        """Như ResultColumns.iter_rows; lọc bằng index timestamp/mode, đọc dần theo cursor"""
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("timestamp < ?")
+            params.append(end)
+        if mode is not None:
+            conditions.append("mode = ?")
+            params.append(mode)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = self.conn.cursor()
+        # Tuple thường nhanh hơn sqlite3.Row khi xuất số lượng lớn
+        cursor.row_factory = None
+        cursor.arraysize = 1000
+        cursor.execute(f"""
+            SELECT timestamp, wpm, accuracy, time, text_length, user_length, mode, difficulty, content_type
+            FROM results {where} ORDER BY timestamp
+        """, params)
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                return
+            yield from rows
+
+    def identities(self) -> Iterator[tuple]:
+        """(timestamp, wpm, time) của mọi bài, dùng để bỏ bài trùng khi gộp dữ liệu import"""
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        cursor.arraysize = 1000
+        cursor.execute("SELECT timestamp, wpm, time FROM results")
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                return
+            yield from rows
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def recent(self, limit: int) -> List[Dict[str, Any]]:
+        rows = self.conn.execute("SELECT * FROM results ORDER BY timestamp DESC LIMIT ?", (limit,))
+        return [self._to_result(row) for row in rows]
+
+    def aggregates(self, fields: Iterable[str]) -> Dict[str, RunningStats]:
+        """count/sum/sum bình phương/min/max của từng cột trên toàn bộ kết quả"""
+        fields = list(fields)
+        for field in fields:
+            if field not in self.COLUMNS:
+                raise ValueError(f"Unsupported column: {field}")
+        selects = ', '.join(f"COUNT({field}), TOTAL({field}), TOTAL({field} * {field}), MIN({field}), MAX({field})"
+                            for field in fields)
+        row = self.conn.execute(f"SELECT {selects} FROM results").fetchone()
+        return {field: RunningStats(*row[i * 5:i * 5 + 5]) for i, field in enumerate(fields)}
+
+    def read_rollups(self) -> Dict[str, Dict[str, RunningStats]]:
+        """Toàn bộ rollup theo ngày, O(số ngày)"""
+        rollups = {}
+        for row in self.conn.execute("SELECT * FROM daily_rollups"):
+            rollups[row['day']] = {
+                field: RunningStats(row['count'], row[f'{field}_sum'], row[f'{field}_squares'],
+                                    row[f'{field}_min'], row[f'{field}_max'])
+                for field in self.ROLLUP_FIELDS
+            }
+        return rollups
+
+    def top_rows(self, columns: Iterable[str], limit: int) -> List[tuple]:
+        """Các bài nằm trong top limit theo từng cột, trên toàn bộ và trong từng mode (dạng iter_rows)
+
+        Mỗi cột một truy vấn ORDER BY ... LIMIT cho toàn bộ và cho mỗi mode (dùng index mode).
+        """
+        rows = {}
+        modes = [row[0] for row in self.conn.execute("SELECT DISTINCT mode FROM results WHERE mode IS NOT NULL")]
+        for column in columns:
+            if column not in ('wpm', 'accuracy', 'time', 'user_length'):
+                raise ValueError(f"Unsupported column: {column}")
+            queries = [("", ())] + [("WHERE mode = ?", (mode,)) for mode in modes]
+            for where, params in queries:
+                for row in self.conn.execute(f"""
+                    SELECT id, timestamp, wpm, accuracy, time, text_length, user_length, mode, difficulty,
+                           content_type
+                    FROM results {where} ORDER BY {column} DESC, timestamp LIMIT ?
+                """, params + (limit,)):
+                    rows[row[0]] = tuple(row)[1:]
+        return list(rows.values())
+
+    def _query_sql(self, query: ResultQuery) -> Tuple[str, list]:
+        conditions, params = [], []
+        if query.start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(query.start)
+        if query.end is not None:
+            conditions.append("timestamp < ?")
+            params.append(query.end)
+        for field, values in query.categories.items():
+            conditions.append(f"{field} IN ({', '.join('?' * len(values))})")
+            params.extend(sorted(values))
+        for field, op, value in query.conditions:
+            conditions.append(f"{field} {'=' if op == '==' else op} ?")
+            params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = "DESC" if query.descending else ""
+        order = f"{query.order_field} {direction}"
+        if query.order_field != 'timestamp':
+            order += ", timestamp"
+        sql = f"SELECT * FROM results {where} ORDER BY {order}"
+        if query.limit is not None:
+            sql += " LIMIT ?"
+            params.append(query.limit)
+        return sql, params
+
+    def query(self, query: ResultQuery) -> List[Dict[str, Any]]:
+        """Các bài thỏa mãn ResultQuery; SQLite tự chọn index (timestamp, mode, difficulty, content_type)"""
+        sql, params = self._query_sql(query)
+        return [self._to_result(row) for row in self.conn.execute(sql, params)]
+
+    def best_recorded(self, text_hash: int) -> Optional[Dict[str, Any]]:
+        """Bài có bản ghi phím với WPM cao nhất của một câu (dùng index text_hash)"""
+        row = self.conn.execute("""
+            SELECT wpm, timestamp, recording FROM results
+            WHERE text_hash = ? AND recording IS NOT NULL ORDER BY wpm DESC, timestamp LIMIT 1
+        """, (text_hash,)).fetchone()
+        if row is None:
+            return None
+        return {'wpm': row['wpm'], 'timestamp': row['timestamp'], 'recording': row['recording'],
+                'text_hash': text_hash}
+
+    def explain(self, query: ResultQuery) -> List[str]:
+        """Kế hoạch truy vấn của SQLite (EXPLAIN QUERY PLAN) cho ResultQuery"""
+        sql, params = self._query_sql(query)
+        return [row['detail'] for row in self.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
@@ -1,30 +1,342 @@
-import json
+import copy
+import heapq
+import lzma
 import os
+import re
+import sqlite3
 import time
-from typing import Dict, List, Any, Optional
-from datetime import datetime, timedelta
+import uuid
+import zlib
+from collections import deque
+from itertools import chain
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional
+from datetime import date, datetime, timedelta
+from results_log import ResultsLog
+from sqlite_store import SqliteResultStore
+from running_stats import RunningStats
+from result_columns import ResultColumns
+from stats_persister import WriteBehindPersister
+from stats_export import ResultExporter
+from stats_import import ResultImporter
+from quantile_sketch import QuantileSketches
+from personal_bests import PersonalBests
+from progress_series import ProgressSeries
+from file_lock import FileLock
+from result_archive import ResultArchive
+from result_query import ResultIndex, ResultQuery
+from keystroke_store import KeystrokeStore
+from ghost_index import GhostIndex
+from day_clock import DayClock
+from range_comparison import RangeComparison
 
 class StatisticsManager:
-    def __init__(self, stats_file: str = "typing_stats.json"):
+    BACKENDS = ('json', 'sqlite')
+    # always: fsync log sau mỗi lô; checkpoint: chỉ fsync header khi checkpoint; never: không fsync
+    FSYNC_POLICIES = ('always', 'checkpoint', 'never')
+    # Các chỉ số có tổng hợp chạy (count, sum, sum bình phương, min, max)
+    TRACKED_FIELDS = ('wpm', 'accuracy', 'time')
+    # Số bài gần nhất giữ trong ring buffer cho get_statistics
+    RECENT_LIMIT = 50
+    # Số bài mỗi lô khi gộp dữ liệu import
+    IMPORT_BATCH = 5000
+    # Trường nội bộ của bản ghi (ngày đã tính, tag của writer), không trả về qua query
+    INTERNAL_FIELDS = ('day', '_writer', '_seq')
+    # Checkpoint ghi lại log (bỏ key_stats và tag đã gộp vào header) khi số dòng chưa gọn đạt
+    # COMPACT_MIN_LINES và COMPACT_RATIO lần số dòng đã gọn: chi phí ghi lại chia đều cho các bài
+    COMPACT_MIN_LINES = 500
+    COMPACT_RATIO = 0.5
+    
+    def __init__(self, stats_file: str = "typing_stats.json", checkpoint_every: int = 200,
+                 backend: str = "json", db_file: Optional[str] = None,
+                 write_behind: bool = False, fsync_policy: str = "checkpoint",
+                 profile: Optional[str] = None, retention_days: Optional[int] = None,
+                 archive_compression: str = "lzma", timezone: Optional[str] = None,
+                 day_start_hour: int = 0):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unsupported statistics backend: {backend}")
+        if fsync_policy not in self.FSYNC_POLICIES:
+            raise ValueError(f"Unsupported fsync policy: {fsync_policy}")
+        # Mỗi hồ sơ người dùng có thư mục dữ liệu riêng: profiles/<tên>/typing_stats.json
+        self.profile = profile
+        if profile is not None:
+            stats_file = self.profile_path(stats_file, profile)
+            os.makedirs(os.path.dirname(stats_file), exist_ok=True)
         self.stats_file = stats_file
+        self.backend = backend
+        # Kết quả được ghi nối vào log JSONL, stats_file chỉ còn là header nhỏ
+        self.results_log = ResultsLog(stats_file)
+        # Khóa giữa các tiến trình cho mọi lần ghi log/header (nhiều phiên bản ứng dụng cùng hồ sơ)
+        self.lock_file = stats_file + ".lock"
+        # Mỗi bài ghi vào log mang (_writer, _seq); header ghi seq cuối cùng đã gộp của từng writer
+        self.writer_id = uuid.uuid4().hex[:12]
+        self._seq = 0
+        self._folded: Dict[str, int] = {}
+        # Vị trí và inode của log đã đọc tới, để đọc tiếp các bài do tiến trình khác ghi
+        self._log_position = 0
+        self._log_inode = None
+        # Số dòng của log và số dòng còn mang key_stats/tag (chưa được compact)
+        self._log_lines = 0
+        self._loose_lines = 0
+        # Bài cũ hơn retention_days ngày được chuyển sang archive nén theo tháng (chỉ backend JSON)
+        if retention_days is not None and retention_days < 0:
+            raise ValueError("retention_days must be non-negative")
+        self.retention_days = retention_days
+        # Ngày của bài (rollup, sketch, thống kê theo ngày, tháng lưu trữ) theo múi giờ và giờ bắt đầu
+        # ngày cấu hình được; mỗi bài lưu ordinal ngày tính lúc lưu ('day'), header ghi cấu hình đã dùng
+        self.day_clock = DayClock(timezone, day_start_hour)
+        self._stored_day_clock = self.day_clock.to_json()
+        self.archive = ResultArchive(os.path.splitext(stats_file)[0] + ".archive", archive_compression,
+                                     self.day_clock)
+        # Bản ghi phím của từng bài; kết quả chỉ giữ offset ('recording')
+        self.recordings = KeystrokeStore(os.path.splitext(stats_file)[0] + ".keystrokes.bin")
+        self.checkpoint_every = checkpoint_every
+        self.fsync_policy = fsync_policy
+        self._appends_since_checkpoint = 0
+        
+        # Với backend sqlite, kết quả nằm trong database và không được nạp vào self.data
+        self.db = None
+        if backend == 'sqlite':
+            if db_file is None:
+                db_file = os.path.splitext(stats_file)[0] + ".db"
+            self.db = SqliteResultStore(db_file)
+            
+        # Tổng hợp theo ngày: {'YYYY-MM-DD': {field: RunningStats}}; None nghĩa là cần dựng lại
+        self.daily_rollups = None
+        # t-digest wpm/accuracy theo (ngày, mode) để tính p50/p90/p99; None nghĩa là cần dựng lại
+        self.sketches = None
+        # Top-K kỷ lục cá nhân theo chỉ số và mode; None nghĩa là cần dựng lại
+        self.personal_bests = None
+        # Bài có bản ghi phím tốt nhất của từng câu (backend JSON); None nghĩa là cần dựng lại
+        self.ghosts = None
+        # Rollup, sketch và bóng ma dạng JSON của header (backend JSON), giữ bởi thread ghi; mỗi checkpoint
+        # chỉ gửi các ngày/câu đã đổi từ lần trước (None: gửi lại toàn bộ)
+        self._header_parts = {'daily_rollups': {}, 'sketches': {}, 'ghosts': {}}
+        self._dirty_days = None
+        self._dirty_ghosts = None
+        # Index trên các bài chưa lưu trữ cho query (backend JSON), dựng khi truy vấn lần đầu
+        self._result_index = None
+        # Ghi nền: save_result chỉ cập nhật bộ nhớ và đưa việc ghi vào hàng đợi
+        self.persister = None
+        self._writer_db = None
+        # Lỗi khi nạp dữ liệu (file gốc được giữ bản sao .corrupt-*)
+        self.load_error = None
+        # Số liệu của lần import_data gần nhất
+        self.last_import_report = None
+        self.aggregates = None
+        self.recent_results = deque(maxlen=self.RECENT_LIMIT)
         self.data = self._load_statistics()
+        # Cuối file bản ghi phím, để save_result dành chỗ mà không phải đọc đĩa
+        self.recordings.sync()
+        if self._day_clock_changed() and not self.load_error:
+            # Dữ liệu được chia ngày (hoặc archive chia tháng) theo cấu hình khác: tính lại một lần
+            self._recompute_days()
+        else:
+            self._rebuild_aggregates()
+        if retention_days is not None and self.db is None and not self.load_error:
+            self.archive_old_results()
+        
+        if write_behind:
+            self.persister = WriteBehindPersister(self._write_batch)
+        
+    @staticmethod
+    def profile_path(stats_file: str, profile: str) -> str:
+        if not re.match(r'^[\w.-]+$', profile) or profile.startswith('.'):
+            raise ValueError(f"Invalid profile name: {profile}")
+        return os.path.join(os.path.dirname(stats_file), 'profiles', profile, os.path.basename(stats_file))
+        
+    @staticmethod
+    def list_profiles(stats_file: str = "typing_stats.json") -> List[str]:
+        profiles_dir = os.path.join(os.path.dirname(stats_file), 'profiles')
+        if not os.path.isdir(profiles_dir):
+            return []
+        return sorted(name for name in os.listdir(profiles_dir)
+                      if os.path.isdir(os.path.join(profiles_dir, name)) and not name.startswith('.'))
         
     def _load_statistics(self) -> Dict[str, Any]:
+        if self.db is not None:
+            return self._load_database()
+        # Giữ khóa để header và log đọc được thuộc cùng một lần compaction của tiến trình khác
         try:
-            if os.path.exists(self.stats_file):
-                with open(self.stats_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if self._validate_data_structure(data):
-                        return data
-                        
-            return self._create_empty_structure()
+            with FileLock(self.lock_file):
+                return self._load_log()
+        except IOError as e:
+            raise Exception(f"Failed to load statistics: {str(e)}")
+        
+    def _load_database(self) -> Dict[str, Any]:
+        header = self.db.read_header()
+        if header is None:
+            # Lần đầu dùng SQLite: chuyển dữ liệu JSON sẵn có (file JSON được giữ nguyên)
+            try:
+                with FileLock(self.lock_file):
+                    self.data = self._load_log(compact=False)
+            except IOError as e:
+                raise Exception(f"Failed to migrate statistics: {str(e)}")
+            if self.load_error:
+                raise Exception(f"Failed to migrate statistics: {self.load_error}")
+            if len(self.archive):
+                self.data['results'] = ResultColumns.from_records(chain(self.archive.iter_results(),
+                                                                        self.data['results']))
+            if os.path.exists(self.stats_file) or self.data['results']:
+                self.data['session_data']['migrated_from'] = os.path.basename(self.stats_file)
+            self._replace_database()
+            header = self.db.read_header()
+        self._stored_day_clock = header.get('day_clock', DayClock().to_json())
+            
+        data = {
+            'session_data': header.get('session_data', {}),
+            'preferences': header.get('preferences', {}),
+            'created_at': header.get('created_at', time.time()),
+            'last_updated': header.get('last_updated', time.time())
+        }
+        data['session_data']['key_stats'] = self.db.read_key_stats()
+        return data
+        
+    def _load_log(self, compact: bool = True) -> Dict[str, Any]:
+        """Khôi phục từ checkpoint tốt nhất rồi phát lại phần log phía sau nó
+        
+        Người gọi giữ khóa file; compact: ghi lại log ngay nếu có dòng hỏng hoặc header cũ.
+        """
+        try:
+            self.archive.reload()
+            header = self.results_log.read_header()
             
-        except (json.JSONDecodeError, IOError, KeyError):
+            if isinstance(header, dict) and 'results' in header:
+                # Định dạng cũ: toàn bộ lịch sử nằm trong một file JSON
+                self.daily_rollups = None
+                self.sketches = None
+                self.personal_bests = None
+                self.ghosts = None
+                if not self._validate_data_structure(header):
+                    raise ValueError("Invalid statistics file structure")
+                header['results'] = ResultColumns.from_records(header['results'])
+                # Rollup và ngày của các bài đều được tính theo cấu hình hiện tại
+                self._assign_days(header['results'])
+                self._stored_day_clock = self.day_clock.to_json()
+                self._folded = {}
+                self._log_position, self._log_inode = 0, None
+                self._log_lines = self._loose_lines = 0
+                if compact:
+                    self.data = header
+                    self._compact_locked()
+                    return self.data
+                return header
+                
+            data = self._create_empty_structure()
+            log_offset = 0
+            rollups = None
+            sketches = None
+            bests = None
+            ghosts = None
+            writers = {}
+            lines = loose = 0
+            parts = {'daily_rollups': {}, 'sketches': {}, 'ghosts': {}}
+            self._stored_day_clock = self.day_clock.to_json()
+            if isinstance(header, dict):
+                self._stored_day_clock = header.get('day_clock', DayClock().to_json())
+                for key in ('session_data', 'preferences', 'created_at', 'last_updated'):
+                    if key in header:
+                        data[key] = header[key]
+                # Checkpoint của log trước compaction: phát lại toàn bộ log, dựng lại rollup
+                if not self.results_log.header_stale:
+                    log_offset = header.get('log_offset', 0)
+                    rollups = self._decode_rollups(header.get('daily_rollups'))
+                    sketches = QuantileSketches.from_json(header.get('sketches'))
+                    bests = PersonalBests.from_json(header.get('personal_bests'))
+                    ghosts = GhostIndex.from_json(header.get('ghosts'))
+                    if isinstance(header.get('writers'), dict):
+                        writers = header['writers']
+                    # Phần JSON của header đọc được dùng lại cho checkpoint tới
+                    for key, decoded in (('daily_rollups', rollups), ('sketches', sketches), ('ghosts', ghosts)):
+                        if decoded is not None:
+                            parts[key] = header[key]
+            self._folded = dict(writers)
+            dirty_days = set() if rollups is not None and sketches is not None else None
+            dirty_ghosts = set() if ghosts is not None else None
+                    
+            for offset, record in self.results_log.iter_records():
+                writer, seq = self._pop_tag(record)
+                key_stats = record.pop('key_stats', None)
+                lines += 1
+                if writer is not None or key_stats is not None:
+                    loose += 1
+                try:
+                    data['results'].append(record)
+                except (ValueError, TypeError, OverflowError):
+                    # Dòng JSON hợp lệ nhưng không phải kết quả hợp lệ: coi như dòng hỏng
+                    self.results_log.bad_lines += 1
+                    continue
+                # Chỉ gộp phần key_stats/rollup chưa được checkpoint vào header: bài có writer
+                # được nhận biết theo seq (các tiến trình ghi xen kẽ), bài cũ theo vị trí trong log
+                if writer is not None:
+                    folded = seq > writers.get(writer, 0)
+                    if folded:
+                        self._folded[writer] = max(self._folded.get(writer, 0), seq)
+                else:
+                    folded = offset >= log_offset
+                if folded:
+                    if key_stats:
+                        try:
+                            self._apply_key_stats(data, self._validate_key_stats(key_stats))
+                        except (ValueError, TypeError, AttributeError):
+                            pass
+                    if rollups is not None:
+                        self._add_to_rollups(rollups, record)
+                    if sketches is not None:
+                        self._add_to_sketches(sketches, record)
+                    if dirty_days is not None and 'timestamp' in record:
+                        dirty_days.add(self._day_label(record))
+                    if bests is not None:
+                        bests.add(record)
+                    if ghosts is not None and ghosts.add(record) and dirty_ghosts is not None:
+                        dirty_ghosts.add(record['text_hash'])
+                
+            data['results'] = self._drop_archived(data['results'])
+            # Log ghi trước khi có cột day
+            self._assign_days(data['results'])
+            self.daily_rollups = rollups
+            self.sketches = sketches
+            self.personal_bests = bests
+            self.ghosts = ghosts
+            self._header_parts = parts
+            self._dirty_days = dirty_days
+            self._dirty_ghosts = dirty_ghosts
+            self._log_position = self.results_log.end_offset
+            self._log_inode = self.results_log.inode
+            self._log_lines, self._loose_lines = lines, loose
+            if compact and (self.results_log.bad_lines or self.results_log.header_stale
+                            or header is None and data['results']):
+                self.data = data
+                self._compact_locked()
+                return self.data
+            return data
+            
+        except (IOError, KeyError, ValueError, TypeError) as e:
+            # Không để dữ liệu đọc không được bị ghi đè: giữ bản sao rồi bắt đầu với dữ liệu trống
+            self.load_error = str(e)
+            if compact:
+                self.results_log.preserve()
+            self.daily_rollups = None
+            self.sketches = None
+            self.personal_bests = None
+            self.ghosts = None
             return self._create_empty_structure()
             
+    def _drop_archived(self, results: ResultColumns) -> ResultColumns:
+        """Bỏ các bài trong log đã nằm trong archive (lưu trữ bị dừng trước khi kịp ghi lại log)"""
+        cutoff = self.archive.cutoff
+        if cutoff is None or not any(timestamp < cutoff for timestamp in results.columns['timestamp']):
+            return results
+        start = min(timestamp for timestamp in results.columns['timestamp'] if timestamp < cutoff)
+        archived = set(row[:2] + (row[3],) for row in self.archive.iter_rows(start, cutoff))
+        # Bài cũ được gộp vào sau khi lưu trữ (import) vẫn giữ lại cho lần lưu trữ tới
+        return ResultColumns.from_records(
+            result for result, identity in zip(results, results.identities())
+            if not identity[0] < cutoff or identity not in archived
+        )
+        
     def _create_empty_structure(self) -> Dict[str, Any]:
         return {
-            'results': [],
+            'results': ResultColumns(),
             'session_data': {},
             'preferences': {},
             'created_at': time.time(),
@@ -35,14 +347,583 @@ class StatisticsManager:
         required_keys = ['results', 'session_data', 'preferences']
         return all(key in data for key in required_keys)
         
+    def _header(self) -> Dict[str, Any]:
+        """Header đầy đủ, dựng ngay trên luồng gọi (người gọi đã chờ thread ghi nền xong)"""
+        return self._assemble_header(self._header_snapshot(full=True))
+        
+    def _header_snapshot(self, full: bool = False) -> Dict[str, Any]:
+        """Bản chụp header trên luồng gọi, không dùng chung đối tượng nào với dữ liệu đang được cập nhật
+        
+        Các trường nhỏ được sao chép; rollup và sketch chỉ gồm các ngày đã đổi từ lần chụp trước, bóng
+        ma chỉ gồm các câu đã đổi (full: toàn bộ). _assemble_header ghép thành header đầy đủ.
+        """
+        session_data = {key: copy.deepcopy(value) for key, value in self.data.get('session_data', {}).items()
+                        if key != 'key_stats'}
+        fields = {
+            'session_data': session_data,
+            'preferences': copy.deepcopy(self.data.get('preferences', {})),
+            'created_at': self.data.get('created_at'),
+            'last_updated': self.data.get('last_updated'),
+            'day_clock': self.day_clock.to_json()
+        }
+        snapshot = {'fields': fields, 'changed': {}, 'replaced': ()}
+        # key_stats có bảng riêng trong database
+        if self.db is not None:
+            return snapshot
+        key_stats = self.data.get('session_data', {}).get('key_stats')
+        if key_stats is not None:
+            session_data['key_stats'] = {key: list(value) for key, value in key_stats.items()}
+        fields['results_count'] = len(self.data.get('results', []))
+        # SQLite có bảng daily_rollups riêng, JSON lưu rollup trong header
+        self._ensure_rollups()
+        self._ensure_sketches()
+        self._ensure_bests()
+        self._ensure_ghosts()
+        fields['personal_bests'] = self.personal_bests.to_json()
+        fields['writers'] = dict(self._folded)
+        days = None if full else self._dirty_days
+        text_hashes = None if full else self._dirty_ghosts
+        snapshot['changed'] = {
+            'daily_rollups': self._encode_rollups(days),
+            'sketches': self.sketches.to_json(days),
+            'ghosts': self.ghosts.to_json(text_hashes)
+        }
+        snapshot['replaced'] = (('daily_rollups', 'sketches') if days is None else ()) + (
+            ('ghosts',) if text_hashes is None else ())
+        self._dirty_days = set()
+        self._dirty_ghosts = set()
+        return snapshot
+        
+    def _assemble_header(self, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        """Header đầy đủ từ bản chụp của _header_snapshot (trên thread ghi nền khi checkpoint)"""
+        header = dict(snapshot['fields'])
+        for key, encoded in snapshot['changed'].items():
+            if key in snapshot['replaced']:
+                self._header_parts[key] = encoded
+            else:
+                self._header_parts[key].update(encoded)
+            header[key] = self._header_parts[key]
+        # Bóng ma có bản ghi phím đã bị chuyển chỗ trên thread ghi
+        relocated = self.recordings.relocated
+        if relocated:
+            ghosts = self._header_parts['ghosts']
+            for key, (wpm, timestamp, recording) in list(ghosts.items()):
+                if recording in relocated:
+                    ghosts[key] = [wpm, timestamp, relocated[recording]]
+        # Tag được gắn trên thread ghi: seq hiện tại là của bài cuối cùng đã ghi trước header này
+        if self._seq:
+            header['writers'] = dict(header['writers'])
+            header['writers'][self.writer_id] = max(header['writers'].get(self.writer_id, 0), self._seq)
+        return header
+        
+    def _encode_rollups(self, days: Optional[Iterable[str]] = None) -> Dict[str, list]:
+        rollups = self.daily_rollups
+        days = rollups if days is None else [day for day in days if day in rollups]
+        return {day: [rollups[day][field].to_list() for field in self.TRACKED_FIELDS] for day in days}
+        
+    @staticmethod
+    def _pop_tag(record: Dict[str, Any]) -> tuple:
+        """Tách (_writer, _seq) khỏi một dòng log; (None, None) với dòng không có"""
+        writer = record.pop('_writer', None)
+        seq = record.pop('_seq', None)
+        if not isinstance(writer, str) or not isinstance(seq, int):
+            return None, None
+        return writer, seq
+        
+    def _next_tag(self) -> Dict[str, Any]:
+        self._seq += 1
+        return {'_writer': self.writer_id, '_seq': self._seq}
+        
+    def _catch_up(self, locked: bool = False) -> None:
+        """Gộp vào bộ nhớ các bài mà tiến trình khác đã ghi nối vào log từ lần đọc trước
+        
+        Log chưa từng đọc hoặc đã bị compact (thế hệ khác) thì được nạp lại toàn bộ.
+        locked: người gọi đang giữ khóa file.
+        """
+        if self.db is not None:
+            return
+        try:
+            stat = os.stat(self.results_log.log_file)
+        except FileNotFoundError:
+            return
+        if stat.st_ino == self._log_inode and stat.st_size == self._log_position:
+            return
+        if self._log_inode is None or stat.st_size < self._log_position:
+            self._reload(locked)
+            return
+            
+        # Đọc trên chính file đã kiểm tra thế hệ: inode của log cũ có thể được dùng lại sau compaction
+        for _, record in self.results_log.iter_records(self._log_position, self.results_log.generation):
+            writer, seq = self._pop_tag(record)
+            key_stats = record.pop('key_stats', None)
+            # Bài của chính phiên này đã có trong bộ nhớ
+            if writer is None or writer == self.writer_id or seq <= self._folded.get(writer, 0):
+                continue
+            try:
+                self.data['results'].append(record)
+            except (ValueError, TypeError, OverflowError):
+                continue
+            self._folded[writer] = seq
+            if key_stats:
+                try:
+                    self._apply_key_stats(self.data, self._validate_key_stats(key_stats))
+                except (ValueError, TypeError, AttributeError):
+                    pass
+            if all(field in record for field in self.TRACKED_FIELDS):
+                self._track_result(record)
+        if self.results_log.generation_changed:
+            self._reload(locked)
+            return
+        self._log_position = self.results_log.end_offset
+        self._log_inode = self.results_log.inode
+        
+    def _reload(self, locked: bool = False) -> None:
+        """Nạp lại dữ liệu từ đĩa sau khi tiến trình khác compact log (import, xóa, khôi phục)"""
+        self.flush()
+        self.load_error = None
+        # Giữ khóa để header và log đọc được thuộc cùng một lần compaction
+        if locked:
+            data = self._load_log(compact=False)
+        else:
+            with FileLock(self.lock_file):
+                data = self._load_log(compact=False)
+        if self.load_error:
+            raise Exception(f"Failed to reload statistics: {self.load_error}")
+        self.data = data
+        self._rebuild_aggregates()
+        
+    def refresh(self) -> None:
+        """Cập nhật các bài do phiên bản ứng dụng khác (cùng hồ sơ) đã lưu"""
+        self.flush()
+        self.recordings.sync()
+        if self.db is None:
+            self._catch_up()
+            return
+        self.data['session_data']['key_stats'] = self.db.read_key_stats()
+        self._rebuild_aggregates()
+        
+    def _decode_rollups(self, encoded: Any) -> Optional[Dict[str, Dict[str, RunningStats]]]:
+        """Đọc rollup đã lưu trong header; None nếu thiếu hoặc sai định dạng (sẽ được dựng lại)"""
+        if not isinstance(encoded, dict):
+            return None
+        try:
+            rollups = {}
+            for day, values in encoded.items():
+                if len(values) != len(self.TRACKED_FIELDS):
+                    return None
+                rollups[day] = {field: RunningStats.from_list(value)
+                                for field, value in zip(self.TRACKED_FIELDS, values)}
+            return rollups
+        except (TypeError, ValueError):
+            return None
+            
+    def _add_to_rollups(self, rollups: Dict[str, Dict[str, RunningStats]], result: Dict[str, Any]) -> None:
+        if 'timestamp' not in result:
+            return
+        day = self._day_label(result)
+        rollup = rollups.get(day)
+        if rollup is None:
+            rollup = rollups[day] = {field: RunningStats() for field in self.TRACKED_FIELDS}
+        for field in self.TRACKED_FIELDS:
+            if field in result:
+                rollup[field].add(result[field])
+                
+    def _ensure_rollups(self) -> None:
+        if self.daily_rollups is None:
+            self._dirty_days = None
+            self.daily_rollups = {}
+            for result in chain(self.archive.iter_results(), self.data.get('results', [])):
+                self._add_to_rollups(self.daily_rollups, result)
+        
+    def _add_to_sketches(self, sketches: QuantileSketches, result: Dict[str, Any]) -> None:
+        if 'timestamp' not in result or not all(field in result for field in QuantileSketches.FIELDS):
+            return
+        sketches.add(self._day_label(result), result.get('mode'), result)
+        
+    def _ensure_sketches(self) -> None:
+        if self.sketches is not None:
+            return
+        self._dirty_days = None
+        sketches = QuantileSketches()
+        results = self.data['results']
+        # Bài đã lưu trữ không giữ ngày (-1): tính từ timestamp
+        rows = chain(((-1, row) for row in self.archive.iter_rows()),
+                     zip(results.columns['day'], results.iter_rows()))
+        label = self.day_clock.label
+        for day, (timestamp, wpm, accuracy, _, _, _, mode, _, _) in rows:
+            # NaN là giá trị thiếu
+            if timestamp == timestamp and wpm == wpm and accuracy == accuracy:
+                day = label(day) if day >= 0 else self._day_of(timestamp)
+                sketches.add(day, mode, {'wpm': wpm, 'accuracy': accuracy})
+        self.sketches = sketches
+        
+    def _ensure_bests(self) -> None:
+        if self.personal_bests is None:
+            self.personal_bests = PersonalBests.from_rows(self._iter_rows())
+            
+    def _ensure_ghosts(self) -> None:
+        if self.ghosts is None:
+            self._dirty_ghosts = None
+            self.ghosts = GhostIndex.from_records(chain(self.archive.iter_results(), self.data['results']))
+            
+    def _iter_rows(self, start: Optional[float] = None, end: Optional[float] = None,
+                   mode: Optional[str] = None) -> Iterator[tuple]:
+        """iter_rows của backend JSON: các tháng đã lưu trữ giao với khoảng rồi tới các bài trong bộ nhớ"""
+        return chain(self.archive.iter_rows(start, end, mode), self.data['results'].iter_rows(start, end, mode))
+        
+    def _day_of(self, timestamp: float) -> str:
+        """Ngày địa phương (YYYY-MM-DD) của một timestamp theo day_clock"""
+        return self.day_clock.day_of(timestamp)
+        
+    def _day_label(self, result: Dict[str, Any]) -> str:
+        """Ngày của một bài: dùng ordinal đã lưu khi có, chỉ tính từ timestamp với bài cũ/đã lưu trữ"""
+        day = result.get('day')
+        if isinstance(day, int) and day > 0:
+            return self.day_clock.label(day)
+        return self._day_of(result.get('timestamp', 0))
+        
+    def _assign_days(self, results: ResultColumns, recompute: bool = False) -> None:
+        """Điền cột day từ timestamp: các bài chưa có, hoặc mọi bài khi recompute"""
+        days = results.columns['day']
+        ordinal = self.day_clock.ordinal
+        for index, timestamp in enumerate(results.columns['timestamp']):
+            if (recompute or days[index] < 0) and timestamp == timestamp:
+                days[index] = ordinal(timestamp)
+                
+    def _day_clock_changed(self) -> bool:
+        spec = self.day_clock.to_json()
+        if self.db is None and self.archive.months and self.archive.day_clock.to_json() != spec:
+            return True
+        return self._stored_day_clock != spec
+        
+    def set_day_clock(self, timezone: Optional[str] = None, day_start_hour: int = 0) -> None:
+        """Đổi múi giờ/giờ bắt đầu ngày; ngày của các bài cùng rollup và sketch được tính lại một lần"""
+        clock = DayClock(timezone, day_start_hour)
+        if clock.to_json() == self.day_clock.to_json():
+            return
+        self.day_clock = clock
+        self.archive.default_clock = clock
+        self._recompute_days()
+        
+    def _recompute_days(self) -> None:
+        """Chia lại ngày của mọi bài theo day_clock: một lần quét timestamp rồi dựng lại tổng hợp theo ngày"""
+        self.flush()
+        try:
+            if self.db is not None:
+                self.db.recompute_days(self._day_of, self._header())
+            else:
+                with FileLock(self.lock_file):
+                    self._catch_up(locked=True)
+                    if self.archive.day_clock.to_json() != self.day_clock.to_json():
+                        self.archive.repartition(self.day_clock)
+                    self._assign_days(self.data['results'], recompute=True)
+                    # Dựng lại từ cột day mới khi ghi header
+                    self.daily_rollups = None
+                    self.sketches = None
+                    self._rewrite_log()
+        except (IOError, sqlite3.Error, lzma.LZMAError) as e:
+            raise Exception(f"Failed to save statistics: {str(e)}")
+        self._stored_day_clock = self.day_clock.to_json()
+        self._rebuild_aggregates()
+        
     def _save_statistics(self) -> None:
+        """Checkpoint header: ghi session_data và đánh dấu vị trí log đã gộp tới (không ghi lại kết quả)"""
+        self.data['last_updated'] = time.time()
+        # Chụp header ngay trên luồng gọi để khớp đúng với các kết quả đã đưa vào hàng đợi, nhưng chỉ
+        # phần đã đổi; thread ghi dựng header đầy đủ và mã hóa JSON. Vị trí log đã đọc cho biết header
+        # có gộp hết các dòng của tiến trình khác không (để compact)
+        self._persist({'header': self._header_snapshot(), 'log_position': self._log_position})
+        self._appends_since_checkpoint = 0
+        
+    def _persist(self, item: Dict[str, Any]) -> None:
+        if self.persister is not None:
+            self.persister.submit(item)
+            return
         try:
-            self.data['last_updated'] = time.time()
-            with open(self.stats_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, indent=2, ensure_ascii=False)
+            self._write_batch([item])
+        except (IOError, sqlite3.Error) as e:
+            raise Exception(f"Failed to save statistics: {str(e)}")
+            
+    def _write_batch(self, items: List[Dict[str, Any]]) -> None:
+        """Ghi một lô theo thứ tự: các kết quả liên tiếp gộp thành một lần ghi, header ghi atomic"""
+        if self.db is not None:
+            # SQLite tự khóa database khi ghi
+            self._write_items(items)
+            return
+        with FileLock(self.lock_file):
+            self._write_items(items)
+            
+    def _write_items(self, items: List[Dict[str, Any]]) -> None:
+        results = []
+        for item in items:
+            if 'header' in item:
+                self._write_results(results)
+                results = []
+                self._write_header(self._assemble_header(item['header']), item.get('log_position'))
+            else:
+                results.append(item)
+        self._write_results(results)
+        
+    def _writer_store(self) -> SqliteResultStore:
+        if self.persister is None:
+            return self.db
+        # Thread ghi nền dùng kết nối riêng; WAL cho phép luồng chính đọc song song
+        if self._writer_db is None:
+            self._writer_db = SqliteResultStore(self.db.db_file, check_same_thread=False)
+        return self._writer_db
+        
+    def _write_results(self, items: List[Dict[str, Any]]) -> None:
+        if not items:
+            return
+        for item in items:
+            # Offset thực sự được giữ trong item: lô bị thử lại không ghi lại bản ghi phím
+            if item.get('keystrokes') is not None and 'stored' not in item:
+                item['stored'] = {'recording': self.recordings.write(item['result']['recording'],
+                                                                     item['keystrokes'])}
+        if self.db is not None:
+            self._writer_store().append((dict(item['result'], **item.get('stored', {})), item['day'],
+                                         item['key_stats']) for item in items)
+        else:
+            # Tag gắn trên thread ghi theo đúng thứ tự ghi vào log; giữ lại trong item để lô bị
+            # thử lại không lấy seq mới
+            for item in items:
+                if 'tag' not in item:
+                    item['tag'] = self._next_tag()
+            self.results_log.append((dict(item['record'], **item.get('stored', {}), **item['tag'])
+                                     for item in items),
+                                    fsync=self.fsync_policy == 'always')
+            self._log_lines += len(items)
+            self._loose_lines += len(items)
+            
+    def _write_header(self, header: Dict[str, Any], log_position: Optional[int] = None) -> None:
+        if self.db is not None:
+            self._writer_store().write_header(header)
+        else:
+            if self.results_log.read_generation() != self.results_log.generation:
+                # Tiến trình khác đã compact log: header này không còn khớp, bỏ qua cho tới khi nạp lại
+                return
+            if (log_position is not None and self._compaction_due()
+                    and self._log_folded(header.get('writers', {}), log_position)):
+                self._compact_log(header)
+                return
+            self.results_log.write_header(dict(header, log_offset=self.results_log.size()),
+                                          fsync=self.fsync_policy != 'never')
+            
+    def _compaction_due(self) -> bool:
+        loose = self._loose_lines
+        return loose >= self.COMPACT_MIN_LINES and loose >= self.COMPACT_RATIO * (self._log_lines - loose)
+        
+    def _log_folded(self, writers: Dict[str, int], start: int) -> bool:
+        """Các dòng từ start (vị trí luồng chính đã đọc tới) đều đã gộp vào header có bảng seq writers,
+        tức không còn bài của tiến trình khác chưa được đọc"""
+        for _, record in self.results_log.iter_records(start, self.results_log.generation):
+            writer, seq = self._pop_tag(record)
+            if writer is not None and seq > writers.get(writer, 0):
+                return False
+        return not self.results_log.generation_changed
+        
+    def _compact_log(self, header: Dict[str, Any]) -> None:
+        """Compact ở checkpoint (người gọi giữ khóa file): ghi lại log từ chính nó, bỏ key_stats và tag
+        của mọi dòng vì header đã gộp hết; không cần dựng lại danh sách kết quả trên luồng chính"""
+        lines = 0
+        
+        def records():
+            nonlocal lines
+            for _, record in self.results_log.iter_records(0, self.results_log.generation):
+                record.pop('key_stats', None)
+                self._pop_tag(record)
+                lines += 1
+                yield record
+                
+        self.results_log.rewrite(records(), header)
+        self._log_lines, self._loose_lines = lines, 0
+        # Log mới chứa đúng các bài đã có trong bộ nhớ: đọc tiếp từ cuối log mới
+        self._log_position = self.results_log.end_offset
+        self._log_inode = self.results_log.inode
+            
+    def flush(self) -> None:
+        """Chờ thread nền ghi xong mọi kết quả đang chờ"""
+        if self.persister is not None:
+            try:
+                self.persister.flush()
+            except Exception as e:
+                raise Exception(f"Failed to save statistics: {str(e)}")
+        if self.recordings.take_relocated():
+            # Tiến trình khác đã ghi vào chỗ dành cho bản ghi phím (nhiều cửa sổ lưu bài cùng lúc):
+            # trên đĩa các bài đã trỏ tới offset mới, nạp lại từ đó
+            if self.db is None:
+                self._reload()
+            else:
+                self._rebuild_aggregates()
+            
+    def close(self) -> None:
+        """Checkpoint lần cuối, dừng thread ghi nền và đóng database (gọi khi thoát ứng dụng)"""
+        try:
+            self._save_statistics()
+            if self.persister is not None:
+                self.persister.close()
+        except Exception as e:
+            raise Exception(f"Failed to save statistics: {str(e)}")
+        finally:
+            self.persister = None
+            if self._writer_db is not None:
+                self._writer_db.close()
+                self._writer_db = None
+            if self.db is not None:
+                self.db.close()
+            
+    def compact(self) -> None:
+        """Ghi lại log từ dữ liệu trong bộ nhớ: bỏ dòng hỏng và các key_stats đã gộp vào header
+        
+        Giữ khóa trong lúc ghi; các bài do tiến trình khác ghi thêm được gộp vào trước.
+        """
+        self.flush()
+        try:
+            with FileLock(self.lock_file):
+                self._compact_locked()
+        except IOError as e:
+            raise Exception(f"Failed to save statistics: {str(e)}")
+            
+    def _compact_locked(self) -> None:
+        """compact khi người gọi đã giữ khóa file"""
+        try:
+            self._catch_up(locked=True)
+            self._rewrite_log()
         except IOError as e:
             raise Exception(f"Failed to save statistics: {str(e)}")
             
+    def _rewrite_log(self) -> None:
+        """Ghi lại log từ self.data['results'] (người gọi giữ khóa file)"""
+        self.data['last_updated'] = time.time()
+        # Log mới không còn dòng mang writer: mọi dòng đều nằm trước log_offset
+        self._folded = {}
+        self.results_log.rewrite(self.data.get('results', []), self._header())
+        self._log_position = self.results_log.end_offset
+        self._log_inode = self.results_log.inode
+        self._log_lines, self._loose_lines = len(self.data.get('results', [])), 0
+        self._appends_since_checkpoint = 0
+        
+    def archive_old_results(self, days: Optional[int] = None) -> int:
+        """Chuyển các bài cũ hơn days ngày (mặc định retention_days) vào archive nén theo tháng
+        
+        Rollup, sketch, key_stats và tổng hợp vẫn tính cả các bài đã lưu trữ; các truy vấn theo
+        khoảng thời gian (biểu đồ, export) chỉ đọc các tháng lưu trữ nằm trong khoảng.
+        Trả về số bài đã chuyển.
+        """
+        if self.db is not None:
+            raise ValueError("Retention is only supported by the JSON backend")
+        days = self.retention_days if days is None else days
+        if days is None or days < 0:
+            raise ValueError("Retention days must be non-negative")
+        cutoff = self.day_clock.day_bounds(self.day_clock.today() - days)[0]
+        
+        self.flush()
+        try:
+            with FileLock(self.lock_file):
+                self._catch_up(locked=True)
+                results = self.data['results']
+                timestamps = results.columns['timestamp']
+                old = [index for index, timestamp in enumerate(timestamps) if timestamp < cutoff]
+                if not old:
+                    return 0
+                # Archive ghi xong trước khi log được ghi lại không còn các bài này; không giữ ngày
+                # để bài lưu trữ luôn được chia ngày theo cấu hình hiện tại
+                self.archive.add(({key: value for key, value in results[index].items() if key != 'day'}
+                                  for index in old), cutoff)
+                self.data['results'] = ResultColumns.from_records(
+                    results[index] for index, timestamp in enumerate(timestamps) if not timestamp < cutoff
+                )
+                self._rewrite_log()
+        except (IOError, lzma.LZMAError) as e:
+            raise Exception(f"Failed to archive statistics: {str(e)}")
+        return len(old)
+            
+    def _replace_database(self) -> None:
+        """Ghi self.data (dạng JSON đầy đủ, có 'results') vào database rồi bỏ results khỏi bộ nhớ"""
+        self.flush()
+        try:
+            self.data['last_updated'] = time.time()
+            results = self.data.pop('results', [])
+            key_stats = self.data.get('session_data', {}).get('key_stats', {})
+            self.db.replace_all(
+                ((result, self._day_label(result)) for result in results),
+                key_stats, self._header()
+            )
+        except sqlite3.Error as e:
+            raise Exception(f"Failed to save statistics: {str(e)}")
+            
+    def _replace_all(self) -> None:
+        self.daily_rollups = None
+        self.sketches = None
+        self.personal_bests = None
+        self.ghosts = None
+        if self.db is not None:
+            self._replace_database()
+            try:
+                self.recordings.clear()
+            except IOError as e:
+                raise Exception(f"Failed to save statistics: {str(e)}")
+        else:
+            self.flush()
+            try:
+                with FileLock(self.lock_file):
+                    # Dữ liệu mới thay cả các bài đã lưu trữ
+                    self.archive.clear()
+                    self.recordings.clear()
+                    self._rewrite_log()
+            except IOError as e:
+                raise Exception(f"Failed to save statistics: {str(e)}")
+        self._rebuild_aggregates()
+        
+    def _rebuild_aggregates(self) -> None:
+        """Tính lại tổng hợp chạy và ring buffer từ toàn bộ lịch sử (chỉ khi nạp, import, xóa)"""
+        if self.db is not None:
+            self.aggregates = self.db.aggregates(self.TRACKED_FIELDS)
+            self.daily_rollups = self.db.read_rollups()
+            self.sketches = QuantileSketches.from_rows(self.db.read_sketches())
+            self.personal_bests = PersonalBests.from_rows(self.db.top_rows(PersonalBests.FIELDS,
+                                                                           PersonalBests.LIMIT))
+            recent = reversed(self.db.recent(self.RECENT_LIMIT))
+        else:
+            self._ensure_rollups()
+            self._ensure_sketches()
+            self._ensure_bests()
+            results = self.data['results']
+            self.aggregates = self.archive.stats()
+            for field in self.TRACKED_FIELDS:
+                self.aggregates[field].merge(results.stats(field))
+            timestamps = results.columns['timestamp']
+            newest = heapq.nlargest(self.RECENT_LIMIT, range(len(results)), key=timestamps.__getitem__)
+            recent = [results[index] for index in reversed(newest)]
+            # Ít bài mới: lấy thêm từ các tháng lưu trữ gần nhất
+            for month in sorted(self.archive.months, reverse=True):
+                if len(recent) >= self.RECENT_LIMIT:
+                    break
+                archived = list(self.archive.load(month))
+                recent = archived[max(len(archived) - (self.RECENT_LIMIT - len(recent)), 0):] + recent
+        self.recent_results = deque(recent, maxlen=self.RECENT_LIMIT)
+        
+    def _track_result(self, result: Dict[str, Any]) -> None:
+        # Khi đang nạp dữ liệu các tổng hợp chưa có: chúng được dựng lại từ toàn bộ kết quả sau đó
+        if self.aggregates is not None:
+            for field in self.TRACKED_FIELDS:
+                self.aggregates[field].add(result[field])
+        if self.daily_rollups is not None:
+            self._add_to_rollups(self.daily_rollups, result)
+        if self.sketches is not None:
+            self._add_to_sketches(self.sketches, result)
+        self._mark_day_changed(result)
+        if self.personal_bests is not None:
+            self.personal_bests.add(result)
+        if self.ghosts is not None and self.ghosts.add(result) and self._dirty_ghosts is not None:
+            self._dirty_ghosts.add(result['text_hash'])
+        self.recent_results.append(result)
+        
+    def _mark_day_changed(self, result: Dict[str, Any]) -> None:
+        """Ghi nhận ngày có rollup/sketch đổi để checkpoint tới gửi lại ngày đó"""
+        if self._dirty_days is not None and 'timestamp' in result:
+            self._dirty_days.add(self._day_label(result))
+            
     def save_result(self, result: Dict[str, Any]) -> None:
         if not isinstance(result, dict):
             raise ValueError("Result must be a dictionary")
@@ -61,6 +942,7 @@ class StatisticsManager:
                 'timestamp': time.time(),
                 'date': datetime.now().isoformat()
             }
+            validated_result['day'] = self.day_clock.ordinal(validated_result['timestamp'])
             
             if validated_result['wpm'] < 0 or validated_result['accuracy'] < 0:
                 raise ValueError("WPM and accuracy must be non-negative")
@@ -68,43 +950,117 @@ class StatisticsManager:
             if validated_result['accuracy'] > 100:
                 validated_result['accuracy'] = 100.0
                 
+            for field in ('mode', 'difficulty', 'content_type'):
+                if isinstance(result.get(field), str):
+                    validated_result[field] = result[field]
+            if result.get('text_hash') is not None:
+                validated_result['text_hash'] = int(result['text_hash'])
+                if not 0 <= validated_result['text_hash'] < 2 ** 63:
+                    raise ValueError("text_hash must be a non-negative 63-bit integer")
+                
+            record = dict(validated_result)
+            key_stats = None
+            if result.get('key_stats'):
+                key_stats = self._validate_key_stats(result['key_stats'])
+                record['key_stats'] = {key: [attempts, errors] for key, attempts, errors in key_stats}
+            keystrokes = KeystrokeStore.encode(result['keystrokes']) if result.get('keystrokes') else None
+                
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid result data: {str(e)}")
+            
+        # Chỉ dành chỗ trong file bản ghi phím; thread ghi nền ghi nó cùng lô với kết quả
+        if keystrokes is not None:
+            validated_result['recording'] = record['recording'] = self.recordings.reserve(keystrokes)
+            
+        self._persist({
+            'result': validated_result,
+            'record': record,
+            'day': self.day_clock.label(validated_result['day']),
+            'key_stats': key_stats,
+            'keystrokes': keystrokes
+        })
+        
+        # Kết quả có ngay trong bộ nhớ, kể cả khi thread nền chưa ghi xong
+        if self.db is None:
             self.data['results'].append(validated_result)
+        self.data['last_updated'] = validated_result['timestamp']
+        if key_stats:
+            self._apply_key_stats(self.data, key_stats)
+        self._track_result(validated_result)
+            
+        self._appends_since_checkpoint += 1
+        if self._appends_since_checkpoint >= self.checkpoint_every:
             self._save_statistics()
             
-        except (ValueError, TypeError) as e:
-            raise ValueError(f"Invalid result data: {str(e)}")
+    def _validate_key_stats(self, key_stats: Dict[str, List[int]]) -> List[tuple]:
+        validated = []
+        for key, (attempts, errors) in key_stats.items():
+            attempts = int(attempts)
+            errors = int(errors)
+            if not isinstance(key, str) or not 1 <= len(key) <= 2 or attempts < 0 or not 0 <= errors <= attempts:
+                raise ValueError(f"Invalid key statistics for {key!r}")
+            validated.append((key, attempts, errors))
+        return validated
+        
+    @staticmethod
+    def _apply_key_stats(data: Dict[str, Any], key_stats: List[tuple]) -> None:
+        totals = data['session_data'].setdefault('key_stats', {})
+        for key, attempts, errors in key_stats:
+            entry = totals.setdefault(key, [0, 0])
+            entry[0] += attempts
+            entry[1] += errors
             
-    def get_statistics(self) -> Dict[str, Any]:
-        try:
-            results = self.data.get('results', [])
+    def get_key_error_rates(self, prior_weight: float = 5.0) -> Dict[str, float]:
+        """Tỉ lệ gõ sai theo ký tự/bigram, làm trơn về tỉ lệ lỗi chung để phím ít gặp không bị thổi phồng"""
+        key_stats = self.data.get('session_data', {}).get('key_stats', {})
+        
+        # Tỉ lệ lỗi chung chỉ tính trên ký tự đơn (bigram đếm trùng cùng một lần gõ)
+        total_attempts = sum(stats[0] for key, stats in key_stats.items() if len(key) == 1)
+        total_errors = sum(stats[1] for key, stats in key_stats.items() if len(key) == 1)
+        if not total_attempts:
+            return {}
+        baseline = total_errors / total_attempts
+        
+        return {
+            key: (errors + prior_weight * baseline) / (attempts + prior_weight)
+            for key, (attempts, errors) in key_stats.items()
+            if errors > 0
+        }
             
-            if not results:
-                return {
-                    'total_tests': 0,
-                    'avg_wpm': 0.0,
-                    'best_wpm': 0.0,
-                    'avg_accuracy': 0.0,
-                    'best_accuracy': 0.0,
-                    'total_time': 0.0,
-                    'recent_results': [],
-                    'results': []
-                }
-                
-            wpm_values = [r['wpm'] for r in results if 'wpm' in r]
-            accuracy_values = [r['accuracy'] for r in results if 'accuracy' in r]
-            time_values = [r['time'] for r in results if 'time' in r]
-            
-            stats = {
-                'total_tests': len(results),
-                'avg_wpm': round(sum(wpm_values) / len(wpm_values), 2) if wpm_values else 0.0,
-                'best_wpm': round(max(wpm_values), 2) if wpm_values else 0.0,
-                'avg_accuracy': round(sum(accuracy_values) / len(accuracy_values), 2) if accuracy_values else 0.0,
-                'best_accuracy': round(max(accuracy_values), 2) if accuracy_values else 0.0,
-                'total_time': round(sum(time_values), 2) if time_values else 0.0,
-                'recent_results': sorted(results, key=lambda x: x.get('timestamp', 0), reverse=True),
-                'results': results
+    @staticmethod
+    def _format_summary(aggregates: Optional[Dict[str, RunningStats]]) -> Dict[str, Any]:
+        """Chuyển tổng hợp của wpm/accuracy/time thành các chỉ số hiển thị"""
+        count = aggregates['wpm'].count if aggregates else 0
+        if not count:
+            return {
+                'total_tests': 0,
+                'avg_wpm': 0.0,
+                'best_wpm': 0.0,
+                'avg_accuracy': 0.0,
+                'best_accuracy': 0.0,
+                'total_time': 0.0
             }
-            
+        return {
+            'total_tests': count,
+            'avg_wpm': round(aggregates['wpm'].mean, 2),
+            'best_wpm': round(aggregates['wpm'].maximum, 2),
+            'avg_accuracy': round(aggregates['accuracy'].mean, 2),
+            'best_accuracy': round(aggregates['accuracy'].maximum, 2),
+            'total_time': round(aggregates['time'].total, 2)
+        }
+        
+    def get_statistics(self) -> Dict[str, Any]:
+        """Tổng quan lấy từ tổng hợp chạy, không phụ thuộc số bài đã lưu"""
+        try:
+            stats = self._format_summary(self.aggregates)
+            stats['wpm_stddev'] = round(self.aggregates['wpm'].stddev, 2)
+            stats['accuracy_stddev'] = round(self.aggregates['accuracy'].stddev, 2)
+            stats['percentiles'] = QuantileSketches.percentiles(self.sketches.overall)
+            stats['mode_percentiles'] = {mode: QuantileSketches.percentiles(digests)
+                                         for mode, digests in sorted(self.sketches.modes.items())}
+            stats['recent_results'] = list(reversed(self.recent_results))
+            # SQLite không giữ lịch sử trong bộ nhớ: chỉ trả về các bài gần nhất
+            stats['results'] = self.data['results'] if self.db is None else stats['recent_results']
             return stats
             
         except Exception as e:
@@ -121,81 +1077,141 @@ class StatisticsManager:
             }
             
     def get_progress_data(self, days: int = 30) -> Dict[str, Any]:
+        """Chuỗi tiến độ theo ngày (WPM/accuracy trung bình mỗi ngày), đọc O(days) rollup"""
         try:
-            cutoff_time = time.time() - (days * 24 * 60 * 60)
-            recent_results = [
-                r for r in self.data.get('results', [])
-                if r.get('timestamp', 0) >= cutoff_time
-            ]
-            
-            if not recent_results:
-                return {'dates': [], 'wpm_values': [], 'accuracy_values': []}
-                
-            sorted_results = sorted(recent_results, key=lambda x: x.get('timestamp', 0))
-            
+            today = date.fromordinal(self.day_clock.today())
             dates = []
             wpm_values = []
             accuracy_values = []
+            tests_per_day = []
             
-            for result in sorted_results:
-                timestamp = result.get('timestamp', 0)
-                date_str = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
-                dates.append(date_str)
-                wpm_values.append(result.get('wpm', 0))
-                accuracy_values.append(result.get('accuracy', 0))
+            for offset in range(days, -1, -1):
+                day = (today - timedelta(days=offset)).isoformat()
+                rollup = self.daily_rollups.get(day)
+                if not rollup or not rollup['wpm'].count:
+                    continue
+                dates.append(day)
+                wpm_values.append(round(rollup['wpm'].mean, 2))
+                accuracy_values.append(round(rollup['accuracy'].mean, 2))
+                tests_per_day.append(rollup['wpm'].count)
+                
+            if not dates:
+                return {'dates': [], 'wpm_values': [], 'accuracy_values': []}
                 
             return {
                 'dates': dates,
                 'wpm_values': wpm_values,
                 'accuracy_values': accuracy_values,
-                'total_sessions': len(sorted_results)
+                'tests_per_day': tests_per_day,
+                'total_sessions': sum(tests_per_day)
             }
             
         except Exception:
             return {'dates': [], 'wpm_values': [], 'accuracy_values': [], 'total_sessions': 0}
             
+    def _iter_range_rows(self, start_day: date, end_day: date) -> Iterator[tuple]:
+        """(timestamp, wpm, accuracy) của các bài trong các ngày start_day..end_day"""
+        start = self.day_clock.day_bounds(start_day.toordinal())[0]
+        end = self.day_clock.day_bounds(end_day.toordinal())[1]
+        if self.db is None:
+            rows = self._iter_rows(start, end)
+        else:
+            self.flush()
+            rows = self.db.iter_rows(start, end)
+        for row in rows:
+            # NaN là giá trị thiếu
+            if row[1] == row[1] and row[2] == row[2]:
+                yield row[:3]
+                
+    def get_progress_series(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                            max_points: int = 200, bucket: Optional[str] = None,
+                            method: str = 'buckets') -> Dict[str, Any]:
+        """Chuỗi tiến độ cho biểu đồ với không quá max_points điểm, dù lịch sử dài bao nhiêu
+        
+        method='buckets': gom theo hour/day/week/month (bucket=None thì tự chọn nhóm nhỏ nhất vừa
+        max_points), mỗi điểm có giá trị trung bình và dải min/max. day/week/month được gộp từ
+        rollup theo ngày; hour đọc các bài trong khoảng. Nếu số nhóm vẫn vượt max_points, các
+        nhóm được chọn bằng LTTB theo WPM trung bình.
+        method='lttb': từng bài trong khoảng, giảm còn max_points điểm bằng LTTB theo WPM.
+        Mặc định khoảng từ ngày có bài đầu tiên tới hôm nay.
+        """
+        if method not in ('buckets', 'lttb'):
+            raise ValueError(f"Unsupported progress series method: {method}")
+        if bucket is not None and bucket not in ProgressSeries.BUCKETS:
+            raise ValueError(f"Unsupported bucket: {bucket}")
+        if max_points < 1:
+            raise ValueError("max_points must be positive")
+            
+        end = datetime.fromisoformat(end_date).date() if end_date else date.fromordinal(self.day_clock.today())
+        if start_date:
+            start = datetime.fromisoformat(start_date).date()
+        else:
+            start = end
+            if self.daily_rollups:
+                start = min(start, datetime.fromisoformat(min(self.daily_rollups)).date())
+        fields = ('wpm', 'accuracy')
+        
+        if method == 'lttb':
+            rows = sorted(self._iter_range_rows(start, end))
+            indices = ProgressSeries.lttb([row[0] for row in rows], [row[1] for row in rows], max_points)
+            points = [rows[index] for index in indices]
+            wpm_values = [round(row[1], 2) for row in points]
+            accuracy_values = [round(row[2], 2) for row in points]
+            return {
+                'bucket': 'session',
+                'dates': [self.day_clock.local(row[0]).isoformat() for row in points],
+                'wpm_values': wpm_values,
+                'wpm_min': wpm_values,
+                'wpm_max': wpm_values,
+                'accuracy_values': accuracy_values,
+                'accuracy_min': accuracy_values,
+                'accuracy_max': accuracy_values,
+                'tests_per_point': [1] * len(points),
+                'total_sessions': len(rows)
+            }
+            
+        bucket = bucket or ProgressSeries.choose_bucket(start, end, max_points)
+        if bucket == 'hour':
+            groups = {}
+            for timestamp, wpm, accuracy in self._iter_range_rows(start, end):
+                key = ProgressSeries.bucket_start(self.day_clock.local(timestamp), 'hour')
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = {field: RunningStats() for field in fields}
+                group['wpm'].add(wpm)
+                group['accuracy'].add(accuracy)
+        else:
+            groups = ProgressSeries.merge_rollups(self.daily_rollups, start, end, bucket, fields)
+            
+        keys = sorted(key for key, group in groups.items() if group['wpm'].count)
+        total_sessions = sum(groups[key]['wpm'].count for key in keys)
+        if len(keys) > max_points:
+            indices = ProgressSeries.lttb([key.timestamp() for key in keys],
+                                          [groups[key]['wpm'].mean for key in keys], max_points)
+            keys = [keys[index] for index in indices]
+            
+        series = {'bucket': bucket, 'dates': [key.isoformat() for key in keys]}
+        for field in fields:
+            series[f'{field}_values'] = [round(groups[key][field].mean, 2) for key in keys]
+            series[f'{field}_min'] = [round(groups[key][field].minimum, 2) for key in keys]
+            series[f'{field}_max'] = [round(groups[key][field].maximum, 2) for key in keys]
+        series['tests_per_point'] = [groups[key]['wpm'].count for key in keys]
+        series['total_sessions'] = total_sessions
+        return series
+        
     def get_daily_stats(self, date: Optional[str] = None) -> Dict[str, Any]:
         try:
             if date is None:
-                target_date = datetime.now().date()
+                day = self.day_clock.label(self.day_clock.today())
             else:
-                target_date = datetime.fromisoformat(date).date()
-                
-            daily_results = []
-            for result in self.data.get('results', []):
-                if 'timestamp' in result:
-                    result_date = datetime.fromtimestamp(result['timestamp']).date()
-                    if result_date == target_date:
-                        daily_results.append(result)
-                        
-            if not daily_results:
-                return {
-                    'date': target_date.isoformat(),
-                    'total_tests': 0,
-                    'total_time': 0.0,
-                    'avg_wpm': 0.0,
-                    'best_wpm': 0.0,
-                    'avg_accuracy': 0.0,
-                    'best_accuracy': 0.0
-                }
+                day = datetime.fromisoformat(date).date().isoformat()
                 
-            wpm_values = [r['wpm'] for r in daily_results]
-            accuracy_values = [r['accuracy'] for r in daily_results]
-            time_values = [r['time'] for r in daily_results]
-            
-            return {
-                'date': target_date.isoformat(),
-                'total_tests': len(daily_results),
-                'total_time': round(sum(time_values), 2),
-                'avg_wpm': round(sum(wpm_values) / len(wpm_values), 2),
-                'best_wpm': round(max(wpm_values), 2),
-                'avg_accuracy': round(sum(accuracy_values) / len(accuracy_values), 2),
-                'best_accuracy': round(max(accuracy_values), 2)
-            }
+            return {'date': day, **self._format_summary(self.daily_rollups.get(day)),
+                    'percentiles': QuantileSketches.percentiles(self.sketches.range(day, day))}
             
         except Exception:
             return {
-                'date': datetime.now().date().isoformat(),
+                'date': self.day_clock.label(self.day_clock.today()),
                 'total_tests': 0,
                 'total_time': 0.0,
                 'avg_wpm': 0.0,
@@ -204,11 +1220,66 @@ class StatisticsManager:
                 'best_accuracy': 0.0
             }
             
+    def get_percentiles(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                        mode: Optional[str] = None) -> Dict[str, Any]:
+        """p50/p90/p99 của WPM và độ chính xác trong khoảng ngày (tính cả hai đầu) và mode
+        
+        Gộp sketch theo ngày nên chi phí phụ thuộc số ngày trong khoảng, không phụ thuộc số bài.
+        """
+        start_day = datetime.fromisoformat(start_date).date().isoformat() if start_date else None
+        end_day = datetime.fromisoformat(end_date).date().isoformat() if end_date else None
+        return QuantileSketches.percentiles(self.sketches.range(start_day, end_day, mode))
+        
+    def _range_days(self, date_range: Any) -> List[str]:
+        """Các ngày 'YYYY-MM-DD' của (start_date, end_date), tính cả hai đầu; None là từ ngày đầu tiên/tới hôm nay"""
+        try:
+            start_date, end_date = date_range
+        except (TypeError, ValueError):
+            raise ValueError("Date range must be a (start_date, end_date) pair")
+        end = datetime.fromisoformat(end_date).date() if end_date else date.fromordinal(self.day_clock.today())
+        if start_date:
+            start = datetime.fromisoformat(start_date).date()
+        else:
+            start = min(datetime.fromisoformat(min(self.daily_rollups)).date(), end) if self.daily_rollups else end
+        if start > end:
+            raise ValueError("Date range start must not be after its end")
+        return [self.day_clock.label(ordinal) for ordinal in range(start.toordinal(), end.toordinal() + 1)]
+        
+    def compare(self, range_a: Any, range_b: Any) -> Dict[str, Any]:
+        """So sánh hai khoảng ngày, ví dụ tuần này với tuần trước
+        
+        range_a, range_b: (start_date, end_date) như _range_days. Trả về tóm tắt của từng khoảng
+        ('a', 'b': count, mean/stddev/p50/p90 của WPM và độ chính xác, start, end), 'delta' (trung bình
+        a - b), 'effect_size' (Cohen's d) và 'modes' (cùng dạng, theo từng mode). Chỉ đọc rollup và
+        sketch của các ngày trong khoảng nên chi phí O(số ngày), không phụ thuộc số bài.
+        """
+        sides = []
+        for date_range in (range_a, range_b):
+            days = self._range_days(date_range)
+            stats = {field: RunningStats() for field in RangeComparison.FIELDS}
+            for day in days:
+                rollup = self.daily_rollups.get(day)
+                if rollup:
+                    for field in RangeComparison.FIELDS:
+                        stats[field].merge(rollup[field])
+            sides.append((days, stats, self.sketches.by_mode(days)))
+        (days_a, stats_a, modes_a), (days_b, stats_b, modes_b) = sides
+        comparison = RangeComparison.compare(stats_a, stats_b, RangeComparison.combine(modes_a),
+                                             RangeComparison.combine(modes_b))
+        for key, days in (('a', days_a), ('b', days_b)):
+            comparison[key]['start'], comparison[key]['end'] = days[0], days[-1]
+        comparison['modes'] = RangeComparison.compare_modes(modes_a, modes_b)
+        return comparison
+        
+    def _record_date(self, record: Dict[str, Any]) -> str:
+        return self._day_label(record) if 'timestamp' in record else 'Unknown'
+        
     def get_personal_bests(self) -> Dict[str, Any]:
+        """Kỷ lục cá nhân đọc từ bảng top-K được cập nhật khi lưu, không quét lịch sử"""
         try:
-            results = self.data.get('results', [])
+            records = [self.personal_bests.best(field) for field in ('wpm', 'accuracy', 'time', 'user_length')]
             
-            if not results:
+            if records[0] is None:
                 return {
                     'best_wpm_record': None,
                     'best_accuracy_record': None,
@@ -216,31 +1287,28 @@ class StatisticsManager:
                     'most_characters': None
                 }
                 
-            best_wpm = max(results, key=lambda x: x.get('wpm', 0))
-            best_accuracy = max(results, key=lambda x: x.get('accuracy', 0))
-            longest_session = max(results, key=lambda x: x.get('time', 0))
-            most_characters = max(results, key=lambda x: x.get('user_length', 0))
+            best_wpm, best_accuracy, longest_session, most_characters = records
             
             return {
                 'best_wpm_record': {
                     'wpm': best_wpm.get('wpm', 0),
                     'accuracy': best_wpm.get('accuracy', 0),
-                    'date': datetime.fromtimestamp(best_wpm.get('timestamp', 0)).strftime('%Y-%m-%d') if 'timestamp' in best_wpm else 'Unknown'
+                    'date': self._record_date(best_wpm)
                 },
                 'best_accuracy_record': {
                     'accuracy': best_accuracy.get('accuracy', 0),
                     'wpm': best_accuracy.get('wpm', 0),
-                    'date': datetime.fromtimestamp(best_accuracy.get('timestamp', 0)).strftime('%Y-%m-%d') if 'timestamp' in best_accuracy else 'Unknown'
+                    'date': self._record_date(best_accuracy)
                 },
                 'longest_session': {
                     'time': longest_session.get('time', 0),
                     'wpm': longest_session.get('wpm', 0),
-                    'date': datetime.fromtimestamp(longest_session.get('timestamp', 0)).strftime('%Y-%m-%d') if 'timestamp' in longest_session else 'Unknown'
+                    'date': self._record_date(longest_session)
                 },
                 'most_characters': {
                     'characters': most_characters.get('user_length', 0),
                     'wpm': most_characters.get('wpm', 0),
-                    'date': datetime.fromtimestamp(most_characters.get('timestamp', 0)).strftime('%Y-%m-%d') if 'timestamp' in most_characters else 'Unknown'
+                    'date': self._record_date(most_characters)
                 }
             }
             
@@ -252,60 +1320,361 @@ class StatisticsManager:
                 'most_characters': None
             }
             
+    def get_leaderboard(self, field: str = 'wpm', mode: Optional[str] = None,
+                        limit: int = PersonalBests.LIMIT) -> List[Dict[str, Any]]:
+        """Bảng xếp hạng các bài tốt nhất theo field ('wpm', 'accuracy', 'time', 'user_length'),
+        trên toàn bộ hoặc trong một mode; tối đa PersonalBests.LIMIT bài"""
+        return [dict(record, date=self._record_date(record))
+                for record in self.personal_bests.top(field, mode, limit)]
+
+    def get_recording(self, result: Dict[str, Any]) -> Optional[List[tuple]]:
+        """Bản ghi phím của một bài: các cặp (ms kể từ phím đầu tiên, mã phím); None nếu bài không có"""
+        if result.get('recording') is None:
+            return None
+        # Bản ghi phím của bài vừa lưu có thể chưa được thread nền ghi
+        self.flush()
+        try:
+            return self.recordings.read(result['recording'])
+        except (IOError, ValueError, zlib.error) as e:
+            raise Exception(f"Failed to load recording: {str(e)}")
+
+    def get_ghost(self, text: str) -> Optional[Dict[str, Any]]:
+        """Bài có bản ghi phím tốt nhất trên cùng câu: {'wpm', 'timestamp', 'recording', 'keystrokes'};
+        None nếu câu chưa có bài nào được ghi lại"""
+        text_hash = GhostIndex.text_hash(text)
+        # Bài vừa lưu được ghi xong trước (và offset bản ghi phím đã chuyển chỗ được cập nhật)
+        self.flush()
+        if self.db is not None:
+            ghost = self.db.best_recorded(text_hash)
+        else:
+            self._ensure_ghosts()
+            ghost = self.ghosts.get(text_hash)
+        if ghost is None:
+            return None
+        ghost['keystrokes'] = self.get_recording(ghost)
+        return ghost
+
+    def _index(self) -> ResultIndex:
+        """Index của self.data['results'], dựng lại khi danh sách bài bị thay (nạp lại, compact, import)"""
+        if self._result_index is None or self._result_index.columns is not self.data['results']:
+            self._result_index = ResultIndex(self.data['results'])
+        return self._result_index
+
+    def query(self, filter: Optional[Dict[str, Any]] = None, order_by: Optional[str] = None,
+              limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Các bài thỏa mãn filter, sắp theo order_by (mặc định timestamp tăng dần), tối đa limit bài
+
+        Ví dụ: query({'mode': 'word_by_word', 'difficulty': 'hard', 'last_days': 14,
+        'wpm': {'>': 60}}, order_by='-wpm', limit=20). Xem ResultQuery về các điều kiện được hỗ trợ.
+        Backend JSON dùng ResultIndex (planner chọn index chọn lọc nhất) trên các bài chưa lưu trữ
+        và chỉ quét các tháng lưu trữ giao với khoảng thời gian; backend sqlite dùng index của bảng.
+        """
+        parsed = ResultQuery(filter, order_by, limit, self.day_clock)
+        if self.db is not None:
+            self.flush()
+            return [self._public_record(record) for record in self.db.query(parsed)]
+        matches = []
+        for month in self.archive.months_between(parsed.start, parsed.end):
+            columns = self.archive.load(month)
+            matches.extend(columns[index] for index in parsed.scan(columns))
+        results = self.data['results']
+        rows = self._index().execute(parsed)
+        if matches:
+            # Gộp với các bài lưu trữ rồi sắp xếp chung (phần chưa lưu trữ đã có đủ limit bài)
+            matches.extend(results[index] for index in rows)
+            records = parsed.order_records(matches)
+        else:
+            records = [results[index] for index in rows]
+        return [self._public_record(record) for record in records]
+        
+    def _public_record(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Bản ghi trả về cho người gọi: bỏ trường nội bộ, 'date' theo day_clock (giống nhau ở hai backend)"""
+        public = {key: value for key, value in record.items() if key not in self.INTERNAL_FIELDS}
+        public['date'] = self._record_date(record)
+        return public
+
+    def explain_query(self, filter: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Kế hoạch của query(filter): index được chọn và số bài ước lượng phải duyệt"""
+        parsed = ResultQuery(filter, day_clock=self.day_clock)
+        if self.db is not None:
+            return {'backend': 'sqlite', 'plan': self.db.explain(parsed)}
+        field, estimate = self._index().plan(parsed)
+        months = self.archive.months_between(parsed.start, parsed.end)
+        return {
+            'backend': 'json',
+            'index': field or 'timestamp',
+            'estimated_rows': estimate,
+            'archived_months_scanned': len(months)
+        }
+            
     def clear_all_data(self) -> None:
         try:
             self.data = self._create_empty_structure()
-            self._save_statistics()
+            self._replace_all()
         except Exception as e:
             raise Exception(f"Failed to clear data: {str(e)}")
             
+    def _iter_results(self) -> Iterator[Dict[str, Any]]:
+        """Toàn bộ kết quả dạng dict JSON, tạo dần từng bài"""
+        if self.db is None:
+            return chain(self.archive.iter_results(), self.data['results'])
+        self.flush()
+        return self.db.iter_results()
+        
     def export_data(self, filename: Optional[str] = None) -> str:
+        """Export JSON tương thích import_data; kết quả được ghi dần, không dựng bản sao trong bộ nhớ"""
         try:
             if filename is None:
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
                 filename = f"typing_stats_export_{timestamp}.json"
                 
-            export_data = {
-                'exported_at': datetime.now().isoformat(),
-                'statistics': self.get_statistics(),
-                'raw_data': self.data
-            }
+            statistics = self.get_statistics()
+            # Danh sách đầy đủ đã nằm trong raw_data, không ghi hai lần
+            statistics.pop('results', None)
+            header = {key: value for key, value in self.data.items() if key != 'results'}
             
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, indent=2, ensure_ascii=False)
+                ResultExporter().write_json_export(f, statistics, header, self._iter_results())
                 
             return filename
             
         except Exception as e:
             raise Exception(f"Failed to export data: {str(e)}")
             
-    def import_data(self, filename: str) -> None:
+    def export_results(self, filename: str, fmt: Optional[str] = None, compress: Optional[bool] = None,
+                       start_date: Optional[str] = None, end_date: Optional[str] = None,
+                       mode: Optional[str] = None) -> int:
+        """Xuất kết quả ra CSV hoặc JSONL (gzip nếu đuôi .gz), lọc theo khoảng ngày và mode
+        
+        start_date/end_date dạng 'YYYY-MM-DD', tính cả hai đầu. Trả về số dòng đã ghi.
+        """
+        try:
+            exporter = ResultExporter(self.day_clock.local)
+            if fmt is None or compress is None:
+                detected_fmt, detected_compress = exporter.detect_format(filename)
+                fmt = fmt or detected_fmt
+                compress = detected_compress if compress is None else compress
+            if fmt not in exporter.FORMATS:
+                raise ValueError(f"Unsupported export format: {fmt}")
+                
+            clock = self.day_clock
+            start = clock.day_bounds(datetime.fromisoformat(start_date).toordinal())[0] if start_date else None
+            end = clock.day_bounds(datetime.fromisoformat(end_date).toordinal())[1] if end_date else None
+            
+            if self.db is None:
+                rows = self._iter_rows(start, end, mode)
+            else:
+                self.flush()
+                rows = self.db.iter_rows(start, end, mode)
+                
+            with exporter.open(filename, compress) as f:
+                if fmt == 'csv':
+                    return exporter.write_csv(f, rows)
+                return exporter.write_jsonl(f, rows)
+                
+        except Exception as e:
+            raise Exception(f"Failed to export data: {str(e)}")
+            
+    def _normalize_imported(self, record: Any) -> Dict[str, Any]:
+        """Kiểm tra một bài đọc từ file import; raise ValueError/TypeError nếu không dùng được"""
+        if not isinstance(record, dict):
+            raise ValueError("Result must be a dictionary")
+        # Offset bản ghi phím chỉ có nghĩa với file bản ghi của máy đã export
+        result = {key: value for key, value in record.items() if key not in ('key_stats', '_crc', 'recording')}
+        for field in self.TRACKED_FIELDS + ('timestamp',):
+            value = float(record[field])
+            if value != value or value < 0:
+                raise ValueError(f"Invalid {field}")
+            result[field] = value
+        for field in ('text_length', 'user_length'):
+            result[field] = int(record.get(field) or 0)
+            if result[field] < 0:
+                raise ValueError(f"Invalid {field}")
+        for field in ('mode', 'difficulty', 'content_type'):
+            if field in result and not isinstance(result[field], str):
+                del result[field]
+        # Ngày trong file import có thể theo cấu hình khác: tính lại
+        result['day'] = self.day_clock.ordinal(result['timestamp'])
+        return result
+        
+    def _iter_imported(self, importer: ResultImporter, known: set, report: Dict[str, int],
+                       progress: Optional[Callable[[int, int, int], None]]) -> Iterator[tuple]:
+        """Các bài mới (kết quả, key_stats) trong file import; bài trùng với known hoặc hỏng bị bỏ qua"""
+        for record in importer:
+            report['processed'] += 1
+            if progress is not None and report['processed'] % self.IMPORT_BATCH == 0:
+                progress(report['processed'], importer.bytes_read, importer.total_bytes)
+            try:
+                result = self._normalize_imported(record)
+            except (KeyError, ValueError, TypeError, OverflowError):
+                report['invalid'] += 1
+                continue
+            identity = (result['timestamp'], result['wpm'], result['time'])
+            if identity in known:
+                report['duplicates'] += 1
+                continue
+            known.add(identity)
+            key_stats = None
+            if record.get('key_stats'):
+                try:
+                    key_stats = self._validate_key_stats(record['key_stats'])
+                except (ValueError, TypeError, AttributeError):
+                    pass
+            yield result, key_stats
+        if progress is not None:
+            progress(report['processed'], importer.total_bytes, importer.total_bytes)
+            
+    def import_data(self, filename: str, merge: bool = False,
+                    progress: Optional[Callable[[int, int, int], None]] = None) -> int:
+        """Import file export JSON hoặc JSON Lines (có thể .gz), đọc dần từng bài
+        
+        merge=False thay toàn bộ dữ liệu bằng nội dung file (chỉ thay khi đọc file thành công).
+        merge=True gộp thêm các bài chưa có, nhận diện bằng (timestamp, wpm, time); các lô
+        đã gộp được giữ lại nếu file hỏng giữa chừng và import lại không tạo bài trùng.
+        progress(số bài đã đọc, số byte đã đọc, tổng số byte) được gọi định kỳ.
+        Trả về số bài được thêm; số liệu chi tiết nằm trong last_import_report.
+        """
         try:
             if not os.path.exists(filename):
                 raise FileNotFoundError(f"File not found: {filename}")
                 
-            with open(filename, 'r', encoding='utf-8') as f:
-                imported_data = json.load(f)
-                
-            if 'raw_data' in imported_data and self._validate_data_structure(imported_data['raw_data']):
-                self.data = imported_data['raw_data']
-                self._save_statistics()
+            importer = ResultImporter(filename)
+            report = {'processed': 0, 'imported': 0, 'duplicates': 0, 'invalid': 0}
+            self.last_import_report = report
+            if merge:
+                self._merge_imported(importer, report, progress)
             else:
-                raise ValueError("Invalid import file format")
-                
+                self._replace_imported(importer, report, progress)
+            return report['imported']
+            
         except Exception as e:
             raise Exception(f"Failed to import data: {str(e)}")
             
+    def _replace_imported(self, importer: ResultImporter, report: Dict[str, int],
+                          progress: Optional[Callable[[int, int, int], None]]) -> None:
+        # Kết quả dạng cột trong bộ nhớ (vài chục byte mỗi bài) để dữ liệu cũ chỉ bị thay khi đọc xong file
+        results = ResultColumns()
+        key_stats = []
+        for result, record_key_stats in self._iter_imported(importer, set(), report, progress):
+            results.append(result)
+            if record_key_stats:
+                key_stats.append(record_key_stats)
+                
+        header = importer.header
+        if importer.fmt == 'json' and not self._validate_data_structure(dict(header, results=None)):
+            raise ValueError("Invalid import file format")
+            
+        data = self._create_empty_structure()
+        for key, value in header.items():
+            data[key] = value
+        data['results'] = results
+        for record_key_stats in key_stats:
+            self._apply_key_stats(data, record_key_stats)
+        self.data = data
+        self._replace_all()
+        report['imported'] = len(results)
+        
+    def _merge_imported(self, importer: ResultImporter, report: Dict[str, int],
+                        progress: Optional[Callable[[int, int, int], None]]) -> None:
+        self.flush()
+        self._catch_up()
+        if self.db is not None:
+            known = set(self.db.identities())
+        else:
+            known = set(chain(self.archive.identities(), self.data['results'].identities()))
+        batch = []
+        for entry in self._iter_imported(importer, known, report, progress):
+            batch.append(entry)
+            if len(batch) >= self.IMPORT_BATCH:
+                self._merge_batch(batch)
+                report['imported'] += len(batch)
+                batch = []
+        self._merge_batch(batch)
+        report['imported'] += len(batch)
+        
+        header = importer.header
+        session_data = header.get('session_data')
+        # key_stats tổng của file export chỉ cộng được khi không có bài nào đã có sẵn
+        if (isinstance(session_data, dict) and session_data.get('key_stats')
+                and not report['duplicates'] and report['imported']):
+            try:
+                self._merge_key_stats(self._validate_key_stats(session_data['key_stats']))
+            except (ValueError, TypeError, AttributeError):
+                pass
+        if isinstance(header.get('created_at'), (int, float)):
+            self.data['created_at'] = min(self.data.get('created_at') or header['created_at'],
+                                          header['created_at'])
+        self._save_statistics()
+        self.flush()
+        
+    def _merge_key_stats(self, key_stats: List[tuple]) -> None:
+        self._apply_key_stats(self.data, key_stats)
+        if self.db is not None:
+            with self.db.conn:
+                self.db._add_key_stats(key_stats)
+                
+    def _merge_batch(self, batch: List[tuple]) -> None:
+        """Ghi một lô bài mới rồi cập nhật dần tổng hợp, rollup và ring buffer"""
+        if not batch:
+            return
+        try:
+            if self.db is not None:
+                self.db.append((result, self._day_label(result), key_stats)
+                               for result, key_stats in batch)
+            else:
+                records = []
+                for result, key_stats in batch:
+                    record = dict(result)
+                    record.update(self._next_tag())
+                    if key_stats:
+                        record['key_stats'] = {key: [attempts, errors] for key, attempts, errors in key_stats}
+                    records.append(record)
+                with FileLock(self.lock_file):
+                    self.results_log.append(records, fsync=self.fsync_policy == 'always')
+                self._log_lines += len(records)
+                self._loose_lines += len(records)
+        except (IOError, sqlite3.Error) as e:
+            raise Exception(f"Failed to save statistics: {str(e)}")
+            
+        for result, key_stats in batch:
+            if self.db is None:
+                self.data['results'].append(result)
+            if key_stats:
+                self._apply_key_stats(self.data, key_stats)
+            for field in self.TRACKED_FIELDS:
+                self.aggregates[field].add(result[field])
+            self._add_to_rollups(self.daily_rollups, result)
+            self._add_to_sketches(self.sketches, result)
+            self._mark_day_changed(result)
+            self.personal_bests.add(result)
+        # Bài import có thể cũ hơn các bài gần đây: giữ đúng RECENT_LIMIT bài mới nhất theo timestamp
+        recent = heapq.nlargest(self.RECENT_LIMIT, chain(self.recent_results, (result for result, _ in batch)),
+                                key=lambda result: result.get('timestamp', 0))
+        self.recent_results = deque(reversed(recent), maxlen=self.RECENT_LIMIT)
+        
     def get_file_info(self) -> Dict[str, Any]:
         try:
+            if self.db is not None:
+                self.flush()
+                return {
+                    'file_exists': os.path.exists(self.db.db_file),
+                    'file_size_bytes': self.db.size() + self.recordings.size(),
+                    'file_path': os.path.abspath(self.db.db_file),
+                    'total_results': self.db.count(),
+                    'created_at': self.data.get('created_at'),
+                    'last_updated': self.data.get('last_updated')
+                }
+                
             file_exists = os.path.exists(self.stats_file)
             file_size = os.path.getsize(self.stats_file) if file_exists else 0
+            file_size += self.results_log.size() + self.archive.size() + self.recordings.size()
             
             return {
                 'file_exists': file_exists,
                 'file_size_bytes': file_size,
                 'file_path': os.path.abspath(self.stats_file),
-                'total_results': len(self.data.get('results', [])),
+                'total_results': len(self.data.get('results', [])) + len(self.archive),
+                'archived_results': len(self.archive),
                 'created_at': self.data.get('created_at'),
                 'last_updated': self.data.get('last_updated')
             }
@@ -318,4 +1687,4 @@ class StatisticsManager:
                 'total_results': 0,
                 'created_at': None,
                 'last_updated': None
-            }
\ No newline at end of file
+            }
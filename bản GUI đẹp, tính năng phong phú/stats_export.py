@@ -0,0 +1,82 @@
+import csv
+import gzip
+import json
+import math
+from datetime import datetime
+from typing import Any, Callable, Dict, IO, Iterable, Optional, Tuple
+
+class ResultExporter:
+    """Ghi kết quả ra CSV/JSONL (có thể nén gzip) từng dòng một, bộ nhớ không phụ thuộc số bài
+
+    Nguồn là các tuple theo thứ tự ROW_FIELDS; 'date' được tính từ timestamp khi ghi, theo giờ
+    địa phương của local (StatisticsManager truyền DayClock.local, mặc định giờ máy).
+    """
+
+    ROW_FIELDS = ('timestamp', 'wpm', 'accuracy', 'time', 'text_length', 'user_length', 'mode', 'difficulty',
+                  'content_type')
+    CSV_FIELDS = ('timestamp', 'date') + ROW_FIELDS[1:]
+    FORMATS = ('csv', 'jsonl')
+
+    def __init__(self, local: Optional[Callable[[float], datetime]] = None):
+        self.local = local or datetime.fromtimestamp
+
+    @classmethod
+    def detect_format(cls, filename: str) -> Tuple[str, bool]:
+        """(định dạng, có nén gzip) suy ra từ đuôi file, ví dụ results.csv.gz -> ('csv', True)"""
+        name = filename.lower()
+        compress = name.endswith('.gz')
+        if compress:
+            name = name[:-3]
+        for fmt in cls.FORMATS:
+            if name.endswith('.' + fmt):
+                return fmt, compress
+        raise ValueError(f"Cannot infer export format from file name: {filename}")
+
+    @staticmethod
+    def open(filename: str, compress: bool) -> IO[str]:
+        if compress:
+            return gzip.open(filename, 'wt', encoding='utf-8', newline='', compresslevel=6)
+        return open(filename, 'w', encoding='utf-8', newline='')
+
+    def _date(self, timestamp: float) -> Optional[str]:
+        return None if math.isnan(timestamp) else self.local(timestamp).isoformat()
+
+    def write_csv(self, f: IO[str], rows: Iterable[tuple]) -> int:
+        writer = csv.writer(f)
+        writer.writerow(self.CSV_FIELDS)
+        count = 0
+        date = self._date
+        for row in rows:
+            writer.writerow((row[0], date(row[0])) + tuple('' if value is None else value for value in row[1:]))
+            count += 1
+        return count
+
+    def write_jsonl(self, f: IO[str], rows: Iterable[tuple]) -> int:
+        count = 0
+        fields = self.ROW_FIELDS
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        date = self._date
+        for row in rows:
+            record = {field: value for field, value in zip(fields, row) if value is not None}
+            record['date'] = date(row[0])
+            f.write(dumps(record))
+            f.write('\n')
+            count += 1
+        return count
+
+    def write_json_export(self, f: IO[str], statistics: Dict[str, Any], raw_data: Dict[str, Any],
+                          results: Iterable[Dict[str, Any]]) -> int:
+        """File export JSON dạng cũ ({'exported_at', 'statistics', 'raw_data'}), kết quả ghi dần từng dòng"""
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        f.write('{\n"exported_at": %s,\n"statistics": %s,\n"raw_data": {\n'
+                % (dumps(datetime.now().isoformat()), dumps(statistics)))
+        for key, value in raw_data.items():
+            f.write('%s: %s,\n' % (dumps(key), dumps(value)))
+        f.write('"results": [')
+        count = 0
+        for result in results:
+            f.write(',\n' if count else '\n')
+            f.write(dumps(result))
+            count += 1
+        f.write('\n]}}\n')
+        return count
@@ -0,0 +1,174 @@
+import gzip
+import io
+import json
+import os
+from typing import Any, Dict, Iterator, Tuple
+
+class _JsonStream:
+    """Đọc một tài liệu JSON lớn theo từng đoạn; chỉ giải mã trọn vẹn từng giá trị nhỏ"""
+
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, f: io.TextIOBase):
+        self._f = f
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._f.read(self.CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Ký tự khác khoảng trắng tiếp theo ('' khi hết file)"""
+        while True:
+            buffer = self._buffer
+            while self._pos < len(buffer) and buffer[self._pos] in ' \t\r\n':
+                self._pos += 1
+            if self._pos < len(buffer):
+                return buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise ValueError(f"Expected {char!r} in JSON input")
+        self._pos += 1
+
+    def value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                # Giá trị bị cắt ở cuối đoạn đang có: đọc thêm rồi thử lại
+                if not self._fill():
+                    raise
+                continue
+            # Số ở sát cuối đoạn có thể chưa đủ chữ số
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def object_keys(self) -> Iterator[str]:
+        """Duyệt khóa của object; người gọi phải đọc giá trị trước khi lấy khóa tiếp theo"""
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError("Invalid JSON object key")
+            self._expect(':')
+            yield key
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._expect('}')
+            return
+
+    def array_items(self) -> Iterator[Any]:
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._expect(']')
+            return
+
+    def skip(self) -> None:
+        """Bỏ qua một giá trị; mảng được bỏ qua từng phần tử để không nạp cả mảng lớn"""
+        char = self._peek()
+        if char == '[':
+            for _ in self.array_items():
+                pass
+        elif char == '{':
+            for _ in self.object_keys():
+                self.skip()
+        else:
+            self.value()
+
+class ResultImporter:
+    """Đọc kết quả từ file export JSON (export_data) hoặc JSON Lines (export_results,
+    log kết quả), có thể nén gzip, dần từng bài một
+
+    Các trường khác của raw_data (session_data, preferences, ...) được giữ trong header
+    sau khi đọc xong. Tiến độ tính theo số byte đã đọc của file (đã nén nếu là .gz).
+    """
+
+    FORMATS = ('json', 'jsonl')
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.fmt, self.compress = self.detect_format(filename)
+        self.total_bytes = os.path.getsize(filename)
+        self.header: Dict[str, Any] = {}
+        self._raw = None
+
+    @classmethod
+    def detect_format(cls, filename: str) -> Tuple[str, bool]:
+        """(định dạng, có nén gzip); file không rõ đuôi được coi là JSON"""
+        name = filename.lower()
+        compress = name.endswith('.gz')
+        if compress:
+            name = name[:-3]
+        return ('jsonl' if name.endswith('.jsonl') else 'json'), compress
+
+    @property
+    def bytes_read(self) -> int:
+        return self._raw.tell() if self._raw is not None and not self._raw.closed else self.total_bytes
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with open(self.filename, 'rb') as raw:
+            self._raw = raw
+            binary = gzip.GzipFile(fileobj=raw, mode='rb') if self.compress else raw
+            with io.TextIOWrapper(binary, encoding='utf-8') as f:
+                if self.fmt == 'jsonl':
+                    yield from self._iter_jsonl(f)
+                else:
+                    yield from self._iter_export(_JsonStream(f))
+
+    @staticmethod
+    def _iter_jsonl(f: io.TextIOBase) -> Iterator[Dict[str, Any]]:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Dòng hỏng vẫn được đếm khi kiểm tra kết quả
+                record = None
+            if isinstance(record, dict) and '_generation' in record:
+                continue
+            yield record
+
+    def _iter_export(self, stream: _JsonStream) -> Iterator[Dict[str, Any]]:
+        found = False
+        for key in stream.object_keys():
+            if key != 'raw_data':
+                # 'statistics' của các bản export cũ chứa cả danh sách kết quả
+                stream.skip()
+                continue
+            found = True
+            for field in stream.object_keys():
+                if field == 'results':
+                    yield from stream.array_items()
+                else:
+                    self.header[field] = stream.value()
+        if not found:
+            raise ValueError("Invalid import file format")
@@ -0,0 +1,112 @@
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+class WriteBehindPersister:
+    """Thread nền ghi dữ liệu theo lô để luồng giao diện không phải chờ đĩa
+
+    submit() chỉ đưa việc vào hàng đợi. Thread chờ thêm `delay` giây để gom các việc
+    đến sau rồi gọi write_batch(batch) một lần, theo đúng thứ tự đã submit.
+    Lô ghi lỗi được giữ lại để thử lại; flush() báo lỗi cho người gọi.
+    """
+
+    def __init__(self, write_batch: Callable[[List[Any]], None], delay: float = 0.25,
+                 name: str = "stats-persister"):
+        self._write_batch = write_batch
+        self.delay = delay
+        self._pending: List[Any] = []
+        self._condition = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._flush_requests = 0
+        # Số lần gọi flush; lần ghi lỗi nhớ lại số này để mỗi lần flush chỉ thử lại ngay một lần
+        self._flush_calls = 0
+        self._failed_at = 0
+        self._attempts = 0
+        # Lỗi của lần ghi gần nhất (None khi lần ghi gần nhất thành công)
+        self.error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> None:
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Persister is closed")
+            self._pending.append(item)
+            self._condition.notify_all()
+
+    @property
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+
+                # Gom thêm việc trong khoảng delay, trừ khi đang flush/đóng
+                wait = self.delay if self.error is None else max(self.delay, 1.0)
+                deadline = time.monotonic() + wait
+                while not self._closed and not (
+                        self._flush_requests and (self.error is None or self._flush_calls != self._failed_at)):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                batch, self._pending = self._pending, []
+                self._busy = True
+                closing = self._closed
+
+            error = None
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                error = e
+
+            with self._condition:
+                self._busy = False
+                self._attempts += 1
+                self.error = error
+                if error is not None:
+                    self._failed_at = self._flush_calls
+                    if closing:
+                        # Đang đóng và vẫn lỗi: không thử lại mãi
+                        self._condition.notify_all()
+                        return
+                    self._pending[:0] = batch
+                self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Chờ ghi xong mọi việc đã submit; raise lỗi ghi nếu có. Trả về False nếu hết timeout"""
+        with self._condition:
+            self._flush_requests += 1
+            self._flush_calls += 1
+            self._condition.notify_all()
+            attempts = self._attempts
+            try:
+                # Lô đang chờ thử lại được ghi thêm một lần trước khi báo lỗi
+                done = self._condition.wait_for(
+                    lambda: not self._busy and (
+                        not self._pending or not self._thread.is_alive()
+                        or self.error is not None and self._attempts > attempts),
+                    timeout
+                )
+            finally:
+                self._flush_requests -= 1
+            if self.error is not None:
+                raise self.error
+            return done
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Ghi nốt các việc còn lại rồi dừng thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,100 @@
+from datetime import date, datetime, timezone
+from unittest import mock
+
+import pytest
+
+from day_clock import DayClock
+from statistics_manager import StatisticsManager
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    ZoneInfo = None
+
+pytestmark = pytest.mark.skipif(ZoneInfo is None, reason="needs zoneinfo")
+
+
+def _local(zone, *args):
+    return datetime(*args, tzinfo=ZoneInfo(zone)).timestamp()
+
+
+@pytest.mark.parametrize('day, hours', [
+    (date(2024, 3, 10), 23),   # New York chuyển sang giờ mùa hè
+    (date(2024, 11, 3), 25),   # và trở về giờ chuẩn
+    (date(2024, 7, 1), 24),
+])
+def test_dst_days_are_23_or_25_hours(day, hours):
+    clock = DayClock('America/New_York')
+    start, end = clock.day_bounds(day.toordinal())
+    assert start == _local('America/New_York', day.year, day.month, day.day)
+    assert end - start == hours * 3600
+
+
+@pytest.mark.parametrize('zone, start_hour', [
+    ('America/New_York', 0), ('America/New_York', 2), ('Europe/London', 1), ('Asia/Ho_Chi_Minh', 4),
+])
+def test_bounds_are_contiguous_and_map_back_to_their_day(zone, start_hour):
+    clock = DayClock(zone, start_hour)
+    first = date(2024, 1, 1).toordinal()
+    for ordinal in range(first, first + 366):
+        start, end = clock.day_bounds(ordinal)
+        assert end == clock.day_bounds(ordinal + 1)[0]
+        assert clock.ordinal(start) == ordinal
+        assert clock.ordinal(end - 1) == ordinal
+        assert clock.ordinal(end) == ordinal + 1
+
+
+def test_day_start_hour_moves_early_hours_to_previous_day():
+    clock = DayClock('Asia/Ho_Chi_Minh', 4)
+    assert clock.day_of(_local('Asia/Ho_Chi_Minh', 2024, 5, 2, 3, 59)) == '2024-05-01'
+    assert clock.day_of(_local('Asia/Ho_Chi_Minh', 2024, 5, 2, 4)) == '2024-05-02'
+    assert clock.local(_local('Asia/Ho_Chi_Minh', 2024, 5, 2, 4)) == datetime(2024, 5, 2, 4)
+
+
+def test_cached_interval_does_not_leak_between_days():
+    clock = DayClock('UTC')
+    noon = datetime(2024, 5, 1, 12, tzinfo=timezone.utc).timestamp()
+    assert clock.ordinal(noon) == date(2024, 5, 1).toordinal()
+    # Các lần tra liên tiếp qua lại giữa ba ngày vẫn đúng
+    for hours, expected in ((11, '2024-05-01'), (12, '2024-05-02'), (-12, '2024-05-01'),
+                            (-12.01, '2024-04-30'), (11.99, '2024-05-01'), (12, '2024-05-02')):
+        assert clock.day_of(noon + hours * 3600) == expected
+
+
+def test_json_round_trip_and_defaults():
+    clock = DayClock('Europe/London', 5)
+    assert DayClock.from_json(clock.to_json()).to_json() == {'timezone': 'Europe/London', 'day_start_hour': 5}
+    assert DayClock.from_json(None).to_json() == {'timezone': None, 'day_start_hour': 0}
+
+
+@pytest.mark.parametrize('timezone_name, hour', [('No/Such_Zone', 0), (None, 24), (None, -1), (None, 1.5)])
+def test_invalid_configuration_raises(timezone_name, hour):
+    with pytest.raises(ValueError):
+        DayClock(timezone_name, hour)
+
+
+def test_manager_recomputes_days_when_clock_changes(tmp_path):
+    stats_file = str(tmp_path / "typing_stats.json")
+    # 01:00 ngày 2/5 ở UTC
+    timestamp = datetime(2024, 5, 2, 1, tzinfo=timezone.utc).timestamp()
+    manager = StatisticsManager(stats_file, timezone='UTC')
+    with mock.patch('time.time', return_value=timestamp):
+        manager.save_result({'wpm': 50, 'accuracy': 95, 'time': 30})
+    assert list(manager.daily_rollups) == ['2024-05-02']
+    manager.close()
+
+    # Ngày bắt đầu lúc 4 giờ: bài thuộc ngày 1/5; header ghi cấu hình mới
+    reopened = StatisticsManager(stats_file, timezone='UTC', day_start_hour=4)
+    assert list(reopened.daily_rollups) == ['2024-05-01']
+    assert reopened.query()[0]['date'] == '2024-05-01'
+    reopened.close()
+    again = StatisticsManager(stats_file, timezone='UTC', day_start_hour=4)
+    assert again._stored_day_clock == {'timezone': 'UTC', 'day_start_hour': 4}
+    assert list(again.daily_rollups) == ['2024-05-01']
+    # 01:00 UTC là 10:00 ngày 2/5 ở Tokyo và 21:00 ngày 1/5 ở New York
+    again.set_day_clock('Asia/Tokyo')
+    assert list(again.daily_rollups) == ['2024-05-02']
+    again.set_day_clock('America/New_York')
+    assert list(again.daily_rollups) == ['2024-05-01']
+    assert again.data['results'].columns['day'][0] == date(2024, 5, 1).toordinal()
+    again.close()
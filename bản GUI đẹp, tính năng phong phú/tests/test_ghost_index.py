@@ -0,0 +1,110 @@
+from unittest import mock
+
+import pytest
+
+from ghost_index import GhostIndex
+from statistics_manager import StatisticsManager
+
+SENTENCE = "Con mèo trèo cây cau."
+
+
+def test_text_hash_is_stable_63_bit():
+    value = GhostIndex.text_hash(SENTENCE)
+    assert value == GhostIndex.text_hash(SENTENCE)
+    assert 0 <= value < 2 ** 63
+    assert value != GhostIndex.text_hash(SENTENCE + " ")
+
+
+def test_keeps_fastest_recorded_run_and_older_on_ties():
+    ghosts = GhostIndex()
+    ghosts.add({'text_hash': 1, 'recording': 10, 'wpm': 50.0, 'timestamp': 1.0})
+    ghosts.add({'text_hash': 1, 'recording': 20, 'wpm': 60.0, 'timestamp': 2.0})
+    ghosts.add({'text_hash': 1, 'recording': 30, 'wpm': 60.0, 'timestamp': 3.0})
+    # Bài không có bản ghi phím không thành bóng ma
+    ghosts.add({'text_hash': 1, 'wpm': 90.0, 'timestamp': 4.0})
+    assert ghosts.get(1) == {'wpm': 60.0, 'timestamp': 2.0, 'recording': 20, 'text_hash': 1}
+    assert ghosts.get(2) is None
+
+
+def test_json_round_trip():
+    ghosts = GhostIndex.from_records([{'text_hash': 2 ** 62, 'recording': 5, 'wpm': 70.5, 'timestamp': 9.0}])
+    restored = GhostIndex.from_json(ghosts.to_json())
+    assert restored.best == ghosts.best
+    assert GhostIndex.from_json([]) is None
+    assert GhostIndex.from_json({'1': [1, 2]}) is None
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_manager_returns_best_ghost_with_keystrokes(tmp_path, backend):
+    stats_file = str(tmp_path / "typing_stats.json")
+    manager = StatisticsManager(stats_file, backend=backend)
+    text_hash = GhostIndex.text_hash(SENTENCE)
+    runs = [(55, [(0, 67), (150, 111)]), (68, [(0, 67), (120, 111), (240, 110)]), (61, [(0, 67)])]
+    for index, (wpm, keystrokes) in enumerate(runs):
+        with mock.patch('time.time', return_value=1700000000 + index):
+            manager.save_result({'wpm': wpm, 'accuracy': 95, 'time': 20, 'text_hash': text_hash,
+                                 'keystrokes': keystrokes})
+    ghost = manager.get_ghost(SENTENCE)
+    assert ghost['wpm'] == 68.0 and ghost['keystrokes'] == runs[1][1]
+    assert manager.get_ghost("Câu khác.") is None
+    manager.close()
+
+    reopened = StatisticsManager(stats_file, backend=backend)
+    assert reopened.get_ghost(SENTENCE)['keystrokes'] == runs[1][1]
+    reopened.close()
+
+
+def test_invalid_text_hash_is_rejected(tmp_path):
+    manager = StatisticsManager(str(tmp_path / "typing_stats.json"))
+    with pytest.raises(ValueError):
+        manager.save_result({'wpm': 50, 'accuracy': 95, 'time': 20, 'text_hash': -1})
+    manager.close()
+
+
+def test_keystrokes_are_written_by_the_writer_thread(tmp_path):
+    manager = StatisticsManager(str(tmp_path / "typing_stats.json"), write_behind=True)
+    write = manager.recordings.write
+    # Lần ghi đầu lỗi; flush sau đó thử lại ngay và thành công
+    failures = [IOError("disk full")]
+
+    def failing_write(offset, payload):
+        if failures:
+            raise failures.pop()
+        return write(offset, payload)
+
+    with mock.patch.object(manager.recordings, 'write', failing_write):
+        # Lỗi ghi bản ghi phím đi theo đường lỗi của thread ghi, không phải của save_result
+        manager.save_result({'wpm': 60, 'accuracy': 95, 'time': 20, 'text_hash': GhostIndex.text_hash(SENTENCE),
+                             'keystrokes': [(0, 67), (130, 111)]})
+        with pytest.raises(Exception, match="Failed to save statistics"):
+            manager.flush()
+        assert manager.get_ghost(SENTENCE)['keystrokes'] == [(0, 67), (130, 111)]
+    manager.close()
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_recording_moved_by_another_window_is_followed(tmp_path, backend):
+    stats_file = str(tmp_path / "typing_stats.json")
+    manager = StatisticsManager(stats_file, backend=backend, write_behind=True)
+    other = StatisticsManager(stats_file, backend=backend)
+    mine, theirs = [(0, 67), (140, 111), (260, 110)], [(0, 65)]
+    items = []
+    with mock.patch.object(manager.persister, 'submit', items.append):
+        manager.save_result({'wpm': 70, 'accuracy': 95, 'time': 20, 'text_hash': GhostIndex.text_hash(SENTENCE),
+                             'keystrokes': mine})
+        manager._save_statistics()
+    # Cửa sổ kia ghi bản ghi phím vào đúng chỗ đã dành trước khi thread nền của cửa sổ này ghi
+    other.save_result({'wpm': 50, 'accuracy': 95, 'time': 20, 'text_hash': GhostIndex.text_hash("Câu khác."),
+                       'keystrokes': theirs})
+    for item in items:
+        manager.persister.submit(item)
+    manager.flush()
+    ghost = manager.get_ghost(SENTENCE)
+    assert ghost['recording'] != items[0]['result']['recording'] and ghost['keystrokes'] == mine
+    assert manager.get_ghost("Câu khác.")['keystrokes'] == theirs
+    # Header checkpoint cũng trỏ tới offset mới
+    reopened = StatisticsManager(stats_file, backend=backend)
+    assert reopened.get_ghost(SENTENCE)['keystrokes'] == mine
+    reopened.close()
+    other.close()
+    manager.close()
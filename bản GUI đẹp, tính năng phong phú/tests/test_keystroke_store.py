@@ -0,0 +1,110 @@
+import zlib
+
+import pytest
+
+from keystroke_store import KeystrokeStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return KeystrokeStore(str(tmp_path / "typing_stats.keystrokes.bin"))
+
+
+@pytest.mark.parametrize('value, encoded', [
+    (0, b'\x00'), (127, b'\x7f'), (128, b'\x80\x01'), (300, b'\xac\x02'), (2 ** 32, b'\x80\x80\x80\x80\x10'),
+])
+def test_varint_encoding(value, encoded):
+    buffer = bytearray()
+    KeystrokeStore._write_varint(buffer, value)
+    assert bytes(buffer) == encoded
+    assert KeystrokeStore._read_varint(encoded + b'\x05', 0) == (value, len(encoded))
+
+
+def test_truncated_varint_raises():
+    with pytest.raises(ValueError):
+        KeystrokeStore._read_varint(b'\x80\x80', 0)
+
+
+@pytest.mark.parametrize('events', [
+    [],
+    [(0, ord('a'))],
+    [(0, ord('x')), (180, ord('y')), (180, KeystrokeStore.BACKSPACE), (95000, ord('ệ')), (95001, 0x1F600)],
+])
+def test_encode_decode_round_trip(events):
+    assert KeystrokeStore.decode(KeystrokeStore.encode(events)) == events
+
+
+def test_typical_keystrokes_take_about_three_bytes_before_compression():
+    events = [(index * 150, ord('a') + index % 26) for index in range(200)]
+    raw = zlib.decompress(KeystrokeStore.encode(events))
+    # Số phím (2 byte) + mỗi phím: delta 150 ms (2 byte, phím đầu 0 ms chỉ 1 byte) + mã ASCII (1 byte)
+    assert len(raw) == 2 + 200 * 3 - 1
+
+
+@pytest.mark.parametrize('events', [[(100, 97), (50, 98)], [(0, -1)]])
+def test_invalid_events_raise(events):
+    with pytest.raises(ValueError):
+        KeystrokeStore.encode(events)
+
+
+def test_append_and_read_by_offset(store):
+    first = [(0, 97), (120, 98)]
+    second = [(0, 99), (200, KeystrokeStore.BACKSPACE), (410, 99)]
+    first_offset = store.append(first)
+    second_offset = store.append(second)
+    assert first_offset == 0 and second_offset > first_offset
+    assert store.read(second_offset) == second
+    assert store.read(first_offset) == first
+    assert store.size() == second_offset + KeystrokeStore._FRAME.size + len(KeystrokeStore.encode(second))
+
+
+def test_corrupted_or_wrong_offset_raises(store):
+    offset = store.append([(0, 97), (120, 98)])
+    with pytest.raises(ValueError):
+        store.read(offset + 1)
+    with pytest.raises(ValueError):
+        store.read(store.size())
+    with open(store.path, 'r+b') as f:
+        f.seek(-1, 2)
+        last = f.read(1)
+        f.seek(-1, 2)
+        f.write(bytes([last[0] ^ 0xff]))
+    with pytest.raises(ValueError):
+        store.read(offset)
+
+
+def test_clear_removes_file(store):
+    store.append([(0, 97)])
+    store.clear()
+    assert store.size() == 0
+    assert store.append([(0, 98)]) == 0
+
+
+def test_reserve_then_write_keeps_reserved_offsets(store):
+    first, second = KeystrokeStore.encode([(0, 97)]), KeystrokeStore.encode([(0, 98), (90, 99)])
+    first_offset = store.reserve(first)
+    second_offset = store.reserve(second)
+    assert store.size() == 0
+    assert store.write(first_offset, first) == first_offset
+    assert store.write(second_offset, second) == second_offset
+    assert store.read(second_offset) == [(0, 98), (90, 99)]
+    assert store.take_relocated() == {}
+
+
+def test_write_moves_record_written_over_by_another_process(store):
+    other = KeystrokeStore(store.path)
+    payload = KeystrokeStore.encode([(0, 97), (150, 98)])
+    reserved = store.reserve(payload)
+    later = store.reserve(payload)
+    # Tiến trình khác ghi vào chỗ đã dành trước khi thread nền kịp ghi
+    taken = other.append([(0, 120)])
+    assert taken == reserved
+    frame = KeystrokeStore._FRAME.size + len(payload)
+    # Chuyển xuống sau mọi chỗ đã dành, kể cả chỗ của bài sau
+    moved = store.write(reserved, payload)
+    assert moved == later + frame
+    assert store.write(later, payload) == moved + frame
+    assert store.read(moved) == store.read(moved + frame) == [(0, 97), (150, 98)]
+    assert other.read(taken) == [(0, 120)]
+    assert store.take_relocated() == {reserved: moved, later: moved + frame}
+    assert store.take_relocated() == {}
@@ -0,0 +1,90 @@
+import random
+from unittest import mock
+
+import pytest
+
+from personal_bests import PersonalBests
+from statistics_manager import StatisticsManager
+
+
+def _record(timestamp, wpm, mode=None, **fields):
+    record = {'timestamp': timestamp, 'wpm': wpm, 'accuracy': 90.0, 'time': 30.0, 'user_length': 40}
+    if mode:
+        record['mode'] = mode
+    record.update(fields)
+    return record
+
+
+def test_top_matches_sorting_all_results():
+    rng = random.Random(7)
+    records = [_record(index, rng.uniform(20, 120), rng.choice(['full', 'word'])) for index in range(500)]
+    bests = PersonalBests.from_records(records, limit=5)
+    expected = sorted(records, key=lambda record: (-record['wpm'], record['timestamp']))
+    assert bests.top('wpm') == expected[:5]
+    assert bests.top('wpm', 'word') == [record for record in expected if record['mode'] == 'word'][:5]
+    assert bests.top('wpm', limit=2) == expected[:2]
+    assert bests.best('wpm') == expected[0]
+
+
+def test_ties_keep_the_older_result():
+    bests = PersonalBests(limit=2)
+    for timestamp in (3, 1, 2):
+        bests.add(_record(timestamp, 80.0))
+    assert [record['timestamp'] for record in bests.top('wpm')] == [1, 2]
+
+
+def test_missing_values_are_skipped():
+    bests = PersonalBests()
+    bests.add(_record(1, float('nan'), accuracy=None))
+    bests.add(_record(2, 50.0))
+    assert [record['timestamp'] for record in bests.top('wpm')] == [2]
+    assert [record['timestamp'] for record in bests.top('accuracy')] == [2]
+    assert len(bests.top('time')) == 2
+
+
+def test_unknown_field_and_mode():
+    bests = PersonalBests.from_records([_record(1, 50.0, 'full')])
+    with pytest.raises(ValueError):
+        bests.top('date')
+    assert bests.top('wpm', 'other') == []
+    assert PersonalBests().best('wpm') is None
+
+
+def test_json_round_trip_stores_each_record_once():
+    records = [_record(index, 50.0 + index, 'full' if index % 2 else 'word') for index in range(30)]
+    bests = PersonalBests.from_records(records, limit=3)
+    encoded = bests.to_json()
+    assert len(encoded) == len({record['timestamp'] for record in encoded})
+    restored = PersonalBests.from_json(encoded, limit=3)
+    for field in PersonalBests.FIELDS:
+        for mode in (None, 'full', 'word'):
+            assert restored.top(field, mode) == bests.top(field, mode)
+    assert PersonalBests.from_json({'not': 'a list'}) is None
+    assert PersonalBests.from_json([1, 2]) is None
+
+
+def test_from_rows_uses_iter_rows_layout():
+    rows = [(1.0, 70.0, 95.0, 30.0, 40, 41, 'full', 'easy', 'prose')]
+    assert PersonalBests.from_rows(rows).best('user_length') == {
+        'wpm': 70.0, 'accuracy': 95.0, 'time': 30.0, 'user_length': 41, 'timestamp': 1.0,
+        'mode': 'full', 'difficulty': 'easy'}
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_leaderboard_survives_reopen(tmp_path, backend):
+    stats_file = str(tmp_path / "typing_stats.json")
+    manager = StatisticsManager(stats_file, backend=backend)
+    for index, wpm in enumerate([55, 72, 64, 72, 40]):
+        with mock.patch('time.time', return_value=1700000000 + index * 60):
+            manager.save_result({'wpm': wpm, 'accuracy': 90 + index, 'time': 30, 'user_length': 40 + index,
+                                 'mode': 'full' if index % 2 else 'word'})
+    leaderboard = manager.get_leaderboard('wpm', limit=3)
+    assert [(row['wpm'], row['timestamp']) for row in leaderboard] == [
+        (72.0, 1700000060.0), (72.0, 1700000180.0), (64.0, 1700000120.0)]
+    manager.close()
+
+    reopened = StatisticsManager(stats_file, backend=backend)
+    assert reopened.get_leaderboard('wpm', limit=3) == leaderboard
+    assert [row['wpm'] for row in reopened.get_leaderboard('wpm', 'word')] == [64.0, 55.0, 40.0]
+    assert reopened.get_personal_bests()['most_characters']['characters'] == 44
+    reopened.close()
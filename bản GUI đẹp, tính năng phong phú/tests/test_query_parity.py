@@ -0,0 +1,113 @@
+import gzip
+import time
+from datetime import datetime, timezone
+from unittest import mock
+
+import pytest
+
+from statistics_manager import StatisticsManager
+from stats_export import ResultExporter
+
+DAY = 86400
+COUNT = 60
+MODES = ('full_sentence', 'word_by_word', 'weak_keys')
+DIFFICULTIES = ('easy', 'medium', 'hard')
+CONTENT_TYPES = ('prose', 'code')
+
+
+def _save_history(manager, now):
+    """COUNT bài trong 60 ngày gần nhất; mọi cột số khác nhau nên thứ tự sắp xếp là duy nhất"""
+    for index in range(COUNT):
+        timestamp = now - (COUNT - index) * DAY + (index % 5) * 3600
+        result = {'wpm': 30 + index * 0.5, 'accuracy': 80 + (index * 7) % 20 + index / 100,
+                  'time': 20 + index * 0.3, 'text_length': 40 + index, 'user_length': 41 + index,
+                  'mode': MODES[index % 3], 'difficulty': DIFFICULTIES[index % 3 - 1],
+                  'content_type': CONTENT_TYPES[index % 2]}
+        with mock.patch('time.time', return_value=timestamp):
+            manager.save_result(result)
+
+
+@pytest.fixture(scope='module')
+def managers(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('parity')
+    now = time.time()
+    json_manager = StatisticsManager(str(directory / "json.json"), timezone='UTC')
+    sqlite_manager = StatisticsManager(str(directory / "sqlite.json"), backend='sqlite', timezone='UTC')
+    for manager in (json_manager, sqlite_manager):
+        _save_history(manager, now)
+    # Một nửa lịch sử của backend JSON nằm trong archive
+    assert json_manager.archive_old_results(30) > 0
+    yield json_manager, sqlite_manager
+    json_manager.close()
+    sqlite_manager.close()
+
+
+def _date(days_ago):
+    return datetime.fromtimestamp(time.time() - days_ago * DAY, timezone.utc).date().isoformat()
+
+
+@pytest.mark.parametrize('filter, order_by, limit', [
+    (None, None, None),
+    ({'mode': 'word_by_word'}, None, None),
+    ({'mode': ['full_sentence', 'weak_keys'], 'difficulty': 'hard'}, '-wpm', None),
+    ({'content_type': 'code', 'wpm': {'>': 40, '<=': 55}}, 'accuracy', None),
+    ({'last_days': 14}, '-timestamp', 5),
+    ({'start_date': _date(45), 'end_date': _date(20)}, 'time', None),
+    ({'start_date': _date(45), 'difficulty': ['easy', 'medium']}, '-accuracy', 7),
+    ({'accuracy': {'>=': 90}, 'text_length': {'<': 80}}, '-user_length', 3),
+    ({'mode': 'no_such_mode'}, None, None),
+    (None, '-wpm', 0),
+])
+def test_json_and_sqlite_return_the_same_rows(managers, filter, order_by, limit):
+    json_manager, sqlite_manager = managers
+    json_rows = json_manager.query(filter, order_by, limit)
+    sqlite_rows = sqlite_manager.query(filter, order_by, limit)
+    assert json_rows == sqlite_rows
+    if limit is not None:
+        assert len(json_rows) <= limit
+
+
+def test_rows_have_no_internal_fields(managers):
+    for manager in managers:
+        for row in manager.query(limit=10):
+            assert not set(row) & set(StatisticsManager.INTERNAL_FIELDS)
+            assert row['date'] == manager.day_clock.day_of(row['timestamp'])
+
+
+def test_explain_query_reports_plan(managers):
+    json_manager, sqlite_manager = managers
+    plan = json_manager.explain_query({'mode': 'word_by_word', 'last_days': 7})
+    assert plan['backend'] == 'json' and plan['index'] in ('mode', 'timestamp')
+    assert plan['archived_months_scanned'] == 0
+    assert sqlite_manager.explain_query({'mode': 'word_by_word'})['backend'] == 'sqlite'
+
+
+@pytest.mark.parametrize('filter, order_by', [
+    ({'unknown': 1}, None),
+    ({'wpm': 60}, None),
+    ({'wpm': {'!=': 60}}, None),
+    ({'mode': [1]}, None),
+    (None, 'date'),
+])
+def test_invalid_queries_raise_value_error(managers, filter, order_by):
+    for manager in managers:
+        with pytest.raises(ValueError):
+            manager.query(filter, order_by)
+
+
+@pytest.mark.parametrize('filename', ['results.csv', 'results.jsonl.gz'])
+def test_exports_match_between_backends(managers, tmp_path, filename):
+    json_manager, sqlite_manager = managers
+    contents = []
+    for name, manager in (('json', json_manager), ('sqlite', sqlite_manager)):
+        path = tmp_path / f"{name}-{filename}"
+        assert manager.export_results(str(path), start_date=_date(40)) > 0
+        contents.append(path.read_bytes() if filename.endswith('.csv') else gzip.decompress(path.read_bytes()))
+    assert contents[0] == contents[1]
+    if filename.endswith('.csv'):
+        header, first = contents[0].decode('utf-8').splitlines()[:2]
+        assert header.split(',') == list(ResultExporter.CSV_FIELDS)
+        assert 'content_type' in ResultExporter.CSV_FIELDS
+        timestamp, date = first.split(',')[:2]
+        # Giờ UTC theo day_clock của manager, không phải giờ máy
+        assert date == datetime.fromtimestamp(float(timestamp), timezone.utc).replace(tzinfo=None).isoformat()
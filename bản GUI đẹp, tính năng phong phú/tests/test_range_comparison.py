@@ -0,0 +1,100 @@
+import math
+import statistics
+from datetime import datetime, timezone
+from unittest import mock
+
+import pytest
+
+from quantile_sketch import QuantileSketches, TDigest
+from range_comparison import RangeComparison
+from running_stats import RunningStats
+from statistics_manager import StatisticsManager
+
+
+def _digest(values):
+    digest = TDigest()
+    for value in values:
+        digest.add(value)
+    return digest
+
+
+def _cohen_d(a, b):
+    pooled = ((len(a) - 1) * statistics.variance(a) + (len(b) - 1) * statistics.variance(b)) / (len(a) + len(b) - 2)
+    return (statistics.mean(a) - statistics.mean(b)) / math.sqrt(pooled)
+
+
+def test_effect_size_matches_cohens_d():
+    a, b = [60, 62, 65, 70, 58], [50, 55, 53, 57]
+    assert RangeComparison.effect_size(RunningStats.from_values(a), RunningStats.from_values(b)) == \
+        round(_cohen_d(a, b), 3)
+
+
+@pytest.mark.parametrize('a, b', [([], [50, 60]), ([50], [60]), ([50, 50], [50, 50, 50])])
+def test_effect_size_is_none_without_enough_data_or_variance(a, b):
+    assert RangeComparison.effect_size(RunningStats.from_values(a), RunningStats.from_values(b)) is None
+
+
+def test_from_digest_is_exact_for_few_values():
+    values = [40.0, 45.5, 51.0, 62.25]
+    stats = RangeComparison.from_digest(_digest(values))
+    assert stats.count == 4 and stats.minimum == 40.0 and stats.maximum == 62.25
+    assert stats.mean == pytest.approx(statistics.mean(values))
+    assert stats.stddev == pytest.approx(statistics.pstdev(values))
+
+
+def test_from_digest_approximates_many_values():
+    values = [40 + (index * 37) % 50 + index / 1000 for index in range(5000)]
+    stats = RangeComparison.from_digest(_digest(values))
+    assert stats.mean == pytest.approx(statistics.mean(values))
+    assert stats.stddev == pytest.approx(statistics.pstdev(values), rel=0.02)
+
+
+def test_compare_reports_both_sides_and_deltas():
+    a = {'wpm': RunningStats.from_values([60, 70]), 'accuracy': RunningStats.from_values([90, 94])}
+    b = {'wpm': RunningStats.from_values([50, 52, 54]), 'accuracy': RunningStats()}
+    comparison = RangeComparison.compare(a, b)
+    assert comparison['a'] == {'count': 2, 'wpm': {'mean': 65.0, 'stddev': 5.0},
+                               'accuracy': {'mean': 92.0, 'stddev': 2.0}}
+    assert comparison['b']['count'] == 3
+    assert comparison['delta'] == {'wpm': 13.0, 'accuracy': None}
+    assert comparison['effect_size']['wpm'] == round(_cohen_d([60, 70], [50, 52, 54]), 3)
+    assert comparison['effect_size']['accuracy'] is None
+
+
+def test_compare_modes_skips_results_without_mode():
+    modes_a = {'full': {'wpm': _digest([60, 62]), 'accuracy': _digest([95, 96])},
+               QuantileSketches.NO_MODE: {'wpm': _digest([10]), 'accuracy': _digest([50])}}
+    modes_b = {'word': {'wpm': _digest([40]), 'accuracy': _digest([90])}}
+    breakdown = RangeComparison.compare_modes(modes_a, modes_b)
+    assert sorted(breakdown) == ['full', 'word']
+    assert breakdown['full']['b']['count'] == 0 and breakdown['full']['delta']['wpm'] is None
+    assert breakdown['word']['b']['wpm']['p50'] == 40.0
+    merged = RangeComparison.combine(modes_a)
+    assert merged['wpm'].count == 3
+
+
+def test_manager_compare_matches_brute_force(tmp_path):
+    manager = StatisticsManager(str(tmp_path / "typing_stats.json"), timezone='UTC')
+    week_a = [('full', 60), ('full', 64), ('word', 58), (None, 61)]
+    week_b = [('full', 50), ('word', 49), ('word', 53)]
+    for day, side in ((3, week_a), (10, week_b)):
+        for hour, (mode, wpm) in enumerate(side):
+            result = {'wpm': wpm, 'accuracy': 90 + hour, 'time': 30}
+            if mode:
+                result['mode'] = mode
+            with mock.patch('time.time', return_value=datetime(2024, 6, day, hour, tzinfo=timezone.utc).timestamp()):
+                manager.save_result(result)
+
+    comparison = manager.compare(('2024-06-01', '2024-06-07'), ('2024-06-08', '2024-06-14'))
+    wpm_a, wpm_b = [wpm for _, wpm in week_a], [wpm for _, wpm in week_b]
+    assert comparison['a']['count'] == 4 and comparison['b']['count'] == 3
+    assert (comparison['a']['start'], comparison['a']['end']) == ('2024-06-01', '2024-06-07')
+    assert comparison['delta']['wpm'] == round(statistics.mean(wpm_a) - statistics.mean(wpm_b), 2)
+    assert comparison['effect_size']['wpm'] == round(_cohen_d(wpm_a, wpm_b), 3)
+    assert sorted(comparison['modes']) == ['full', 'word']
+    assert comparison['modes']['word']['b']['count'] == 2
+    assert comparison['modes']['word']['delta']['wpm'] == round(58 - statistics.mean([49, 53]), 2)
+
+    with pytest.raises(ValueError):
+        manager.compare(('2024-06-07', '2024-06-01'), (None, None))
+    manager.close()
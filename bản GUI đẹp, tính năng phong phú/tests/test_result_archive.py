@@ -0,0 +1,112 @@
+import os
+from datetime import datetime, timezone
+from unittest import mock
+
+import pytest
+
+from day_clock import DayClock
+from result_archive import ResultArchive
+from statistics_manager import StatisticsManager
+
+UTC = DayClock('UTC')
+
+
+def _ts(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def _record(timestamp, wpm, mode='full'):
+    return {'timestamp': timestamp, 'wpm': wpm, 'accuracy': 95.0, 'time': 30.0,
+            'text_length': 40, 'user_length': 40, 'mode': mode}
+
+
+@pytest.fixture
+def records():
+    return [_record(_ts(2024, 1, 5), 40.0), _record(_ts(2024, 1, 20), 45.0, 'word'),
+            _record(_ts(2024, 2, 1, 12), 50.0), _record(_ts(2024, 3, 31, 23), 55.0)]
+
+
+@pytest.mark.parametrize('compression', ['lzma', 'gzip'])
+def test_round_trip_through_manifest(tmp_path, records, compression):
+    archive = ResultArchive(str(tmp_path / "a.archive"), compression, UTC)
+    assert archive.add(records, _ts(2024, 4, 1)) == 4
+    assert sorted(archive.months) == ['2024-01', '2024-02', '2024-03']
+
+    reopened = ResultArchive(str(tmp_path / "a.archive"), compression)
+    assert reopened.day_clock.to_json() == UTC.to_json()
+    assert reopened.cutoff == _ts(2024, 4, 1)
+    assert len(reopened) == 4
+    assert list(reopened.iter_results()) == records
+    stats = reopened.stats()
+    assert stats['wpm'].count == 4 and stats['wpm'].mean == 47.5
+
+
+def test_range_reads_only_overlapping_months(tmp_path, records):
+    archive = ResultArchive(str(tmp_path / "a.archive"), day_clock=UTC)
+    archive.add(records, _ts(2024, 4, 1))
+    start, end = _ts(2024, 1, 15), _ts(2024, 2, 15)
+    assert archive.months_between(start, end) == ['2024-01', '2024-02']
+    rows = list(archive.iter_rows(start, end))
+    assert [row[1] for row in rows] == [45.0, 50.0]
+    assert list(archive._loaded) == ['2024-01', '2024-02']
+    assert [row[1] for row in archive.iter_rows(mode='word')] == [45.0]
+
+
+def test_add_merges_into_existing_month_without_duplicates(tmp_path, records):
+    archive = ResultArchive(str(tmp_path / "a.archive"), day_clock=UTC)
+    archive.add(records[:2], _ts(2024, 2, 1))
+    first_file = archive.months['2024-01']['file']
+    archive.add([records[1], _record(_ts(2024, 1, 10), 42.0)], _ts(2024, 2, 1))
+    assert [record['wpm'] for record in archive.iter_results()] == [40.0, 42.0, 45.0]
+    assert archive.months['2024-01']['version'] == 2
+    assert not os.path.exists(os.path.join(archive.directory, first_file))
+
+
+def test_months_follow_the_day_clock(tmp_path):
+    # 23:30 UTC ngày 31/3 đã là ngày 1/4 ở Hà Nội
+    late = _record(_ts(2024, 3, 31, 23, 30), 60.0)
+    hanoi = DayClock('Asia/Ho_Chi_Minh')
+    archive = ResultArchive(str(tmp_path / "a.archive"), day_clock=hanoi)
+    archive.add([late], _ts(2024, 5, 1))
+    assert list(archive.months) == ['2024-04']
+    assert archive.month_bounds('2024-04')[0] == _ts(2024, 3, 31, 17)
+
+    archive.repartition(UTC)
+    assert list(archive.months) == ['2024-03']
+    reopened = ResultArchive(archive.directory)
+    assert reopened.day_clock.to_json() == UTC.to_json()
+    assert list(reopened.iter_results()) == [late]
+    assert sorted(os.listdir(archive.directory)) == ['2024-03.1.jsonl.xz', 'manifest.json']
+
+
+def test_day_start_hour_moves_early_results_to_previous_month(tmp_path):
+    archive = ResultArchive(str(tmp_path / "a.archive"), day_clock=DayClock('UTC', 4))
+    assert archive.month_of(_ts(2024, 5, 1, 3)) == '2024-04'
+    assert archive.month_of(_ts(2024, 5, 1, 4)) == '2024-05'
+
+
+def test_clear_removes_segments(tmp_path, records):
+    archive = ResultArchive(str(tmp_path / "a.archive"), day_clock=UTC)
+    archive.add(records, _ts(2024, 4, 1))
+    archive.clear()
+    assert os.listdir(archive.directory) == []
+    assert len(archive) == 0 and archive.cutoff is None
+
+
+def test_manager_archives_old_results_and_still_reports_them(tmp_path):
+    stats_file = str(tmp_path / "typing_stats.json")
+    manager = StatisticsManager(stats_file, timezone='UTC')
+    for timestamp, wpm in ((_ts(2024, 1, 5), 40), (_ts(2024, 2, 5), 50)):
+        with mock.patch('time.time', return_value=timestamp):
+            manager.save_result({'wpm': wpm, 'accuracy': 95, 'time': 30, 'mode': 'full'})
+    manager.save_result({'wpm': 60, 'accuracy': 95, 'time': 30, 'mode': 'full'})
+    assert manager.archive_old_results(30) == 2
+    manager.close()
+
+    reopened = StatisticsManager(stats_file, timezone='UTC', retention_days=30)
+    assert len(reopened.data['results']) == 1
+    assert reopened.aggregates['wpm'].count == 3
+    assert [row['wpm'] for row in reopened.query({'start_date': '2024-01-01'})] == [40.0, 50.0, 60.0]
+    assert reopened.explain_query({'start_date': '2024-02-01', 'end_date': '2024-02-28'})[
+        'archived_months_scanned'] == 1
+    reopened.close()
@@ -0,0 +1,227 @@
+import json
+import os
+from datetime import datetime, timezone
+from unittest import mock
+
+import pytest
+
+from results_log import ResultsLog
+from statistics_manager import StatisticsManager
+
+
+@pytest.fixture
+def log(tmp_path):
+    return ResultsLog(str(tmp_path / "typing_stats.json"))
+
+
+def _records(log, **kwargs):
+    return [record for _, record in log.iter_records(**kwargs)]
+
+
+def _result(wpm):
+    return {'wpm': wpm, 'accuracy': 95, 'time': 30, 'key_stats': {'a': [2, 1]}}
+
+
+def test_append_round_trip_with_offsets(log):
+    end = log.append([{'wpm': 50.0}, {'wpm': 60.0, 'mode': 'đầy đủ'}])
+    entries = list(log.iter_records())
+    assert [record for _, record in entries] == [{'wpm': 50.0}, {'wpm': 60.0, 'mode': 'đầy đủ'}]
+    assert entries[0][0] == 0
+    assert log.end_offset == end == log.size()
+    # Đọc tiếp từ offset của dòng thứ hai
+    assert _records(log, start=entries[1][0]) == [{'wpm': 60.0, 'mode': 'đầy đủ'}]
+
+
+def test_torn_last_line_is_skipped(log):
+    log.append([{'wpm': 50.0}])
+    first_end = log.size()
+    log.append([{'wpm': 60.0}])
+    with open(log.log_file, 'r+b') as f:
+        f.truncate(log.size() - 5)
+    assert _records(log) == [{'wpm': 50.0}]
+    assert log.bad_lines == 1
+    # Đọc tiếp sẽ bắt đầu lại từ đầu dòng ghi dở
+    assert log.end_offset == first_end
+
+
+def test_crc_mismatch_skips_only_that_line(log):
+    log.append([{'wpm': 50.0}, {'wpm': 60.0}, {'wpm': 70.0}])
+    with open(log.log_file, 'rb') as f:
+        data = f.read()
+    with open(log.log_file, 'wb') as f:
+        f.write(data.replace(b'60.0', b'66.0'))
+    assert _records(log) == [{'wpm': 50.0}, {'wpm': 70.0}]
+    assert log.bad_lines == 1
+
+
+def test_lines_without_crc_from_older_versions_are_read(log):
+    with open(log.log_file, 'wb') as f:
+        f.write(b'{"wpm":50.0}\nnot json\n[1,2]\n')
+    assert _records(log) == [{'wpm': 50.0}]
+    assert log.bad_lines == 2
+
+
+def test_corrupt_header_falls_back_to_backup(log):
+    log.write_header({'session_data': {'n': 1}})
+    log.write_header({'session_data': {'n': 2}})
+    with open(log.header_file, 'w', encoding='utf-8') as f:
+        f.write('{"session_data": {"n": 3}, "checksum": "00000000"}')
+    assert log.read_header()['session_data'] == {'n': 1}
+    # Header hỏng không được đẩy sang .bak, checkpoint tốt duy nhất vẫn còn
+    log.write_header({'session_data': {'n': 4}})
+    assert log.read_header()['session_data'] == {'n': 4}
+    with open(log.backup_file, 'r', encoding='utf-8') as f:
+        assert json.load(f)['session_data'] == {'n': 1}
+
+
+def test_rewrite_starts_a_new_generation(log):
+    log.append([{'wpm': 50.0}, {'wpm': 0}])
+    log.read_header()
+    log.rewrite([{'wpm': 50.0}], {'session_data': {}})
+    assert log.read_generation() == 1
+    header = log.read_header()
+    assert header['log_generation'] == 1 and header['log_offset'] == log.size()
+    assert not log.header_stale
+    assert _records(log) == [{'wpm': 50.0}]
+    # Đọc tiếp theo thế hệ cũ: log đã đổi nên không trả record nào
+    assert _records(log, generation=0) == []
+    assert log.generation_changed
+
+
+def test_interrupted_compaction_recovers_new_header_from_tmp(log, monkeypatch):
+    log.append([{'wpm': 50.0}])
+    log.write_header({'session_data': {'n': 1}})
+
+    def crash():
+        raise OSError("crash")
+
+    monkeypatch.setattr(log, '_install_header', crash)
+    with pytest.raises(OSError):
+        log.rewrite([{'wpm': 50.0}], {'session_data': {'n': 2}})
+    # Log mới đã thay, header chính vẫn thuộc thế hệ cũ: header .tmp khớp log được chọn
+    reader = ResultsLog(log.header_file)
+    assert reader.read_header()['session_data'] == {'n': 2}
+    assert not reader.header_stale
+
+
+def test_header_of_another_generation_is_stale(log):
+    log.rewrite([], {'session_data': {}})
+    # Header của một phiên còn giữ thế hệ cũ; không còn checkpoint nào khớp log
+    log.generation = 0
+    log.write_header({'session_data': {'old': True}})
+    os.remove(log.backup_file)
+    header = log.read_header()
+    assert header['session_data'] == {'old': True}
+    assert log.header_stale
+
+
+def test_manager_drops_torn_line_and_compacts(tmp_path):
+    stats_file = str(tmp_path / "typing_stats.json")
+    manager = StatisticsManager(stats_file)
+    for wpm in (50, 60):
+        manager.save_result(_result(wpm))
+    manager.close()
+    log_file = manager.results_log.log_file
+    with open(log_file, 'ab') as f:
+        f.write(b'{"wpm":70.0,"accuracy":9')
+
+    reopened = StatisticsManager(stats_file)
+    assert [result['wpm'] for result in reopened.data['results']] == [50.0, 60.0]
+    assert reopened.data['session_data']['key_stats']['a'] == [4, 2]
+    assert reopened.results_log.bad_lines == 0
+    with open(log_file, 'rb') as f:
+        assert f.read().endswith(b'\n')
+    reopened.close()
+
+
+@pytest.mark.parametrize('write_behind', [False, True])
+def test_checkpoints_compact_folded_key_stats(tmp_path, write_behind):
+    stats_file = str(tmp_path / "typing_stats.json")
+    manager = StatisticsManager(stats_file, checkpoint_every=50, write_behind=write_behind)
+    manager.COMPACT_MIN_LINES = 100
+    for index in range(400):
+        manager.save_result(_result(index))
+    manager.close()
+    # Compact ở các checkpoint thứ 100, 200 và 300 bài; 100 bài sau cùng chưa đạt tỉ lệ
+    assert manager.results_log.read_generation() == 3
+    with open(manager.results_log.log_file, 'rb') as f:
+        lines = f.read().splitlines()
+    assert sum(b'"key_stats"' in line for line in lines) == 100
+    assert sum(b'"_seq"' in line for line in lines) == 100
+
+    reopened = StatisticsManager(stats_file)
+    assert [result['wpm'] for result in reopened.data['results']] == [float(index) for index in range(400)]
+    assert reopened.data['session_data']['key_stats']['a'] == [800, 400]
+    reopened.close()
+
+
+def _save_on(manager, day, wpm):
+    with mock.patch('time.time', return_value=datetime(2024, 5, day, 12, tzinfo=timezone.utc).timestamp()):
+        manager.save_result(_result(wpm))
+
+
+def _checkpoint(manager):
+    """Snapshot header mà checkpoint gửi cho thread ghi"""
+    items = []
+    persist = manager._persist
+    with mock.patch.object(manager, '_persist', lambda item: (items.append(item), persist(item))):
+        manager._save_statistics()
+    return items[0]['header']
+
+
+def test_checkpoint_snapshot_carries_only_changed_days(tmp_path):
+    stats_file = str(tmp_path / "typing_stats.json")
+    manager = StatisticsManager(stats_file, timezone='UTC', write_behind=True)
+    for day in (1, 2, 3):
+        _save_on(manager, day, 50 + day)
+    first = _checkpoint(manager)
+    assert set(first['changed']['daily_rollups']) == {'2024-05-01', '2024-05-02', '2024-05-03'}
+    assert first['replaced'] == ('daily_rollups', 'sketches', 'ghosts')
+
+    _save_on(manager, 3, 60)
+    second = _checkpoint(manager)
+    assert second['replaced'] == ()
+    assert list(second['changed']['daily_rollups']) == list(second['changed']['sketches']) == ['2024-05-03']
+    assert second['changed']['ghosts'] == {}
+    # Bản chụp không dùng chung key_stats với dữ liệu đang được cập nhật
+    _save_on(manager, 3, 61)
+    assert second['fields']['session_data']['key_stats']['a'] == [8, 4]
+    manager.close()
+
+    # Header sau khi mở lại được dùng làm nền: chỉ ngày mới được gửi ở checkpoint tới
+    reopened = StatisticsManager(stats_file, timezone='UTC')
+    _save_on(reopened, 4, 70)
+    assert list(_checkpoint(reopened)['changed']['daily_rollups']) == ['2024-05-04']
+    reopened.close()
+    again = StatisticsManager(stats_file, timezone='UTC')
+    assert {day: rollup['wpm'].count for day, rollup in again.daily_rollups.items()} == {
+        '2024-05-01': 1, '2024-05-02': 1, '2024-05-03': 3, '2024-05-04': 1}
+    assert again.sketches.range('2024-05-03', '2024-05-03')['wpm'].count == 3
+    again.close()
+
+
+def test_save_leaves_catch_up_and_tags_to_refresh_and_writer(tmp_path):
+    stats_file = str(tmp_path / "typing_stats.json")
+    other = StatisticsManager(stats_file)
+    other.save_result(_result(40))
+    manager = StatisticsManager(stats_file, write_behind=True)
+    other.save_result(_result(50))
+    with mock.patch.object(manager, '_catch_up') as catch_up, \
+            mock.patch.object(manager.persister, 'submit') as submit:
+        manager.save_result(_result(60))
+        manager._save_statistics()
+    catch_up.assert_not_called()
+    # Bài chưa được gắn tag khi đưa vào hàng đợi
+    assert '_seq' not in submit.call_args_list[0].args[0]['record']
+    for call in submit.call_args_list:
+        manager.persister.submit(call.args[0])
+    manager.refresh()
+    assert [result['wpm'] for result in manager.data['results']] == [40.0, 60.0, 50.0]
+    assert manager.data['session_data']['key_stats']['a'] == [6, 3]
+    manager.close()
+    other.close()
+
+    reopened = StatisticsManager(stats_file)
+    assert sorted(result['wpm'] for result in reopened.data['results']) == [40.0, 50.0, 60.0]
+    assert reopened.data['session_data']['key_stats']['a'] == [6, 3]
+    reopened.close()
@@ -0,0 +1,52 @@
+import pytest
+
+from data_manager import DataManager
+from sentence_segmenter import SentenceSegmenter
+
+README_LINES = "Python is great for scripting\nJavaScript runs in browsers\nRust is fast and safe\n"
+
+
+@pytest.fixture
+def segmenter():
+    return SentenceSegmenter()
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return DataManager(str(tmp_path / "DATA.txt"), use_snapshot=False, corpus_dir=str(tmp_path / "corpora"))
+
+
+def test_prose_joins_wrapped_lines(segmenter):
+    lines = ["The quick brown fox jumps over\n", "the lazy dog. Dr. Smith\n", "agreed.\n", "\n", "Next paragraph\n"]
+    assert list(segmenter.segment(lines)) == [
+        "The quick brown fox jumps over the lazy dog.", "Dr. Smith agreed.", "Next paragraph"]
+
+
+def test_line_per_sentence_splits_unterminated_lines(segmenter):
+    lines = README_LINES.splitlines()
+    assert list(segmenter.segment(lines, line_per_sentence=True)) == lines
+    assert list(segmenter.segment(lines)) == [" ".join(lines)]
+
+
+@pytest.mark.parametrize('text, expected', [
+    (README_LINES, True),
+    ("Đây là câu luyện tập đầu tiên.\nĐây là một câu khác để gõ.\n", False),
+    ("The quick brown fox jumps over\nthe lazy dog while the cat\nwatches from the fence.\n", False),
+    ("Một dòng duy nhất\n", False),
+])
+def test_detects_line_oriented_files(segmenter, text, expected):
+    assert segmenter.is_line_oriented(text.splitlines()) is expected
+
+
+def test_import_readme_example_keeps_one_sentence_per_line(manager, tmp_path):
+    source = tmp_path / "sentences.txt"
+    source.write_text(README_LINES, encoding='utf-8')
+    assert manager.import_txt_file(str(source)) == 3
+    assert manager.texts == README_LINES.splitlines()
+
+
+def test_import_prose_with_explicit_choice(manager, tmp_path):
+    source = tmp_path / "prose.txt"
+    source.write_text("Python is great for scripting\nand for data analysis too\n", encoding='utf-8')
+    assert manager.import_txt_file(str(source), line_per_sentence=False) == 1
+    assert manager.texts == ["Python is great for scripting and for data analysis too"]
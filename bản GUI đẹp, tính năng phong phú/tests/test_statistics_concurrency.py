@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+
+import pytest
+
+from file_lock import fcntl
+from results_log import ResultsLog
+from statistics_manager import StatisticsManager
+
+pytestmark = pytest.mark.skipif(fcntl is None or 'fork' not in multiprocessing.get_all_start_methods(),
+                                reason="needs fcntl locks and fork")
+
+WORKERS = 4
+SAVES = 100
+
+
+def _result(wpm):
+    return {'wpm': wpm, 'accuracy': 95, 'time': 30, 'text_length': 40, 'user_length': 40,
+            'key_stats': {'x': [1, 0]}}
+
+
+def _worker(stats_file, worker):
+    """Lưu SAVES bài; định kỳ compact và mở lại manager để chen vào giữa lần nạp của tiến trình khác
+    (checkpoint cũng compact log sau vài chục dòng)"""
+    manager = _open(stats_file)
+    for index in range(SAVES):
+        manager.save_result(_result(worker * 1000 + index))
+        if index % 15 == 7:
+            manager.compact()
+        if index % 20 == 19:
+            manager.close()
+            manager = _open(stats_file)
+    manager.close()
+
+
+def _open(stats_file):
+    manager = StatisticsManager(stats_file, checkpoint_every=5)
+    manager.COMPACT_MIN_LINES = 10
+    return manager
+
+
+def _compactor(stats_file, rounds):
+    for _ in range(rounds):
+        manager = StatisticsManager(stats_file)
+        manager.compact()
+        manager.close()
+
+
+def _run(processes):
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(120)
+        assert process.exitcode == 0
+
+
+def test_concurrent_saves_and_compactions_keep_every_result(tmp_path):
+    stats_file = str(tmp_path / "typing_stats.json")
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_worker, args=(stats_file, worker)) for worker in range(WORKERS)]
+    processes.append(context.Process(target=_compactor, args=(stats_file, 20)))
+    _run(processes)
+
+    manager = StatisticsManager(stats_file)
+    wpms = sorted(result['wpm'] for result in manager.data['results'])
+    assert wpms == sorted(float(worker * 1000 + index) for worker in range(WORKERS) for index in range(SAVES))
+    assert manager.data['session_data']['key_stats']['x'] == [WORKERS * SAVES, 0]
+    assert manager.aggregates['wpm'].count == WORKERS * SAVES
+    manager.close()
+
+
+def test_load_racing_compaction_pairs_header_with_its_log(tmp_path, monkeypatch):
+    """Lần nạp đầu không được ghép header trước compaction với log sau compaction"""
+    stats_file = str(tmp_path / "typing_stats.json")
+    writer = StatisticsManager(stats_file, checkpoint_every=1000)
+    for index in range(3):
+        writer.save_result(_result(50 + index))
+    writer.close()
+    # Hai bài chưa được checkpoint vào header (phiên bị dừng trước khi đóng)
+    unclosed = StatisticsManager(stats_file, checkpoint_every=1000)
+    for index in range(3, 5):
+        unclosed.save_result(_result(50 + index))
+
+    context = multiprocessing.get_context('fork')
+    parent = os.getpid()
+    compactors = []
+    read_header = ResultsLog.read_header
+
+    def racing_read_header(self):
+        header = read_header(self)
+        if os.getpid() == parent and not compactors:
+            # Tiến trình khác compact ngay sau khi header được đọc; lần nạp giữ khóa nên nó phải chờ
+            compactor = context.Process(target=_compactor, args=(stats_file, 1))
+            compactors.append(compactor)
+            compactor.start()
+            compactor.join(2)
+        return header
+
+    monkeypatch.setattr(ResultsLog, 'read_header', racing_read_header)
+    reader = StatisticsManager(stats_file)
+    monkeypatch.undo()
+    compactors[0].join(30)
+    assert compactors[0].exitcode == 0
+    assert len(reader.data['results']) == 5
+    assert reader.data['session_data']['key_stats']['x'] == [5, 0]
+    # Compaction chạy sau lần nạp được nhận ra và nạp lại, không bị bỏ sót
+    reader.refresh()
+    assert reader.results_log.generation == reader.results_log.read_generation()
+    assert reader.data['session_data']['key_stats']['x'] == [5, 0]
+
+    # Sau compaction của tiến trình kia, header của phiên này vẫn được ghi
+    reader.save_result(_result(60))
+    reader.close()
+    reopened = StatisticsManager(stats_file)
+    assert len(reopened.data['results']) == 6
+    assert reopened.data['session_data']['key_stats']['x'] == [6, 0]
+    reopened.close()